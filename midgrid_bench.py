@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Benchmark the MidGrid grid meta-analyses on real and synthetic scores.
+
+Usage:
+    python3 midgrid_bench.py [FILE ...] [--voices 8] [--beats 2000]
+                             [--repeat 3] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import midgrid_motif
+
+DEFAULT_FILES = [Path("fugue_contrapunctus.midgrid")]
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+DURATIONS = [0.5, 0.5, 1.0, 1.0, 1.5, 2.0]
+
+
+def note_name(midi: int) -> str:
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+def synthetic_voice(rng: random.Random, top: int, beats: int,
+                    section_rhythms: list[list[float]]) -> list[tuple[float, float, int]]:
+    """(beat, dur, midi) notes of one voice: a stepwise walk around `top`,
+    following the shared section rhythm half the time (homorhythm) and its
+    own durations otherwise, with occasional rests."""
+    notes = []
+    pitch = top
+    for section, shared in enumerate(section_rhythms):
+        beat = section * 16.0
+        end = min(beat + 16.0, float(beats))
+        durs = shared if rng.random() < 0.5 else None
+        k = 0
+        while beat < end:
+            dur = durs[k % len(durs)] if durs else rng.choice(DURATIONS)
+            dur = min(dur, end - beat)
+            k += 1
+            if durs is None and rng.random() < 0.08:
+                beat += dur
+                continue
+            pitch = max(top - 9, min(top + 9, pitch + rng.choice([-2, -1, 1, 2, -3, 3])))
+            notes.append((beat, dur, pitch))
+            beat += dur
+    return notes
+
+
+def synthetic_score(voices: int = 8, beats: int = 2000, seed: int = 0) -> str:
+    """MidGrid text of a deterministic pseudo-random `voices` x `beats` score."""
+    rng = random.Random(seed)
+    section_rhythms = [[rng.choice(DURATIONS) for _ in range(8)]
+                       for _ in range((beats + 15) // 16)]
+    parts = [synthetic_voice(rng, 84 - 5 * v, beats, section_rhythms)
+             for v in range(voices)]
+    cells: dict[float, list[str]] = {}
+    for v, notes in enumerate(parts):
+        for beat, dur, midi in notes:
+            cells.setdefault(beat, ["."] * voices)[v] = f"{note_name(midi)}:{dur:g}"
+            cells.setdefault(beat + dur, ["."] * voices)
+    for v, notes in enumerate(parts):
+        spans = iter(notes)
+        current = next(spans, None)
+        for beat in sorted(cells):
+            while current and beat >= current[0] + current[1]:
+                current = next(spans, None)
+            if current and current[0] < beat < current[0] + current[1]:
+                cells[beat][v] = "-"
+    lines = [f"# Synthetic benchmark score: {voices} voices, {beats} beats, seed {seed}"]
+    for beat in sorted(cells):
+        lines.append(f"{beat:<7g} | " + " | ".join(f"{c:<7}" for c in cells[beat]))
+    return "\n".join(lines) + "\n"
+
+
+def analyses() -> list[tuple[str, Callable[[list], Any]]]:
+    return [
+        ("melodic_fusion", midgrid_motif.melodic_fusion),
+        ("rhythmic_fusion", midgrid_motif.rhythmic_fusion),
+        ("homorhythm_fractions", midgrid_motif.homorhythm_fractions),
+        ("find_recalls", midgrid_motif.find_recalls),
+    ]
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    best, result = float("inf"), None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def bench_case(label: str, text: str, repeat: int) -> dict[str, Any]:
+    parse_ms, voices = time_call(lambda: midgrid_motif.parse_midgrid_text(text), repeat)
+    timings = [{"analysis": "parse", "ms": round(parse_ms, 3), "results": len(voices)}]
+    for name, fn in analyses():
+        ms, result = time_call(lambda: fn(voices), repeat)
+        timings.append({"analysis": name, "ms": round(ms, 3), "results": len(result)})
+    end = max((n["beat"] + n["dur"] for v in voices for n in v), default=0.0)
+    return {
+        "case": label,
+        "voices": len(voices),
+        "attacks": sum(len(v) for v in voices),
+        "beats": end,
+        "timings": timings,
+    }
+
+
+def render_text(cases: list[dict[str, Any]]) -> str:
+    lines = []
+    for case in cases:
+        lines.append(f"{case['case']}: {case['voices']} voices, {case['attacks']} attacks, "
+                     f"{case['beats']:g} beats")
+        for row in case["timings"]:
+            lines.append(f"  {row['analysis']:<22} {row['ms']:>10.2f} ms  ({row['results']} results)")
+    return "\n".join(lines) + "\n"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path,
+                        help="MidGrid files to time (default: fugue_contrapunctus.midgrid)")
+    parser.add_argument("--voices", type=int, default=8, help="synthetic score voices; 0 skips it")
+    parser.add_argument("--beats", type=int, default=2000, help="synthetic score length in beats")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per analysis; the best is reported")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    cases = []
+    for path in args.files or [Path(__file__).resolve().parent / p for p in DEFAULT_FILES]:
+        cases.append(bench_case(path.name, path.read_text(encoding="utf-8"), args.repeat))
+    if args.voices > 0 and args.beats > 0:
+        text = synthetic_score(args.voices, args.beats, args.seed)
+        cases.append(bench_case(f"synthetic {args.voices}x{args.beats}", text, args.repeat))
+    if args.json:
+        print(json.dumps({"schema": "midgrid.bench.v1", "cases": cases}, indent=2))
+    else:
+        print(render_text(cases), end="")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
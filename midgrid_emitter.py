@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
+import argparse
+import heapq
+import json
+import mmap
+import os
+import struct
 import sys
-from mido import MidiFile, MetaMessage, tempo2bpm
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional
+from fractions import Fraction
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
 NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F',
               'F#', 'G', 'G#', 'A', 'A#', 'B']
@@ -12,6 +23,142 @@ def midi_note_to_name(note: int) -> str:
     name = NOTE_NAMES[note % 12]
     return f"{name}{octave}"
 
+def tempo_to_bpm(tempo: int) -> float:
+    """Microseconds per quarter note to beats per minute."""
+    return 60_000_000 / tempo
+
+# Data bytes after a system common status (0xF1-0xFE, sysex and meta aside).
+SYSTEM_DATA_BYTES = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+MidiEvent = Tuple[int, int, int, Union[int, bytes]]
+
+# Channel messages kept for the # events section, with mido's field names.
+CHANNEL_EVENTS = {
+    0xA0: ("polytouch", ("note", "value")),
+    0xB0: ("control_change", ("control", "value")),
+    0xC0: ("program_change", ("program",)),
+    0xD0: ("aftertouch", ("value",)),
+}
+PAN_CONTROL = 10
+# Text-like meta events, written as `[beat] type "text"`.
+TEXT_META = {0x01: "text", 0x02: "copyright", 0x03: "track_name", 0x04: "instrument_name",
+             0x05: "lyrics", 0x06: "marker", 0x07: "cue_marker"}
+TIME_SIGNATURE = 0x58
+KEY_SIGNATURE = 0x59
+# Key names by sharps (-7 flats .. 7 sharps), major and minor.
+MAJOR_KEYS = ['Cb', 'Gb', 'Db', 'Ab', 'Eb', 'Bb', 'F', 'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#']
+MINOR_KEYS = ['Ab', 'Eb', 'Bb', 'F', 'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#', 'G#', 'D#', 'A#']
+
+def describe_event(status: int, data1: int, data2: Union[int, bytes]) -> str:
+    """`type key=value ...` text of a non-note event kept by parse_notes."""
+    if status == 0xFF:
+        if data1 in TEXT_META:
+            return f"{TEXT_META[data1]} {json.dumps(data2.decode('latin-1'))}"
+        if data1 == TIME_SIGNATURE:
+            num, den, clocks, n32 = data2[:4]
+            return (f"time_signature numerator={num} denominator={2 ** den} "
+                    f"clocks_per_click={clocks} notated_32nd_notes_per_beat={n32}")
+        sharps = int.from_bytes(data2[:1], "big", signed=True)
+        key = (MINOR_KEYS[sharps + 7] + "m") if data2[1] else MAJOR_KEYS[sharps + 7]
+        return f"key_signature key={key}"
+    if status >= 0xF0:
+        return f"sysex data={bytes([status]).hex().upper()}{data2.hex().upper()}"
+    kind, channel = status & 0xF0, status & 0x0F
+    if kind == 0xE0:
+        return f"pitchwheel channel={channel} pitch={((data2 << 7) | data1) - 8192}"
+    name, fields = CHANNEL_EVENTS[kind]
+    values = " ".join(f"{field}={value}" for field, value in zip(fields, (data1, data2)))
+    return f"{name} channel={channel} {values}"
+
+def format_event_beat(beat: float) -> str:
+    text = f"{beat:.4f}".rstrip("0")
+    return text + "0" if text.endswith(".") else text
+
+def read_varlen(data, pos: int) -> Tuple[int, int]:
+    """Decode a variable-length quantity at pos; return (value, next pos)."""
+    value = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value = (value << 7) | (b & 0x7F)
+        if b < 0x80:
+            return value, pos
+
+class MidiReader:
+    """Standard MIDI File reader over a memory map.
+
+    Only the header and chunk table are read up front; each MTrk chunk is
+    decoded lazily by events() into (tick, status, data1, data2) tuples with
+    absolute ticks and running status resolved. Channel messages carry their
+    data bytes (data2 is 0 for one-byte messages); meta events are
+    (tick, 0xFF, meta type, payload bytes) and sysex events
+    (tick, 0xF0 or 0xF7, 0, payload bytes).
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self.data[:4] != b"MThd":
+                raise ValueError(f"{path}: not a Standard MIDI File")
+            header_len, self.format, ntracks, self.ticks_per_beat = struct.unpack_from(">IHHH", self.data, 4)
+            # (start, end) offsets of each MTrk chunk's data; other chunks are skipped
+            self.tracks: List[Tuple[int, int]] = []
+            pos = 8 + header_len
+            while pos + 8 <= len(self.data) and len(self.tracks) < ntracks:
+                chunk_id = self.data[pos:pos + 4]
+                (size,) = struct.unpack_from(">I", self.data, pos + 4)
+                start = pos + 8
+                if chunk_id == b"MTrk":
+                    self.tracks.append((start, min(start + size, len(self.data))))
+                pos = start + size
+        except BaseException:
+            self.data.close()
+            raise
+
+    def events(self, track: int) -> Iterator[MidiEvent]:
+        """Yield one track's events in file order."""
+        data = self.data
+        pos, end = self.tracks[track]
+        tick = 0
+        running = 0
+        while pos < end:
+            delta, pos = read_varlen(data, pos)
+            tick += delta
+            status = data[pos]
+            if status < 0x80:
+                if not running:
+                    raise ValueError(f"running status without a status byte at offset {pos}")
+                status = running
+            else:
+                pos += 1
+                if status < 0xF0:
+                    # meta and sysex events leave running status alone
+                    running = status
+            if status < 0xF0:
+                if 0xC0 <= status < 0xE0:
+                    yield tick, status, data[pos], 0
+                    pos += 1
+                else:
+                    yield tick, status, data[pos], data[pos + 1]
+                    pos += 2
+            elif status == 0xFF:
+                meta_type = data[pos]
+                length, pos = read_varlen(data, pos + 1)
+                yield tick, status, meta_type, data[pos:pos + length]
+                pos += length
+            elif status in (0xF0, 0xF7):
+                length, pos = read_varlen(data, pos)
+                yield tick, status, 0, data[pos:pos + length]
+                pos += length
+            else:
+                n = SYSTEM_DATA_BYTES.get(status, 0)
+                yield tick, status, data[pos] if n > 0 else 0, data[pos + 1] if n > 1 else 0
+                pos += n
+
+    def close(self):
+        self.data.close()
+
 @dataclass
 class NoteEvent:
     start_tick: int
@@ -21,27 +168,25 @@ class NoteEvent:
     channel: int
     voice: int
     patch: int
+    track: int = 0
+    midi: int = 0
+    stream: int = 0
 
 class MidiParser:
     def __init__(self, path: str):
-        self.midi = MidiFile(path)
-        self.ticks_per_beat = self.midi.ticks_per_beat
+        self.reader = MidiReader(path)
+        self.ticks_per_beat = self.reader.ticks_per_beat
+        # filled by parse_notes, which reads tempo events in the same pass;
+        # program changes are keyed by (track, channel) and voices by
+        # (track, channel, stream), stream 0 unless VoiceSeparator splits it
         self.tempo_changes: List[Tuple[int, int]] = []
-        self.program_changes: Dict[int, int] = {}
-        self.voice_map: Dict[int, int] = {}
-        self._collect_meta()
-
-    def _collect_meta(self):
-        abs_ticks = 0
-        for track in self.midi.tracks:
-            abs_ticks = 0
-            for msg in track:
-                abs_ticks += msg.time
-                if msg.type == 'set_tempo':
-                    self.tempo_changes.append((abs_ticks, msg.tempo))
-        # Ensure default tempo at start
-        if not any(bt == 0 for bt, _ in self.tempo_changes):
-            self.tempo_changes.insert(0, (0, 500000))
+        self.program_changes: Dict[Tuple[int, int], int] = {}
+        self.voice_map: Dict[Tuple[int, int, int], int] = {}
+        # (tick, status, data1, data2) of the non-note events for # events;
+        # program changes are carried by the patches and pans (CC10) kept
+        # apart as (tick, track, channel, value) for `// Pan` directives
+        self.events: List[MidiEvent] = []
+        self.pans: List[Tuple[int, int, int, int]] = []
 
     def ticks_to_beats(self, tick: int) -> float:
         """
@@ -49,88 +194,297 @@ class MidiParser:
         """
         return tick / self.ticks_per_beat
 
+    def track_events(self, track: int) -> Iterator[Tuple[int, int, int, int, Union[int, bytes]]]:
+        """Yield (absolute tick, track, status, data1, data2) for one track, in time order."""
+        for tick, status, data1, data2 in self.reader.events(track):
+            yield tick, track, status, data1, data2
+
     def parse_notes(self) -> List[NoteEvent]:
-        # Collect all note and program messages per voice track (skip track 0 which is meta)
-        all_events: List[Tuple[int, int, MetaMessage]] = []
-        for voice_idx, track in enumerate(self.midi.tracks[1:]):
-            abs_tick = 0
-            for msg in track:
-                abs_tick += msg.time
-                all_events.append((abs_tick, voice_idx, msg))
-
-        # Sort events by absolute tick to merge tracks
-        all_events.sort(key=lambda x: x[0])
-
-        active: Dict[int, List[Tuple[int, int, int]]] = {}
+        # Each track is already time-ordered, so merge the per-track streams;
+        # ties keep track order. Every (track, channel) pair that plays a note
+        # or sets a program is a voice, so format-0 and multi-channel tracks
+        # split like one-channel-per-track files; track 0 is usually only the
+        # conductor.
+        all_events = heapq.merge(
+            *(self.track_events(track) for track in range(len(self.reader.tracks))),
+            key=lambda x: x[0])
+
+        # Open notes per (track, channel, note), oldest first, so a note-off
+        # closes the earliest matching note-on in O(1).
+        active: Dict[Tuple[int, int, int], Deque[Tuple[int, int]]] = defaultdict(deque)
         note_events: List[NoteEvent] = []
 
-        for abs_tick, voice_idx, msg in all_events:
-            # Track program changes per track
-            if msg.type == 'program_change':
-                self.program_changes[voice_idx] = msg.program
-                if voice_idx not in self.voice_map:
-                    self.voice_map[voice_idx] = len(self.voice_map)
-
-            # Note on
-            if msg.type == 'note_on' and msg.velocity > 0:
-                active.setdefault(voice_idx, []).append((abs_tick, msg.note, msg.velocity))
-                if voice_idx not in self.voice_map:
-                    self.voice_map[voice_idx] = len(self.voice_map)
-
-            # Note off
-            elif voice_idx in active and (msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0)):
-                for i, (t0, note, vel) in enumerate(active[voice_idx]):
-                    if note == msg.note:
-                        ev = NoteEvent(
+        try:
+            for abs_tick, track, status, data1, data2 in all_events:
+                if status == 0xFF:
+                    if data1 == 0x51 and len(data2) == 3:
+                        self.tempo_changes.append((abs_tick, int.from_bytes(data2, "big")))
+                    elif (data1 in TEXT_META or (data1 == TIME_SIGNATURE and len(data2) >= 4)
+                          or (data1 == KEY_SIGNATURE and len(data2) >= 2 and -7 <= (data2[0] ^ 0x80) - 0x80 <= 7)):
+                        self.events.append((abs_tick, status, data1, data2))
+                    continue
+                if status >= 0xF0:
+                    if status == 0xF0 or status == 0xF7:
+                        self.events.append((abs_tick, status, data1, data2))
+                    continue
+                kind = status & 0xF0
+                channel = status & 0x0F
+                if kind == 0xB0 and data1 == PAN_CONTROL:
+                    self.pans.append((abs_tick, track, channel, data2))
+                elif 0xA0 <= kind <= 0xE0 and kind != 0xC0:
+                    self.events.append((abs_tick, status, data1, data2))
+
+                # Track program changes per (track, channel)
+                if kind == 0xC0:
+                    self.program_changes[(track, channel)] = data1
+
+                # Note on
+                elif kind == 0x90 and data2 > 0:
+                    active[(track, channel, data1)].append((abs_tick, data2))
+
+                # Note off
+                elif kind == 0x80 or kind == 0x90:
+                    pending = active.get((track, channel, data1))
+                    if pending:
+                        t0, vel = pending.popleft()
+                        note_events.append(NoteEvent(
                             start_tick=t0,
                             stop_tick=abs_tick,
-                            note=midi_note_to_name(note),
+                            note=midi_note_to_name(data1),
                             velocity=vel,
-                            channel=msg.channel,
-                            voice=self.voice_map[voice_idx],
-                            patch=self.program_changes.get(voice_idx, 0)
-                        )
-                        note_events.append(ev)
-                        del active[voice_idx][i]
-                        break
+                            channel=channel,
+                            voice=0,
+                            patch=self.program_changes.get((track, channel), 0),
+                            track=track,
+                            midi=data1
+                        ))
+        finally:
+            self.reader.close()
+
+        # Ensure default tempo at start
+        if not any(bt == 0 for bt, _ in self.tempo_changes):
+            self.tempo_changes.insert(0, (0, 500000))
 
         if not note_events:
             raise RuntimeError("No note events found in MIDI input.")
+
+        self.number_voices(note_events)
         return note_events
 
+    def number_voices(self, notes: List[NoteEvent]):
+        """Number voices in (track, channel, stream) order, independent of entry order.
+        A (track, channel) that only sets a program is a voice too, so an
+        all-rest column written by the parser keeps its place."""
+        keys = sorted({(n.track, n.channel, n.stream) for n in notes}
+                      | {(track, channel, 0) for track, channel in self.program_changes})
+        self.voice_map = {key: v for v, key in enumerate(keys)}
+        for n in notes:
+            n.voice = self.voice_map[(n.track, n.channel, n.stream)]
+
+# Cost, in semitones, of starting a new stream for a note rather than
+# continuing a free stream with it: four octaves, so streams open only when
+# the chord outnumbers the free streams, not when a free one is merely far.
+NEW_STREAM_COST = 48
+
+class VoiceSeparator:
+    """Split polyphonic (track, channel) voices into monophonic streams.
+
+    Notes are taken in onset clusters (equal start ticks). Each cluster is
+    matched to the streams that are free at its onset, pitch-ordered, by
+    minimizing the summed pitch distance to each stream's last note; a note
+    may open a new stream instead for NEW_STREAM_COST. The matching never
+    crosses pitch order, so it is a DP over (chord note, free stream) in
+    O(m*k) for m chord notes and k streams. Streams are then numbered from
+    the highest mean pitch down, and the parser's voice_map renumbered.
+    """
+
+    def __init__(self, notes: List[NoteEvent], parser: MidiParser,
+                 new_stream_cost: int = NEW_STREAM_COST):
+        self.notes = notes
+        self.parser = parser
+        self.new_stream_cost = new_stream_cost
+        # A stream still sounding this long past an onset counts as free
+        # (legato overlap rather than a second line).
+        self.legato_ticks = parser.ticks_per_beat // 16
+
+    def assign(self, chord: List[int], streams: List[int]) -> List[Optional[int]]:
+        """Index into `streams` (sorted pitches of free streams) for each
+        note of `chord` (sorted pitches), or None to open a new stream."""
+        m, k = len(chord), len(streams)
+        new = self.new_stream_cost
+        # cost[i][j]: first i chord notes placed using only the first j streams
+        cost = [[0] * (k + 1) for _ in range(m + 1)]
+        for i in range(1, m + 1):
+            cost[i][0] = i * new
+        for i in range(1, m + 1):
+            for j in range(1, k + 1):
+                cost[i][j] = min(cost[i][j - 1],
+                                 cost[i - 1][j] + new,
+                                 cost[i - 1][j - 1] + abs(chord[i - 1] - streams[j - 1]))
+        plan: List[Optional[int]] = [None] * m
+        i, j = m, k
+        while i > 0:
+            if j > 0 and cost[i][j] == cost[i][j - 1]:
+                j -= 1
+            elif j > 0 and cost[i][j] == cost[i - 1][j - 1] + abs(chord[i - 1] - streams[j - 1]):
+                plan[i - 1] = j - 1
+                i -= 1
+                j -= 1
+            else:
+                i -= 1
+        return plan
+
+    def split(self, notes: List[NoteEvent]):
+        """Set .stream on the notes of one (track, channel) voice."""
+        notes.sort(key=lambda n: (n.start_tick, n.midi))
+        ends: List[int] = []     # per stream: stop tick of its last note
+        pitches: List[int] = []  # per stream: midi of its last note
+        i = 0
+        while i < len(notes):
+            onset = notes[i].start_tick
+            j = i
+            while j < len(notes) and notes[j].start_tick == onset:
+                j += 1
+            chord = notes[i:j]
+            free = sorted((pitches[s], s) for s in range(len(ends))
+                          if ends[s] <= onset + self.legato_ticks)
+            plan = self.assign([n.midi for n in chord], [p for p, _ in free])
+            for n, slot in zip(chord, plan):
+                if slot is None:
+                    stream = len(ends)
+                    ends.append(0)
+                    pitches.append(0)
+                else:
+                    stream = free[slot][1]
+                n.stream = stream
+                ends[stream] = n.stop_tick
+                pitches[stream] = n.midi
+            i = j
+
+        # Number streams top-down by mean pitch
+        total: Dict[int, int] = defaultdict(int)
+        count: Dict[int, int] = defaultdict(int)
+        for n in notes:
+            total[n.stream] += n.midi
+            count[n.stream] += 1
+        order = sorted(total, key=lambda s: -total[s] / count[s])
+        rank = {s: r for r, s in enumerate(order)}
+        for n in notes:
+            n.stream = rank[n.stream]
+
+    def separate(self) -> List[NoteEvent]:
+        sources: Dict[Tuple[int, int], List[NoteEvent]] = defaultdict(list)
+        for n in self.notes:
+            sources[(n.track, n.channel)].append(n)
+        for group in sources.values():
+            self.split(group)
+        self.parser.number_voices(self.notes)
+        return self.notes
+
+# Grid steps tried by detect_quantum, coarsest first.
+QUANTUM_CANDIDATES = [Fraction(1, d) for d in (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48)]
+# A boundary fits a step when it lies within this fraction of the step from the grid ...
+QUANTUM_TOLERANCE = Fraction(1, 8)
+# ... some step must fit this share of all note boundaries ...
+QUANTUM_COVERAGE = 0.95
+# ... and the coarsest step that fits within this share of the best-fitting one is chosen.
+QUANTUM_NOISE = 0.01
+QUANTUM_FALLBACK = Fraction(1, 12)
+
+def parse_quantum(text: str) -> Union[str, Fraction]:
+    """argparse type for --quantize: "auto" or a positive beat fraction such as 1/12 or 0.25."""
+    if text == "auto":
+        return text
+    try:
+        value = Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError(f"expected 'auto' or a beat fraction, got {text!r}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"quantum must be positive, got {text!r}")
+    return value
+
+def detect_quantum(notes: List[NoteEvent], ticks_per_beat: int) -> Fraction:
+    """Coarsest candidate step (in beats) that the note starts and stops sit
+    on, up to humanization: the common subdivision of the durations in use,
+    e.g. 1/6 for eighths mixed with triplets. A step must fit as many
+    boundaries as the best-fitting candidate, give or take QUANTUM_NOISE, so
+    a few half-beat notes among whole beats still get a half-beat step.
+    Falls back to 1/12 beat when no candidate fits QUANTUM_COVERAGE."""
+    positions: Dict[int, int] = defaultdict(int)
+    for n in notes:
+        positions[n.start_tick % ticks_per_beat] += 1
+        positions[n.stop_tick % ticks_per_beat] += 1
+    total = 2 * len(notes)
+    coverage = []
+    for quantum in QUANTUM_CANDIDATES:
+        step = ticks_per_beat * quantum
+        tolerance = step * QUANTUM_TOLERANCE
+        fitting = 0
+        for pos, count in positions.items():
+            off = Fraction(pos) % step
+            if min(off, step - off) <= tolerance:
+                fitting += count
+        coverage.append(fitting / total)
+    best = max(coverage)
+    if best < QUANTUM_COVERAGE:
+        return QUANTUM_FALLBACK
+    return next(quantum for quantum, share in zip(QUANTUM_CANDIDATES, coverage)
+                if share >= best - QUANTUM_NOISE)
+
 class Scheduler:
-    def __init__(self, notes: List[NoteEvent], parser: MidiParser):
+    def __init__(self, notes: List[NoteEvent], parser: MidiParser, verbose: bool = False,
+                 quantum: Optional[Fraction] = None):
         self.notes = notes
         self.parser = parser
         self.tpb = parser.ticks_per_beat
         self.timeline: List[float] = []
+        self.verbose = verbose
+        # Snap starts and stops to multiples of this many beats when set
+        self.quantum = quantum
+
+    def span(self, n: NoteEvent) -> Tuple[float, float]:
+        """(start, stop) beats of a note, snapped to the quantum grid when one
+        is set; a snapped note keeps at least one step."""
+        if self.quantum is None:
+            return self.parser.ticks_to_beats(n.start_tick), self.parser.ticks_to_beats(n.stop_tick)
+        num, den = self.quantum.numerator, self.quantum.denominator
+        step = self.tpb * num / den
+        k0 = round(n.start_tick / step)
+        k1 = max(round(n.stop_tick / step), k0 + 1)
+        return k0 * num / den, k1 * num / den
 
     def build_timeline(self):
         times = set()
+        # stop beat -> earliest start among the notes stopping there
+        self.stops: Dict[float, float] = {}
         for n in self.notes:
-            times.add(self.parser.ticks_to_beats(n.start_tick))
-            times.add(self.parser.ticks_to_beats(n.stop_tick))
+            start, stop = self.span(n)
+            times.update((start, stop))
+            self.stops[stop] = min(start, self.stops.get(stop, start))
         self.timeline = sorted(times)
 
     def schedule(self) -> Dict[int, Dict[float, str]]:
+        """Map voice -> {beat: cell} for attacks and holds; beats missing
+        from a voice's map are rests."""
         self.build_timeline()
         voices = set(n.voice for n in self.notes)
         grid: Dict[int, Dict[float, str]] = {v: {} for v in voices}
 
-        # Debug: print note tick-to-beat mappings
-        for n in self.notes:
-            b_start = self.parser.ticks_to_beats(n.start_tick)
-            b_stop = self.parser.ticks_to_beats(n.stop_tick)
-            print(f"DEBUG Note voice {n.voice} pitch {n.note}: "
-                  f"tick {n.start_tick}->{b_start:.3f} beats, "
-                  f"tick {n.stop_tick}->{b_stop:.3f} beats",
-                  file=sys.stderr)
+        if self.verbose:
+            # Debug: print note tick-to-beat mappings
+            if self.quantum is not None:
+                print(f"DEBUG quantum: {self.quantum} beat", file=sys.stderr)
+            for n in self.notes:
+                b_start, b_stop = self.span(n)
+                print(f"DEBUG Note voice {n.voice} pitch {n.note}: "
+                      f"tick {n.start_tick}->{b_start:.3f} beats, "
+                      f"tick {n.stop_tick}->{b_stop:.3f} beats",
+                      file=sys.stderr)
 
-        print("DEBUG timeline beats:", self.timeline, file=sys.stderr)
+            print("DEBUG timeline beats:", self.timeline, file=sys.stderr)
 
         for n in self.notes:
-            start = self.parser.ticks_to_beats(n.start_tick)
-            stop  = self.parser.ticks_to_beats(n.stop_tick)
+            start, stop = self.span(n)
 
             # Compute duration in beats exactly once
             dur_beats = (stop - start)
@@ -141,109 +495,289 @@ class Scheduler:
             cell      = f"{n.note}{dur_str}{vel_str}{patch_str}"
             grid[n.voice][start] = cell
 
-            # Fill holds
-            for t in self.timeline:
-                if start < t < stop:
-                    grid[n.voice][t] = "-"
-
-        # Fill rests
-        for v in voices:
-            for t in self.timeline:
-                grid[v].setdefault(t, ".")
+            # Fill holds: only the timeline slice strictly inside the note
+            for t in self.timeline[bisect_right(self.timeline, start):bisect_left(self.timeline, stop)]:
+                grid[n.voice][t] = "-"
 
+        # Rests are implied: any (voice, beat) without a cell is "."
         return grid
     
 class GridEmitter:
+    # Rows are handed to the output in batches of this many lines.
+    BATCH_LINES = 1024
+
     def __init__(self,
                  grid: Dict[int, Dict[float, str]],
                  timeline: List[float],
-                 program_changes: Dict[int, int],
-                 voice_map: Dict[int, int],
+                 program_changes: Dict[Tuple[int, int], int],
+                 voice_map: Dict[Tuple[int, int, int], int],
                  tempo_changes: List[Tuple[int, int]],
-                 ticks_per_beat: int):
+                 ticks_per_beat: int,
+                 out: Optional[TextIO] = None,
+                 fixed_width: Optional[int] = None,
+                 compact: bool = False,
+                 events: Optional[List[MidiEvent]] = None,
+                 stops: Optional[Dict[float, float]] = None,
+                 pans: Optional[List[Tuple[int, int, int, int]]] = None):
         self.grid = grid
         self.timeline = timeline
         self.program_changes = program_changes
         self.voice_map = voice_map
         self.tempo_changes = tempo_changes
         self.tpb = ticks_per_beat
+        self.out = out if out is not None else sys.stdout
+        self.fixed_width = fixed_width
+        # Drop rows without an attack unless a note stop there is needed
+        self.compact = compact
+        self.events = events or []
+        self.stops = stops or {}
+        # (beat, voice, value) per pan on a voice's channel, in time order;
+        # pans on channels without notes or programs are dropped
+        channel_voices: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for (track, ch, _), v in sorted(voice_map.items(), key=lambda kv: kv[1]):
+            channel_voices[(track, ch)].append(v)
+        self.pans = sorted(((tick / ticks_per_beat, v, value) for tick, track, ch, value in pans or []
+                            for v in channel_voices.get((track, ch), [])), key=lambda p: p[0])
+        self.pending: List[str] = []
+        self.rows = 0
+
+    def cell(self, voice: int, beat: float) -> str:
+        """Cell text at a beat; rests are implied by absence."""
+        return self.grid.get(voice, {}).get(beat, ".")
+
+    def write(self, line: str = ""):
+        self.pending.append(line)
+        if len(self.pending) >= self.BATCH_LINES:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.out.write("\n".join(self.pending) + "\n")
+            self.pending = []
+
+    def write_pans(self, i: int, beat: float) -> int:
+        """Write `// Pan` lines for the pans from index i up to beat, which
+        the parser applies at the next grid row; return the next index."""
+        while i < len(self.pans) and self.pans[i][0] <= beat + 1e-9:
+            _, v, value = self.pans[i]
+            self.write(f"// Pan V{v}: {value}")
+            i += 1
+        return i
+
+    def column_widths(self, voice_labels: Dict[int, str]) -> List[int]:
+        """Beat and voice column widths: a full pass over every cell, or
+        the fixed width (never narrower than a label) with no pass at all."""
+        beat_col = "#beat"
+        if self.fixed_width is not None:
+            return [max(len(beat_col), self.fixed_width)] + [
+                max(len(voice_labels[v]), self.fixed_width) for v in range(len(voice_labels))]
+        col_widths = [max(len(beat_col), 5)]
+        for v in range(len(voice_labels)):
+            col_widths.append(max(len(voice_labels[v]), 1))
+        # update col widths
+        for t in self.timeline:
+            bstr = f"{t:.2f}".rstrip('0').rstrip('.')
+            col_widths[0] = max(col_widths[0], len(bstr))
+            for v in voice_labels:
+                col_widths[v+1] = max(col_widths[v+1], len(self.cell(v, t)))
+        return col_widths
 
     def emit(self):
         # header
-        print("# midgrid")
+        self.write("# midgrid")
         seen = set()
         for tick, tempo in sorted(self.tempo_changes):
-            bpm = tempo2bpm(tempo)
+            bpm = tempo_to_bpm(tempo)
             beat = tick / self.tpb
             if bpm not in seen:
                 seen.add(bpm)
                 if beat > 0:
-                    print(f"# tempo {bpm:.2f} {beat:.2f}".rstrip('0').rstrip('.'))
+                    self.write(f"# tempo {bpm:.2f} {beat:.2f}".rstrip('0').rstrip('.'))
                 else:
-                    print(f"# tempo {bpm:.2f}")
+                    self.write(f"# tempo {bpm:.2f}")
 
         # determine labels
         max_voice = max(self.voice_map.values()) + 1
         voice_labels = {v: f"V{v}" for v in range(max_voice)}
-        for ch, v in self.voice_map.items():
+        for (track, ch, _), v in self.voice_map.items():
             lbl = voice_labels[v]
-            patch = self.program_changes.get(ch, 0)
-            print(f"// Patch {lbl}: {patch}")
+            patch = self.program_changes.get((track, ch), 0)
+            self.write(f"// Patch {lbl}: {patch}")
+        next_pan = self.write_pans(0, self.timeline[0] if self.timeline else 0.0)
 
         # print header row
         beat_col = "#beat"
-        col_widths = [max(len(beat_col), 5)]
-        for v in range(len(voice_labels)):
-            col_widths.append(max(len(voice_labels[v]), 1))
-        # update col widths
-        for t in self.timeline:
-            bstr = f"{t:.2f}".rstrip('0').rstrip('.')
-            col_widths[0] = max(col_widths[0], len(bstr))
-            for v in voice_labels:
-                col_widths[v+1] = max(col_widths[v+1], len(self.grid[v][t]))
-
+        col_widths = self.column_widths(voice_labels)
         header = [beat_col.ljust(col_widths[0])]
         for v in range(len(voice_labels)):
             header.append(voice_labels[v].ljust(col_widths[v+1]))
-        print(" | ".join(header))
+        self.write(" | ".join(header))
 
         # print rows
+        last_row = None
         for t in self.timeline:
-            # skip empty
-            if all(self.grid[v][t] == "." for v in voice_labels):
-                continue
-            beat = t
-            row = [f"{beat:.2f}".rstrip('0').ljust(col_widths[0])]
-            for v in voice_labels:
-                row.append(self.grid[v][t].ljust(col_widths[v+1]))
-            print(" | ".join(row))
+            cells = [self.cell(v, t) for v in voice_labels]
+            # A hold runs to the next row, so a row without an attack stays
+            # whenever a row was written inside a note stopping there.
+            if all(c == "." or c == "-" for c in cells):
+                needed = t in self.stops and last_row is not None and last_row > self.stops[t]
+                # skip empty
+                if not needed and (self.compact or all(c == "." for c in cells)):
+                    continue
+            last_row = t
+            next_pan = self.write_pans(next_pan, t)
+            row = [f"{t:.2f}".rstrip('0').ljust(col_widths[0])]
+            for v, c in enumerate(cells):
+                row.append(c.ljust(col_widths[v+1]))
+            self.write(" | ".join(row))
+            self.rows += 1
 
         # events section
-        print("\n# events")
-        emitted = set()
-        for tick, msg in sorted(self.tempo_changes + []):
-            pass  # tempo already handled
-        # we skip detailed event emission here for brevity
+        self.write()
+        self.write("# events")
+        for tick, status, data1, data2 in self.events:
+            self.write(f"[{format_event_beat(tick / self.tpb)}] {describe_event(status, data1, data2)}")
+        self.flush()
 
 class MidGridEmitter:
-    def __init__(self, path: str):
+    def __init__(self, path: str, output: Optional[str] = None,
+                 verbose: bool = False, fixed_width: Optional[int] = None,
+                 quantize: Union[None, str, Fraction] = None, compact: bool = False,
+                 separate: bool = False):
         self.path = path
-
-    def run(self):
+        self.output = output
+        self.verbose = verbose
+        self.fixed_width = fixed_width
+        self.quantize = quantize
+        self.compact = compact
+        self.separate = separate
+
+    def run(self) -> Dict[str, int]:
+        """Convert the file; return note, voice and grid row counts."""
         parser = MidiParser(self.path)
         notes = parser.parse_notes()
-        scheduler = Scheduler(notes, parser)
+        if self.separate:
+            notes = VoiceSeparator(notes, parser).separate()
+        quantum = self.quantize
+        if quantum == "auto":
+            quantum = detect_quantum(notes, parser.ticks_per_beat)
+        scheduler = Scheduler(notes, parser, verbose=self.verbose, quantum=quantum)
         grid = scheduler.schedule()
+        if self.output is None:
+            rows = self.emit(grid, scheduler, parser, sys.stdout)
+        else:
+            with open(self.output, "w", encoding="utf-8", buffering=1 << 20) as out:
+                rows = self.emit(grid, scheduler, parser, out)
+        return {"notes": len(notes), "voices": len(parser.voice_map), "rows": rows}
+
+    def emit(self, grid, scheduler: Scheduler, parser: MidiParser, out: TextIO) -> int:
         emitter = GridEmitter(grid,
                               scheduler.timeline,
                               parser.program_changes,
                               parser.voice_map,
                               parser.tempo_changes,
-                              parser.ticks_per_beat)
+                              parser.ticks_per_beat,
+                              out=out,
+                              fixed_width=self.fixed_width,
+                              compact=self.compact,
+                              events=parser.events,
+                              stops=scheduler.stops,
+                              pans=parser.pans)
         emitter.emit()
+        return emitter.rows
+
+
+MIDI_SUFFIXES = (".mid", ".midi")
+
+def convert_file(job: Tuple[str, str, Dict[str, object]]) -> Dict[str, object]:
+    """Batch worker: convert one (input, output, MidGridEmitter options) job
+    and return its NDJSON record; failures are reported, not raised."""
+    src, dst, options = job
+    start = time.perf_counter()
+    record: Dict[str, object] = {"input": src, "output": dst, "ok": False}
+    try:
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        record.update(MidGridEmitter(src, dst, **options).run())
+        record["ok"] = True
+    except Exception as exc:
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    record["ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+    return record
+
+def run_batch(batch_dir: str, out_dir: str, jobs: int, options: Dict[str, object]) -> int:
+    """Convert every .mid/.midi under batch_dir to a .midgrid at the same
+    relative path under out_dir, across `jobs` processes. One NDJSON record
+    per file goes to stdout as it finishes; returns 1 if any file failed.
+    Sources that map to an output already taken (x.mid and x.MIDI) fail
+    without converting, so no grid is silently overwritten."""
+    root = Path(batch_dir)
+    sources = sorted(p for p in root.rglob("*") if p.suffix.lower() in MIDI_SUFFIXES and p.is_file())
+    work: List[Tuple[str, str, Dict[str, object]]] = []
+    claimed: Dict[str, str] = {}
+    failed = 0
+    for p in sources:
+        src, dst = str(p), str(Path(out_dir) / p.relative_to(root).with_suffix(".midgrid"))
+        if dst in claimed:
+            failed += 1
+            print(json.dumps({"input": src, "output": dst, "ok": False,
+                              "error": f"output already claimed by {claimed[dst]}", "ms": 0.0}), flush=True)
+            continue
+        claimed[dst] = src
+        work.append((src, dst, options))
+    if jobs <= 1:
+        for job in work:
+            record = convert_file(job)
+            failed += not record["ok"]
+            print(json.dumps(record), flush=True)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for future in as_completed([pool.submit(convert_file, job) for job in work]):
+                record = future.result()
+                failed += not record["ok"]
+                print(json.dumps(record), flush=True)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Convert a MIDI file to MidGrid text.")
+    parser.add_argument("input", nargs="?", help="input .mid file")
+    parser.add_argument("-o", "--output", help="write the grid to this path instead of stdout")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="convert every .mid/.midi under DIR (needs --out); "
+                             "prints one NDJSON record per file")
+    parser.add_argument("--out", metavar="DIR", help="output directory for --batch")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                        help="worker processes for --batch (default: CPU count)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print per-note DEBUG tick/beat mappings to stderr")
+    parser.add_argument("--fixed-width", type=int, metavar="N",
+                        help="pad every column to N characters and stream rows "
+                             "without the column-width pass")
+    parser.add_argument("--quantize", type=parse_quantum, metavar="Q",
+                        help="snap note starts and stops to multiples of Q beats "
+                             "(e.g. 1/12, 0.25), or 'auto' to detect the step")
+    parser.add_argument("--compact", action="store_true",
+                        help="omit rows without an attack whose note stops the holds already imply")
+    parser.add_argument("--separate", action="store_true",
+                        help="split polyphonic tracks/channels into monophonic voices "
+                             "by nearest pitch")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    cli = build_parser()
+    args = cli.parse_args(argv)
+    options = dict(verbose=args.verbose, fixed_width=args.fixed_width,
+                   quantize=args.quantize, compact=args.compact, separate=args.separate)
+    if args.batch:
+        if args.input or args.output or not args.out:
+            cli.error("--batch takes --out DIR and no input file or -o")
+        return run_batch(args.batch, args.out, args.jobs, options)
+    if not args.input:
+        cli.error("an input .mid file or --batch DIR is required")
+    MidGridEmitter(args.input, args.output, **options).run()
+    return 0
+
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: midgrid_emitter.py <input.mid>")
-        sys.exit(1)
-    MidGridEmitter(sys.argv[1]).run()
\ No newline at end of file
+    sys.exit(main())
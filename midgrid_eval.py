@@ -4,12 +4,14 @@
 from __future__ import annotations
 
 import argparse
+import io
 import json
 import subprocess
 import sys
 import tempfile
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 from midgrid_lint import lint_text
 
@@ -74,6 +76,21 @@ MELODIC_FUSION_WARN_LEN = 4.5
 HOMORHYTHM_INFO = 0.5
 HOMORHYTHM_WARN = 0.8
 
+# Relative cost of each detector, used by --fail-fast to run the cheapest
+# first. Report walks are linear in beats x pairs (error-capable ones
+# first); the grid meta-analyses re-parse the file and slide windows per
+# voice pair. Only the grid meta-analyses are optional under --budget-ms.
+DETECTOR_COST = {
+    "voice_crossing": 0,
+    "parallel_perfects": 1,
+    "voice_fusion": 1,
+    "wide_adjacent_spacing": 2,
+    "high_complexity": 2,
+    "rhythmic_stratification": 3,
+    "melodic_fusion": 4,
+}
+OPTIONAL_DETECTORS = {"melodic_fusion", "rhythmic_stratification"}
+
 
 def report_path_with_suffix(mid_path: Path, suffix: str) -> Path:
     if mid_path.name.endswith(".mid"):
@@ -95,9 +112,10 @@ def run_lint(path: Path) -> dict[str, Any]:
     }
 
 
-def run_parser(input_path: Path, midi_out: Path) -> dict[str, Any]:
+def run_parser(input_path: Path, midi_out: Path, omit_rest_pairs: bool = False) -> dict[str, Any]:
     proc = subprocess.run(
-        [sys.executable, "midgrid_parser.py", str(input_path), str(midi_out)],
+        [sys.executable, "midgrid_parser.py", str(input_path), str(midi_out)]
+        + (["--omit-rest-pairs"] if omit_rest_pairs else []),
         cwd=Path(__file__).resolve().parent,
         text=True,
         stdout=subprocess.PIPE,
@@ -122,6 +140,12 @@ def issue(severity: str, code: str, message: str, **fields: Any) -> dict[str, An
     return data
 
 
+def pair_voices(label: str) -> tuple[int, int]:
+    """Voice indices of a "V<a>-V<b>" pair label."""
+    a, b = label[1:].split("-V")
+    return int(a), int(b)
+
+
 def pair_map(beat: dict[str, Any]) -> dict[str, dict[str, Any]]:
     return {pair["voice_pair"]: pair for pair in beat.get("pairs", [])}
 
@@ -133,27 +157,33 @@ def interval_class(pair: dict[str, Any]) -> int | None:
     return interval % 12
 
 
-def detect_parallel_and_direct_perfects(report: dict[str, Any]) -> list[dict[str, Any]]:
+def parallel_perfect_issues(beats: list[dict[str, Any]], start: int = 0,
+                            stop: int | None = None) -> list[tuple[int, dict[str, Any]]]:
+    """Scan beats[start:stop] (the first one only seeds the previous pairs);
+    each issue is tagged with the index of the beat that raised it. A pair
+    missing from a beat (rest pairs omitted) is a rest."""
     issues = []
-    beats = report.get("beats", [])
     previous_by_pair: dict[str, dict[str, Any]] = {}
     previous_beat_by_pair: dict[str, float] = {}
+    previous_index_by_pair: dict[str, int] = {}
 
-    for beat in beats:
+    for index in range(start, len(beats) if stop is None else stop):
+        beat = beats[index]
         current_beat = beat["beat"]
         for pair in beat.get("pairs", []):
             label = pair["voice_pair"]
             prev = previous_by_pair.get(label)
-            if prev is None:
+            if prev is None or previous_index_by_pair[label] != index - 1:
                 previous_by_pair[label] = pair
                 previous_beat_by_pair[label] = current_beat
+                previous_index_by_pair[label] = index
                 continue
 
             prev_class = interval_class(prev)
             cur_class = interval_class(pair)
             if prev_class in PERFECT_CLASSES and cur_class in PERFECT_CLASSES:
                 if pair.get("motion") == "parallel" and prev_class == cur_class:
-                    issues.append(issue(
+                    issues.append((index, issue(
                         "error",
                         "parallel_perfect",
                         f"Parallel perfect interval in {label} from beat {previous_beat_by_pair[label]:g} to {current_beat:g}.",
@@ -162,9 +192,9 @@ def detect_parallel_and_direct_perfects(report: dict[str, Any]) -> list[dict[str
                         voice_pair=label,
                         previous_interval=prev.get("interval"),
                         interval=pair.get("interval"),
-                    ))
+                    )))
                 elif pair.get("motion") == "similar":
-                    issues.append(issue(
+                    issues.append((index, issue(
                         "warning",
                         "direct_perfect",
                         f"Similar motion into a perfect interval in {label} at beat {current_beat:g}.",
@@ -173,28 +203,65 @@ def detect_parallel_and_direct_perfects(report: dict[str, Any]) -> list[dict[str
                         voice_pair=label,
                         previous_interval=prev.get("interval"),
                         interval=pair.get("interval"),
-                    ))
+                    )))
 
             previous_by_pair[label] = pair
             previous_beat_by_pair[label] = current_beat
+            previous_index_by_pair[label] = index
     return issues
 
 
-def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
-    """Meta-analysis of the harmonic report: common-fate motion fuses two
-    voices toward one perceived stream, in proportion to how simple the
-    interval's ratio is. Strength is graded straight from the report's
-    perceptual_complexity (FUSION_SCALE / complexity per transition), so
-    parallel octaves grade far above parallel fourths, and imperfect
-    parallels only surface as sustained chains. Static doubling (pedal
-    points, drones) is not motion and is never reported."""
+def detect_parallel_and_direct_perfects(report: dict[str, Any]) -> list[dict[str, Any]]:
+    return [item for _, item in parallel_perfect_issues(report.get("beats", []))]
+
+
+def fusion_step(prev: dict[str, Any], pair: dict[str, Any]) -> float | None:
+    """Fusion strength one pair transition adds to a run, or None when the
+    transition is not common-fate motion and breaks the run."""
+    moving = False
+    try:
+        moving = pair["midis"][0] != prev["midis"][0]
+    except (KeyError, IndexError, TypeError):
+        moving = pair.get("motion") == "parallel"
+    complexity = pair.get("perceptual_complexity")
+    if pair.get("motion") == "parallel" and moving and complexity:
+        step = FUSION_SCALE / max(float(complexity), 1.0)
+        cls = interval_class(pair)
+        if cls not in ROOTED_CLASSES:
+            step *= 3.0 / DISPLACED_ODD_FACTOR.get(cls, 3)
+        return step
+    return None
+
+
+def fusion_quiet(beats: list[dict[str, Any]], index: int, voice: int | None = None) -> bool:
+    """True when no fusion run (of a pair with `voice`, if given) is still
+    open after beats[index]."""
+    if index == 0:
+        return True
+    previous = pair_map(beats[index - 1])
+    for pair in beats[index].get("pairs", []):
+        if voice is not None and voice not in pair["voices"]:
+            continue
+        prev = previous.get(pair["voice_pair"])
+        if prev is not None and fusion_step(prev, pair) is not None:
+            return False
+    return True
+
+
+def voice_fusion_issues(beats: list[dict[str, Any]], start: int = 0,
+                        stop: int | None = None) -> list[tuple[int, dict[str, Any]]]:
+    """Scan beats[start:stop] for fusion runs. Each issue is tagged with the
+    index of the beat whose arrival broke its run; runs still open at the
+    end are tagged with stop. A pair missing from a beat (rest pairs
+    omitted) is a rest: it breaks the pair's run there."""
+    stop = len(beats) if stop is None else stop
     issues = []
-    beats = report.get("beats", [])
     previous_by_pair: dict[str, dict[str, Any]] = {}
     previous_beat_by_pair: dict[str, float] = {}
+    previous_index_by_pair: dict[str, int] = {}
     runs: dict[str, dict[str, Any]] = {}
 
-    def flush(label: str) -> None:
+    def flush(label: str, index: int) -> None:
         run = runs.pop(label, None)
         if run is None:
             return
@@ -206,7 +273,7 @@ def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
         counts = f"({run['transitions']} transition{'s' if run['transitions'] > 1 else ''}, strength {strength:.1f} from the ratio table)"
         span = f"from beat {run['start']:g} to {run['end']:g}"
         if run["rooted"]:
-            issues.append(issue(
+            issues.append((index, issue(
                 severity,
                 "voice_fusion",
                 f"{label} move in parallel {run['interval']} {span} {counts}: "
@@ -215,9 +282,9 @@ def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
                 f"otherwise restore independence with contrary or oblique motion.",
                 beat=run["end"], start_beat=run["start"], voice_pair=label,
                 transitions=run["transitions"], strength=round(strength, 2),
-            ))
+            )))
         else:
-            issues.append(issue(
+            issues.append((index, issue(
                 severity,
                 "displaced_root_motion",
                 f"{label} travel in parallel {run['interval']} {span} {counts}: "
@@ -227,25 +294,28 @@ def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
                 f"or voice the root so the displacement is intentional.",
                 beat=run["end"], start_beat=run["start"], voice_pair=label,
                 transitions=run["transitions"], strength=round(strength, 2),
-            ))
+            )))
 
-    for beat in beats:
+    for index in range(start, stop):
+        beat = beats[index]
         current_beat = beat["beat"]
-        for pair in beat.get("pairs", []):
+        pairs: list[Any] = beat.get("pairs", [])
+        if runs:
+            present = {pair["voice_pair"] for pair in pairs}
+            missing = [label for label in runs if label not in present]
+            if missing:
+                # Flush broken runs in pair order, as rest pairs would.
+                pairs = sorted(pairs + missing, key=lambda item: pair_voices(
+                    item if isinstance(item, str) else item["voice_pair"]))
+        for pair in pairs:
+            if isinstance(pair, str):
+                flush(pair, index)
+                continue
             label = pair["voice_pair"]
             prev = previous_by_pair.get(label)
-            if prev is not None:
-                moving = False
-                try:
-                    moving = pair["midis"][0] != prev["midis"][0]
-                except (KeyError, IndexError, TypeError):
-                    moving = pair.get("motion") == "parallel"
-                complexity = pair.get("perceptual_complexity")
-                if pair.get("motion") == "parallel" and moving and complexity:
-                    step = FUSION_SCALE / max(float(complexity), 1.0)
-                    cls = interval_class(pair)
-                    if cls not in ROOTED_CLASSES:
-                        step *= 3.0 / DISPLACED_ODD_FACTOR.get(cls, 3)
+            if prev is not None and previous_index_by_pair[label] == index - 1:
+                step = fusion_step(prev, pair)
+                if step is not None:
                     run = runs.get(label)
                     if run is None:
                         runs[label] = {
@@ -261,15 +331,27 @@ def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
                         run["transitions"] += 1
                         run["strength"] += step
                 else:
-                    flush(label)
+                    flush(label, index)
             previous_by_pair[label] = pair
             previous_beat_by_pair[label] = current_beat
+            previous_index_by_pair[label] = index
 
     for label in list(runs):
-        flush(label)
+        flush(label, stop)
     return issues
 
 
+def detect_voice_fusion(report: dict[str, Any]) -> list[dict[str, Any]]:
+    """Meta-analysis of the harmonic report: common-fate motion fuses two
+    voices toward one perceived stream, in proportion to how simple the
+    interval's ratio is. Strength is graded straight from the report's
+    perceptual_complexity (FUSION_SCALE / complexity per transition), so
+    parallel octaves grade far above parallel fourths, and imperfect
+    parallels only surface as sustained chains. Static doubling (pedal
+    points, drones) is not motion and is never reported."""
+    return [item for _, item in voice_fusion_issues(report.get("beats", []))]
+
+
 def detect_melodic_fusion(input_path: Path) -> list[dict[str, Any]]:
     """Directional meta-analysis of the grid itself: sustained regions where
     a voice pair co-moves in the same direction. Severity is graded by how
@@ -278,8 +360,12 @@ def detect_melodic_fusion(input_path: Path) -> list[dict[str, Any]]:
     cue)."""
     from midgrid_motif import melodic_fusion, parse_midgrid
 
+    return melodic_fusion_issues(melodic_fusion(parse_midgrid(input_path)))
+
+
+def melodic_fusion_issues(regions: list[dict[str, Any]]) -> list[dict[str, Any]]:
     issues_list = []
-    for region in melodic_fusion(parse_midgrid(input_path)):
+    for region in regions:
         length = region["beat_end"] - region["beat_start"]
         severity = "warning" if length >= MELODIC_FUSION_WARN_LEN else "info"
         issues_list.append(issue(
@@ -306,9 +392,16 @@ def detect_rhythmic_stratification(input_path: Path) -> list[dict[str, Any]]:
     on a shared attack clock. High mean homorhythm = counter-melodies are
     really harmony parts; stratify by rate (double-speed figurae, augmented
     lines, attacks in the other voice's gaps)."""
-    from midgrid_motif import homorhythm_fractions, parse_midgrid
+    from midgrid_motif import parse_midgrid
+
+    return rhythmic_stratification_issues(parse_midgrid(input_path))
+
+
+def rhythmic_stratification_issues(voices: list[list[dict[str, Any]]],
+                                   regions: list[dict[str, Any]] | None = None) -> list[dict[str, Any]]:
+    from midgrid_motif import homorhythm_fractions
 
-    fractions = homorhythm_fractions(parse_midgrid(input_path))
+    fractions = homorhythm_fractions(voices, regions)
     if not fractions:
         return []
     mean_h = sum(fractions.values()) / len(fractions)
@@ -330,83 +423,941 @@ def detect_rhythmic_stratification(input_path: Path) -> list[dict[str, Any]]:
     )]
 
 
+def crossing_sort(items: list[tuple[int, int]], crossed_by: list[list[int]]) -> list[tuple[int, int]]:
+    """Merge sort (midi, position) pairs by pitch. While merging, every item
+    of the right (lower) half gets the positions of the left (upper) half
+    that sound below it appended to crossed_by, so the work is O(V log V)
+    plus the crossings found."""
+    if len(items) <= 1:
+        return items
+    middle = len(items) // 2
+    left = crossing_sort(items[:middle], crossed_by)
+    right = crossing_sort(items[middle:], crossed_by)
+    left_positions = [position for _midi, position in left]
+    merged: list[tuple[int, int]] = []
+    taken = 0
+    for lower in right:
+        while taken < len(left) and left[taken][0] < lower[0]:
+            merged.append(left[taken])
+            taken += 1
+        if taken:
+            crossed_by[lower[1]].extend(left_positions[:taken])
+        merged.append(lower)
+    merged.extend(left[taken:])
+    return merged
+
+
+def voice_crossing_at(beat: dict[str, Any]) -> list[dict[str, Any]]:
+    """Crossings among the sounding voices, in (upper, lower) voice order.
+    Sounding pitches that never rise from one voice to the next cannot
+    cross, which settles most beats in one pass; otherwise crossing_sort
+    lists the crossings in O(V log V + K) for K crossings, and a counting
+    pass over the lower voices puts them back in order."""
+    sounding = beat.get("sounding_midis", [])
+    active = [(index, midi) for index, midi in enumerate(sounding) if midi is not None]
+    if all(upper[1] >= lower[1] for upper, lower in zip(active, active[1:])):
+        return []
+    crossed_by: list[list[int]] = [[] for _ in active]
+    crossing_sort([(midi, position) for position, (_index, midi) in enumerate(active)], crossed_by)
+    crossed: list[list[int]] = [[] for _ in active]
+    for position, uppers in enumerate(crossed_by):
+        for upper_position in uppers:
+            crossed[upper_position].append(active[position][0])
+
+    issues = []
+    for position, (upper_idx, upper) in enumerate(active):
+        for lower_idx in crossed[position]:
+            lower = sounding[lower_idx]
+            issues.append(issue(
+                "error",
+                "voice_crossing",
+                f"V{upper_idx} sounds below V{lower_idx} at beat {beat['beat']:g}.",
+                beat=beat["beat"],
+                voices=[upper_idx, lower_idx],
+                midis=[upper, lower],
+            ))
+    return issues
+
+
 def detect_voice_crossing(report: dict[str, Any]) -> list[dict[str, Any]]:
+    return [item for beat in report.get("beats", []) for item in voice_crossing_at(beat)]
+
+
+def high_complexity_at(beat: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
     issues = []
-    for beat in report.get("beats", []):
-        sounding = beat.get("sounding_midis", [])
-        for upper_idx in range(len(sounding)):
-            upper = sounding[upper_idx]
-            if upper is None:
-                continue
-            for lower_idx in range(upper_idx + 1, len(sounding)):
-                lower = sounding[lower_idx]
-                if lower is None:
-                    continue
-                if upper < lower:
-                    issues.append(issue(
-                        "error",
-                        "voice_crossing",
-                        f"V{upper_idx} sounds below V{lower_idx} at beat {beat['beat']:g}.",
-                        beat=beat["beat"],
-                        voices=[upper_idx, lower_idx],
-                        midis=[upper, lower],
-                    ))
+    for pair in beat.get("pairs", []):
+        pscore = pair.get("perceptual_complexity")
+        if pscore is not None and pscore >= threshold:
+            issues.append(issue(
+                "warning",
+                "high_complexity",
+                f"{pair['voice_pair']} reaches perceptual complexity {pscore:g} at beat {beat['beat']:g}.",
+                beat=beat["beat"],
+                voice_pair=pair["voice_pair"],
+                interval=pair.get("interval"),
+                perceptual_complexity=pscore,
+                threshold=threshold,
+            ))
     return issues
 
 
 def detect_high_complexity(report: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    return [item for beat in report.get("beats", []) for item in high_complexity_at(beat, threshold)]
+
+
+def wide_adjacent_spacing_at(beat: dict[str, Any], threshold: int) -> list[dict[str, Any]]:
+    # Adjacent pairs come straight from the sounding voices: V - 1 checks
+    # instead of a walk over every pair in the frame.
     issues = []
-    for beat in report.get("beats", []):
-        for pair in beat.get("pairs", []):
-            pscore = pair.get("perceptual_complexity")
-            if pscore is not None and pscore >= threshold:
-                issues.append(issue(
-                    "warning",
-                    "high_complexity",
-                    f"{pair['voice_pair']} reaches perceptual complexity {pscore:g} at beat {beat['beat']:g}.",
-                    beat=beat["beat"],
-                    voice_pair=pair["voice_pair"],
-                    interval=pair.get("interval"),
-                    perceptual_complexity=pscore,
-                    threshold=threshold,
-                ))
+    sounding = beat.get("sounding_midis", [])
+    for upper_idx in range(len(sounding) - 1):
+        upper, lower = sounding[upper_idx], sounding[upper_idx + 1]
+        if upper is None or lower is None:
+            continue
+        interval = abs(lower - upper)
+        if interval > threshold:
+            voice_pair = f"V{upper_idx}-V{upper_idx + 1}"
+            issues.append(issue(
+                "warning",
+                "wide_adjacent_spacing",
+                f"Adjacent voices {voice_pair} are {interval} semitones apart at beat {beat['beat']:g}.",
+                beat=beat["beat"],
+                voice_pair=voice_pair,
+                interval_semitones=interval,
+                threshold=threshold,
+            ))
     return issues
 
 
 def detect_wide_adjacent_spacing(report: dict[str, Any], threshold: int) -> list[dict[str, Any]]:
-    issues = []
-    for beat in report.get("beats", []):
-        for pair in beat.get("pairs", []):
-            voices = pair.get("voices", [])
-            interval = pair.get("interval_semitones")
-            if len(voices) == 2 and voices[1] == voices[0] + 1 and interval is not None and interval > threshold:
-                issues.append(issue(
-                    "warning",
-                    "wide_adjacent_spacing",
-                    f"Adjacent voices {pair['voice_pair']} are {interval} semitones apart at beat {beat['beat']:g}.",
-                    beat=beat["beat"],
-                    voice_pair=pair["voice_pair"],
-                    interval_semitones=interval,
-                    threshold=threshold,
-                ))
-    return issues
+    return [item for beat in report.get("beats", []) for item in wide_adjacent_spacing_at(beat, threshold)]
+
+
+def report_detector_names(strict_parallels: bool) -> list[str]:
+    # Classical pedagogy mode (species drills) makes parallel perfects
+    # categorical prohibitions. By default intervallic findings are
+    # meta-analysis of the harmonic layer: parallel perfects are reported as
+    # stream fusion, which may be intentional; nothing intervallic is an
+    # error by category.
+    first = "parallel_perfects" if strict_parallels else "voice_fusion"
+    return [first, "voice_crossing", "high_complexity", "wide_adjacent_spacing"]
+
+
+def tagged_report_issues(name: str, beats: list[dict[str, Any]], start: int, stop: int,
+                         settings: dict[str, Any]) -> list[tuple[int, dict[str, Any]]]:
+    """Issues of one report detector over beats[start:stop], each tagged with
+    the index of the beat that raised it."""
+    if name == "parallel_perfects":
+        return parallel_perfect_issues(beats, start, stop)
+    if name == "voice_fusion":
+        return voice_fusion_issues(beats, start, stop)
+    if name == "voice_crossing":
+        per_beat = voice_crossing_at
+    elif name == "high_complexity":
+        def per_beat(beat: dict[str, Any]) -> list[dict[str, Any]]:
+            return high_complexity_at(beat, settings["high_complexity_threshold"])
+    else:
+        def per_beat(beat: dict[str, Any]) -> list[dict[str, Any]]:
+            return wide_adjacent_spacing_at(beat, settings["wide_spacing_threshold"])
+    return [(index, item) for index in range(start, stop) for item in per_beat(beats[index])]
+
+
+def report_detectors(report: dict[str, Any], high_complexity_threshold: float, wide_spacing_threshold: int,
+                     strict_parallels: bool = False) -> list[tuple[str, Callable[[], list[dict[str, Any]]]]]:
+    """Report-driven detectors as (name, run) pairs in output order."""
+    beats = report.get("beats", [])
+    settings = {
+        "high_complexity_threshold": high_complexity_threshold,
+        "wide_spacing_threshold": wide_spacing_threshold,
+    }
+
+    def runner(name: str) -> Callable[[], list[dict[str, Any]]]:
+        return lambda: [item for _, item in tagged_report_issues(name, beats, 0, len(beats), settings)]
+
+    return [(name, runner(name)) for name in report_detector_names(strict_parallels)]
 
 
 def evaluate_report(report: dict[str, Any], high_complexity_threshold: float, wide_spacing_threshold: int,
                     strict_parallels: bool = False) -> list[dict[str, Any]]:
     issues = []
+    for _name, run in report_detectors(report, high_complexity_threshold, wide_spacing_threshold,
+                                       strict_parallels):
+        issues.extend(run())
+    return issues
+
+
+def run_detectors(result: dict[str, Any], detectors: list[tuple[str, Callable[[], list[dict[str, Any]]]]],
+                  args: argparse.Namespace, started: float) -> None:
+    """Run detectors into result["issues"], honouring --fail-fast and
+    --budget-ms. Skipped detectors are listed in result["skipped_detectors"];
+    issues keep the canonical detector order whatever order they ran in."""
+    order = detectors
+    if args.fail_fast:
+        order = sorted(detectors, key=lambda detector: DETECTOR_COST[detector[0]])
+    found: dict[str, list[dict[str, Any]]] = {}
+    skipped = result.get("skipped_detectors", [])
+    for name, run in order:
+        if args.fail_fast:
+            so_far = result["issues"] + [item for issues in found.values() for item in issues]
+            if should_fail({**result, "issue_counts": count_by_severity(so_far)}, args.fail_on):
+                skipped.append({"detector": name, "reason": "fail_fast"})
+                continue
+        if (args.budget_ms is not None and name in OPTIONAL_DETECTORS
+                and (time.perf_counter() - started) * 1000.0 >= args.budget_ms):
+            skipped.append({"detector": name, "reason": "budget"})
+            continue
+        found[name] = run()
+    for name, _run in detectors:
+        result["issues"].extend(found.get(name, []))
+
+
+EVAL_STATE_SCHEMA = "midgrid.eval_state.v1"
+
+# Window lengths and window-start steps (beats) of the grid meta-analyses,
+# as used by midgrid_motif.melodic_fusion and rhythmic_fusion defaults.
+MELODIC_WINDOW, MELODIC_STEP = 4.0, 0.5
+RHYTHMIC_WINDOW, RHYTHMIC_STEP = 8.0, 1.0
+
+
+def eval_settings(args: argparse.Namespace) -> dict[str, Any]:
+    """Options that change what an evaluation state holds; a saved state is
+    reused only under the same settings."""
+    return {
+        "high_complexity_threshold": args.high_complexity_threshold,
+        "wide_spacing_threshold": args.wide_spacing_threshold,
+        "strict_parallels": args.strict_parallels,
+        "melodic_fusion": not args.strict_parallels and not args.no_melodic_fusion,
+        "rhythmic_stratification": not args.strict_parallels and not args.no_rhythmic_stratification,
+        "omit_rest_pairs": args.omit_rest_pairs,
+    }
+
+
+def empty_eval_state(settings: dict[str, Any]) -> dict[str, Any]:
+    """A state with nothing parsed: updating it is a full evaluation."""
+    return {
+        "schema": EVAL_STATE_SCHEMA,
+        "settings": settings,
+        "grid_lines": [],
+        "voice_count": None,
+        "beats": [],
+        "rows": [],
+        "states": [],
+        "sounding": [],
+        "frames": [],
+        "tagged": {name: [] for name in report_detector_names(settings["strict_parallels"])},
+        "motif_lines": [],
+        "motif_cells": [],
+        "motif_voice_count": None,
+        "motif_ends": None,
+        "melodic_regions": [],
+        "rhythmic_regions": [],
+    }
+
+
+def common_affixes(old: list[Any], new: list[Any]) -> tuple[int, int]:
+    """Lengths of the common prefix and (non-overlapping) common suffix."""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def splice_tagged(old: list[Any], fresh: list[Any], keep_below: int, keep_from: int,
+                  shift: int) -> list[tuple[int, dict[str, Any]]]:
+    """Old issues tagged before keep_below, then the fresh ones, then old
+    issues whose shifted tag is at or after keep_from."""
+    spliced = [(tag, found) for tag, found in old if tag < keep_below]
+    spliced.extend(fresh)
+    spliced.extend((tag + shift, found) for tag, found in old if tag + shift >= keep_from)
+    return spliced
+
+
+def update_grid_state(state: dict[str, Any], new: dict[str, Any], raw_lines: list[str]) -> dict[str, Any]:
+    """Re-parse the changed grid rows into `new` and resume the sounding
+    scan from the last beat row before the edit (its implicit durations
+    look ahead into it) until the per-voice sounding state converges with
+    the old one. Returns the recomputed row and beat ranges."""
+    from midgrid_parser import (advance_sounding, beat_report_data, build_extended_harmonic_complexity_table,
+                                collect_grid_lines, grid_voice_count, implicit_duration, parse_grid_row)
+
+    lines, _patches, _patch_directives, _pan_directives = collect_grid_lines(raw_lines)
+    voice_count = grid_voice_count(lines)
+    if voice_count != state["voice_count"]:
+        state = empty_eval_state(state["settings"])
+    old_lines = state["grid_lines"]
+    prefix, suffix = common_affixes(old_lines, lines)
+    delta = len(old_lines) - len(lines)
+    changed_end = len(lines) - suffix
+
+    parsed = [parse_grid_row(lines[i], voice_count) for i in range(prefix, changed_end)]
+    beats = state["beats"][:prefix] + [beat for beat, _metas in parsed] + state["beats"][changed_end + delta:]
+    first = prefix
+    for i in range(prefix - 1, -1, -1):
+        if beats[i] is not None:
+            first = i
+            break
+    rows = state["rows"][:first]
+    for i in range(first, changed_end):
+        metas = parsed[i - prefix][1] if i >= prefix else parse_grid_row(lines[i], voice_count)[1]
+        for meta in metas:
+            if meta["duration"] is None:
+                meta["duration"] = implicit_duration(beats, i)
+        rows.append(metas)
+    rows.extend(state["rows"][changed_end + delta:])
+
+    if first > 0:
+        active_notes, active_until = (list(part) for part in state["states"][first - 1])
+    else:
+        active_notes, active_until = [None] * voice_count, [None] * voice_count
+    table = build_extended_harmonic_complexity_table()
+    include_rests = not new["settings"].get("omit_rest_pairs", False)
+    states, sounding, frames = [], [], []
+    stop = len(lines) - 1
+    for i in range(first, len(lines)):
+        if beats[i] is None:
+            midis = [None] * voice_count
+        else:
+            midis = advance_sounding(rows[i], beats[i], active_notes, active_until)
+        previous = None
+        if i > first:
+            previous = sounding[-1]
+        elif i > 0:
+            previous = state["sounding"][i - 1]
+        states.append([list(active_notes), list(active_until)])
+        sounding.append(midis)
+        frames.append(None if beats[i] is None
+                      else beat_report_data(table, beats[i], midis, previous, include_rests))
+        if i >= changed_end and states[-1] == state["states"][i + delta]:
+            stop = i
+            break
+
+    new.update({
+        "grid_lines": lines,
+        "voice_count": voice_count,
+        "beats": beats,
+        "rows": rows,
+        "states": state["states"][:first] + states + state["states"][stop + 1 + delta:],
+        "sounding": state["sounding"][:first] + sounding + state["sounding"][stop + 1 + delta:],
+        "frames": state["frames"][:first] + frames + state["frames"][stop + 1 + delta:],
+    })
+    beat_lo = sum(1 for frame in state["frames"][:first] if frame is not None)
+    return {
+        "state": state,
+        "rows_recomputed": len(frames),
+        "beat_lo": beat_lo,
+        "beat_hi": beat_lo + sum(1 for frame in frames if frame is not None) - 1,
+    }
+
+
+def update_report_issues(state: dict[str, Any], new: dict[str, Any], beats: list[dict[str, Any]],
+                         dirty: dict[str, Any]) -> None:
+    """Rerun each report detector over the recomputed beats plus the padding
+    its scan needs, splicing the result between the old tagged issues."""
+    beat_lo, beat_hi = dirty["beat_lo"], dirty["beat_hi"]
+    count = len(beats)
+    shift = count - sum(1 for frame in state["frames"] if frame is not None)
+    settings = new["settings"]
+    tagged = {}
+    for name, old in state["tagged"].items():
+        if name == "parallel_perfects":
+            # A parallel needs the beat before it as context.
+            start, stop = max(beat_lo - 1, 0), min(beat_hi + 2, count)
+            keep_below, keep_from = start + 1, stop
+        elif name == "voice_fusion":
+            # Fusion runs cross any number of beats: widen to beats where no
+            # run is open, on both sides of the edit.
+            start = beat_lo - 1
+            while start > 0 and not fusion_quiet(beats, start):
+                start -= 1
+            start = max(start, 0)
+            stop = beat_hi + 2
+            while stop < count and not fusion_quiet(beats, stop):
+                stop += 1
+            stop = stop + 1 if stop < count else count
+            keep_below, keep_from = start + 1, stop if stop < count else count + 1
+        else:
+            start, stop = beat_lo, beat_hi + 1
+            keep_below, keep_from = start, stop
+        fresh = tagged_report_issues(name, beats, start, stop, settings)
+        tagged[name] = splice_tagged(old, fresh, keep_below, keep_from, shift)
+    new["tagged"] = tagged
+
+
+def region_pair(region: dict[str, Any]) -> tuple[int, int]:
+    return pair_voices(region["pair"])
+
+
+def dirty_spans(dirty: dict[int, list[float]], voice_count: int, window: float, pad: float,
+                step: float, regions: list[dict[str, Any]]) -> dict[tuple[int, int], tuple[float, float]]:
+    """Window-start spans (beats) to rescan per voice pair: windows that
+    reach a dirty beat range (widened by pad), grown to cover every old
+    region they touch or abut so region merging restarts cleanly."""
+    spans = {}
+    for a in range(voice_count):
+        for b in range(a + 1, voice_count):
+            ranges = [dirty[v] for v in (a, b) if v in dirty]
+            if ranges:
+                spans[(a, b)] = (min(lo for lo, _hi in ranges) - window - pad,
+                                 max(hi for _lo, hi in ranges) + pad)
+    for region in regions:
+        pair = region_pair(region)
+        if pair not in spans:
+            continue
+        lo, hi = spans[pair]
+        first, last = region["beat_start"], region["beat_end"] - window
+        if first <= hi + step and last >= lo - step:
+            spans[pair] = (min(lo, first), max(hi, last))
+    return spans
+
+
+def splice_regions(regions: list[dict[str, Any]], fresh: list[dict[str, Any]], spans: dict[tuple[int, int], tuple[float, float]],
+                   window: float, key: Callable[[dict[str, Any]], Any]) -> list[dict[str, Any]]:
+    kept = []
+    for region in regions:
+        span = spans.get(region_pair(region))
+        if span is None or region["beat_end"] - window < span[0] or region["beat_start"] > span[1]:
+            kept.append(region)
+    merged = sorted(kept + fresh, key=lambda region: (region_pair(region), region["beat_start"]))
+    merged.sort(key=key)
+    return merged
+
+
+def update_motif_state(state: dict[str, Any], new: dict[str, Any], text: str) -> list[list[dict[str, Any]]]:
+    """Re-parse the changed lines for the grid meta-analyses and rescan only
+    the voice pairs and windows whose attacks changed. Returns the voices."""
+    from midgrid_motif import (melodic_fusion, melodic_region_key, parse_line, rhythmic_fusion,
+                               rhythmic_region_key, voices_from_lines)
+
+    settings = new["settings"]
+    lines = text.splitlines()
+    old_lines = state["motif_lines"]
+    prefix, suffix = common_affixes(old_lines, lines)
+    changed = [parse_line(line) for line in lines[prefix:len(lines) - suffix]]
+    removed = state["motif_cells"][prefix:len(old_lines) - suffix]
+    cells = state["motif_cells"][:prefix] + changed + state["motif_cells"][len(old_lines) - suffix:]
+    voices = voices_from_lines(cells)
+    ends = [max((n["beat"] + n["dur"] for v in voices for n in v), default=0.0),
+            max((n["beat"] for v in voices for n in v), default=0.0)]
+    new.update({"motif_lines": lines, "motif_cells": cells, "motif_voice_count": len(voices), "motif_ends": ends})
+
+    rescan = state["motif_voice_count"] != len(voices)
+    melodic_dirty: dict[int, list[float]] = {}
+    rhythmic_dirty: dict[int, list[float]] = {}
+    for row in removed + changed:
+        for v, note in enumerate(row or []):
+            if note:
+                for dirty, lo, hi in ((melodic_dirty, note["beat"], note["beat"] + note["dur"]),
+                                      (rhythmic_dirty, note["beat"], note["beat"])):
+                    span = dirty.setdefault(v, [lo, hi])
+                    span[0], span[1] = min(span[0], lo), max(span[1], hi)
+    if not rescan and state["motif_ends"] != ends:
+        # The score end bounds the last windows.
+        for dirty, old_end, end, pad in ((melodic_dirty, state["motif_ends"][0], ends[0], MELODIC_STEP * 2),
+                                         (rhythmic_dirty, state["motif_ends"][1], ends[1], 0.0)):
+            lo, hi = min(old_end, end) - pad, max(old_end, end)
+            for v in range(len(voices)):
+                span = dirty.setdefault(v, [lo, hi])
+                span[0], span[1] = min(span[0], lo), max(span[1], hi)
+
+    new["melodic_regions"] = []
+    if settings["melodic_fusion"]:
+        if rescan:
+            new["melodic_regions"] = melodic_fusion(voices)
+        else:
+            # A move bridges a rest of up to half a beat (max_gap).
+            spans = dirty_spans(melodic_dirty, len(voices), MELODIC_WINDOW, MELODIC_STEP, MELODIC_STEP,
+                                state["melodic_regions"])
+            fresh = melodic_fusion(voices, spans=spans) if spans else []
+            new["melodic_regions"] = splice_regions(state["melodic_regions"], fresh, spans,
+                                                    MELODIC_WINDOW, melodic_region_key)
+    new["rhythmic_regions"] = []
+    if settings["rhythmic_stratification"]:
+        if rescan:
+            new["rhythmic_regions"] = rhythmic_fusion(voices)
+        else:
+            # An attack at beat x only reaches windows starting in
+            # (x - window, x], so attack sets need no padding.
+            spans = dirty_spans(rhythmic_dirty, len(voices), RHYTHMIC_WINDOW, 0.0, RHYTHMIC_STEP,
+                                state["rhythmic_regions"])
+            fresh = rhythmic_fusion(voices, spans=spans) if spans else []
+            new["rhythmic_regions"] = splice_regions(state["rhythmic_regions"], fresh, spans,
+                                                     RHYTHMIC_WINDOW, rhythmic_region_key)
+    return voices
+
+
+def evaluate_text(text: str, label: str, args: argparse.Namespace,
+                  previous: dict[str, Any] | None = None) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    """Evaluate MidGrid text in process, reusing a previous evaluation state:
+    only the rows, beats and grid windows an edit can reach are recomputed,
+    and the issues match a full run. Returns the result and the new state
+    (None when lint errors stopped the run before parsing). --fail-fast and
+    --budget-ms skip detectors as in evaluate()."""
+    started = time.perf_counter()
+    settings = eval_settings(args)
+    errors, warnings = lint_text(text, label)
+    result: dict[str, Any] = {
+        "schema": "midgrid.eval.v1",
+        "input": label,
+        "lint": {
+            "ok": not errors,
+            "errors": [finding_dict(finding) for finding in errors],
+            "warnings": [finding_dict(finding) for finding in warnings],
+        },
+        "parser": None,
+        "report_summary": None,
+        "issues": [],
+    }
+    if args.fail_fast or args.budget_ms is not None:
+        result["skipped_detectors"] = []
+
+    decided = args.fail_fast and args.fail_on != "none"
+    if result["lint"]["errors"] and (not args.parse_with_lint_errors or decided):
+        result["issue_counts"] = count_by_severity(result["issues"])
+        return result, None
+
+    reason = None
+    if previous is None:
+        reason = "no_state"
+    elif previous.get("schema") != EVAL_STATE_SCHEMA or previous.get("settings") != settings:
+        reason = "settings"
+    state = empty_eval_state(settings) if reason else previous
+    new: dict[str, Any] = {"schema": EVAL_STATE_SCHEMA, "settings": settings}
+    try:
+        dirty = update_grid_state(state, new, io.StringIO(text).readlines())
+    except (ValueError, KeyError, IndexError) as exc:
+        result["parser"] = {"ok": False, "in_process": True, "error": f"{type(exc).__name__}: {exc}"}
+        result["issues"].append(issue(
+            "error",
+            "parse_failed",
+            "The grid could not be parsed into a report.",
+            stderr=f"{type(exc).__name__}: {exc}",
+        ))
+        result["issue_counts"] = count_by_severity(result["issues"])
+        return result, None
+    if dirty["state"] is not state:
+        state, reason = dirty["state"], reason or "voice_count"
+
+    from midgrid_parser import summarize_report
+
+    beats = [frame for frame in new["frames"] if frame is not None]
+    result["parser"] = {"ok": True, "in_process": True}
+    result["report_summary"] = summarize_report(state_report(new))
+    update_report_issues(state, new, beats, dirty)
+    # The report detectors are already spliced into the state, so skipping
+    # one only leaves its issues out. The grid meta-analyses share one motif
+    # update, made the first time either of them runs.
+    detectors: list[tuple[str, Callable[[], list[dict[str, Any]]]]] = [
+        (name, lambda name=name: [found for _tag, found in new["tagged"][name]])
+        for name in report_detector_names(settings["strict_parallels"])]
+    motif_voices: list[list[list[dict[str, Any]]]] = []
+
+    def updated_voices() -> list[list[dict[str, Any]]]:
+        if not motif_voices:
+            motif_voices.append(update_motif_state(state, new, text))
+        return motif_voices[0]
+
+    def melodic_issues() -> list[dict[str, Any]]:
+        updated_voices()
+        return melodic_fusion_issues(new["melodic_regions"])
+
+    def rhythmic_issues() -> list[dict[str, Any]]:
+        return rhythmic_stratification_issues(updated_voices(), new["rhythmic_regions"])
+
+    if settings["melodic_fusion"]:
+        detectors.append(("melodic_fusion", melodic_issues))
+    if settings["rhythmic_stratification"]:
+        detectors.append(("rhythmic_stratification", rhythmic_issues))
+    run_detectors(result, detectors, args, started)
+    if not motif_voices:
+        # Not updated (disabled or skipped): an empty motif state makes the
+        # next run rescan the grid meta-analyses in full.
+        empty = empty_eval_state(settings)
+        new.update({key: empty[key] for key in ("motif_lines", "motif_cells", "motif_voice_count",
+                                                "motif_ends", "melodic_regions", "rhythmic_regions")})
+    result["issue_counts"] = count_by_severity(result["issues"])
+    result["incremental"] = {
+        "mode": "full" if reason else "incremental",
+        "reason": reason,
+        "grid_rows": len(new["grid_lines"]),
+        "rows_recomputed": dirty["rows_recomputed"],
+        "beats": len(beats),
+        "beats_recomputed": dirty["beat_hi"] - dirty["beat_lo"] + 1,
+    }
+    return result, new
+
+
+PATCHES_SCHEMA = "midgrid.eval_patches.v1"
+BEAT_EPSILON = 1e-6
+
+
+def grid_row_beat(line: str) -> float | None:
+    """Beat label of a grid row, or None for any other line."""
+    stripped = line.strip()
+    if not stripped or stripped.startswith("#") or stripped.startswith("//"):
+        return None
+    parts = line.split("//", 1)[0].split("|")
+    if len(parts) < 2:
+        return None
+    try:
+        return float(parts[0])
+    except ValueError:
+        return None
+
+
+def find_grid_row(lines: list[str], beat: float) -> int:
+    """Index of the first grid row labelled `beat` (before any # events section)."""
+    for index, line in enumerate(lines):
+        if line.strip().startswith("# events"):
+            break
+        row_beat = grid_row_beat(line)
+        if row_beat is not None and abs(row_beat - float(beat)) < BEAT_EPSILON:
+            return index
+    raise ValueError(f"no grid row at beat {float(beat):g}")
+
+
+def patch_voice(value: Any) -> int:
+    if isinstance(value, str) and value[:1] in ("V", "v"):
+        value = value[1:]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"bad voice {value!r}; use an index or a V<n> label")
+
+
+def replace_cell(line: str, voice: int, cell: str) -> str:
+    """Replace one voice cell, keeping column widths and any trailing comment."""
+    core, sep, comment = line.partition("//")
+    parts = core.split("|")
+    if not 0 <= voice < len(parts) - 1:
+        raise ValueError(f"row has no V{voice} cell")
+    index = voice + 1
+    if index == len(parts) - 1 and not sep:
+        parts[index] = f" {cell}"
+    else:
+        parts[index] = f" {cell} ".ljust(len(parts[index]))
+    return "|".join(parts) + sep + comment
+
+
+def apply_patch(text: str, edits: list[dict[str, Any]]) -> str:
+    """Apply row- and cell-level edits in order; each edit addresses the
+    text left by the edits before it:
+
+      {"beat": 12.5, "voice": 1, "cell": "E4:1@70"}   replace one cell
+      {"beat": 12.5, "row": "12.5 | C4 | E4 | G4"}    replace a row
+      {"insert_after": 12.5, "row": "13 | ..."}        insert a row
+      {"insert_before": 0, "row": "-1 | ..."}
+      {"beat": 12.5, "delete": true}                   delete a row
+    """
+    lines = text.split("\n")
+    for number, edit in enumerate(edits, start=1):
+        try:
+            if "insert_after" in edit or "insert_before" in edit:
+                anchor = edit["insert_after"] if "insert_after" in edit else edit["insert_before"]
+                index = find_grid_row(lines, anchor) + ("insert_after" in edit)
+                lines.insert(index, edit["row"])
+                continue
+            index = find_grid_row(lines, edit["beat"])
+            if edit.get("delete"):
+                del lines[index]
+            elif "cell" in edit:
+                lines[index] = replace_cell(lines[index], patch_voice(edit["voice"]), str(edit["cell"]).strip())
+            elif "row" in edit:
+                lines[index] = edit["row"]
+            else:
+                raise ValueError("expected cell, row, or delete")
+        except KeyError as exc:
+            raise ValueError(f"edit {number}: missing {exc.args[0]!r}")
+        except ValueError as exc:
+            raise ValueError(f"edit {number}: {exc}")
+    return "\n".join(lines)
+
+
+def load_patches(path: Path) -> list[dict[str, Any]]:
+    """Candidate patches from JSON: a list of {"id", "edits"} objects, or a
+    single one, or a bare list of edits (one candidate)."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("candidates", [data])
+    if data and all(isinstance(item, dict) and "edits" not in item for item in data):
+        data = [{"edits": data}]
+    candidates = []
+    for number, item in enumerate(data, start=1):
+        if not isinstance(item, dict) or not isinstance(item.get("edits"), list):
+            raise SystemExit(f"{path}: candidate {number} needs an \"edits\" list")
+        candidates.append({"id": str(item.get("id", f"patch-{number}")), "edits": item["edits"]})
+    return candidates
+
+
+def state_report(state: dict[str, Any] | None) -> dict[str, Any] | None:
+    """The contrapuntal report held in an evaluation state (beats only)."""
+    if state is None:
+        return None
+    report = {
+        "schema": "midgrid.report.v1",
+        "voice_count": state["voice_count"],
+        "beats": [frame for frame in state["frames"] if frame is not None],
+    }
+    if state["settings"].get("omit_rest_pairs"):
+        report["rest_pairs_omitted"] = True
+    return report
+
+
+def evaluate_patches(text: str, label: str, args: argparse.Namespace, candidates: list[dict[str, Any]],
+                     previous: dict[str, Any] | None = None,
+                     extra_checks: Callable[[dict[str, Any], str, dict[str, Any] | None], None] | None = None,
+                     ) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    """Evaluate a base text and each patched variant in memory. Variants
+    are evaluated incrementally from the base state, so only the rows a
+    patch touches are recomputed. `extra_checks(result, text, state)` may
+    add issues before the pass/fail verdict. Returns the combined result
+    and the base state."""
+    base, base_state = evaluate_text(text, label, args, previous)
+    if extra_checks:
+        extra_checks(base, text, base_state)
+    data: dict[str, Any] = {
+        "schema": PATCHES_SCHEMA,
+        "input": label,
+        "base": base,
+        "candidates": [],
+    }
+    for candidate in candidates:
+        entry: dict[str, Any] = {"id": candidate["id"], "edits": len(candidate["edits"])}
+        try:
+            patched = apply_patch(text, candidate["edits"])
+        except ValueError as exc:
+            entry.update({"error": str(exc), "failed": True, "result": None})
+            data["candidates"].append(entry)
+            continue
+        result, state = evaluate_text(patched, f"{label}#{candidate['id']}", args, base_state)
+        if extra_checks:
+            extra_checks(result, patched, state)
+        entry.update({"failed": should_fail(result, args.fail_on), "result": result})
+        data["candidates"].append(entry)
+    return data, base_state
+
+
+# Issue codes of the batch candidate scorer, in issue-vector order.
+BATCH_CODES = (
+    "parallel_perfect",
+    "direct_perfect",
+    "voice_fusion",
+    "displaced_root_motion",
+    "voice_crossing",
+    "high_complexity",
+    "wide_adjacent_spacing",
+)
+
+
+def candidate_voice_rows(base: dict[str, Any], voice: int, window: list[int],
+                         cells: list[str] | None) -> list[int | None]:
+    """Sounding midi of one voice per row from the first window row, with
+    the window cells replaced (None keeps the base cells), until its
+    sounding state converges with the base score again."""
+    from midgrid_parser import advance_sounding, implicit_duration, parse_note_cell
+
+    beats, rows, states = base["beats"], base["rows"], base["states"]
+    replaced = dict(zip(window, cells or []))
+    first = window[0]
+    active_notes = [states[first - 1][0][voice] if first > 0 else None]
+    active_until = [states[first - 1][1][voice] if first > 0 else None]
+    midis = []
+    for i in range(first, len(beats)):
+        if beats[i] is None:
+            midis.append(None)
+        else:
+            meta = rows[i][voice]
+            if i in replaced:
+                meta = parse_note_cell(replaced[i])
+                if meta["duration"] is None:
+                    meta["duration"] = implicit_duration(beats, i)
+            midis.append(advance_sounding([meta], beats[i], active_notes, active_until)[0])
+        if i >= window[-1] and [active_notes[0], active_until[0]] == [states[i][0][voice], states[i][1][voice]]:
+            break
+    return midis
+
+
+def score_voice_candidates(text: str, voice: int, beat_start: float, beat_end: float, candidates: list[list[str]],
+                           high_complexity_threshold: float = 30.0, wide_spacing_threshold: int = 19,
+                           strict_parallels: bool = False) -> dict[str, Any]:
+    """Score N alternative cell lines for one voice over the grid rows with
+    beat_start <= beat < beat_end, all at once.
+
+    Each candidate is a list of cells (or one "|"-separated string), one
+    per window row. The candidate voice's sounding is stacked into an
+    (N x beats) array over the scored span: the window widened to beats
+    where no fusion run of the voice is open on either side, and past any
+    notes held out of the window. The report detectors on the voice's
+    pairs are then computed for every candidate with array operations:
+    per-candidate counts by BATCH_CODES (matching what a full evaluation
+    reports on those pairs at the span's beats, or for transitions, between
+    them; codes the strict or default detector set does not report are 0),
+    error and warning totals, and the summed strength of reported fusion
+    runs. The unedited window is scored the same way under "base"."""
+    import numpy as np
+
+    settings = {
+        "high_complexity_threshold": high_complexity_threshold,
+        "wide_spacing_threshold": wide_spacing_threshold,
+        "strict_parallels": strict_parallels,
+        "melodic_fusion": False,
+        "rhythmic_stratification": False,
+    }
+    base: dict[str, Any] = {"settings": settings}
+    update_grid_state(empty_eval_state(settings), base, io.StringIO(text).readlines())
+    voice_count, beats, sounding = base["voice_count"], base["beats"], base["sounding"]
+    if not 0 <= voice < voice_count:
+        raise ValueError(f"no V{voice} in a {voice_count}-voice grid")
+    window = [i for i, beat in enumerate(beats) if beat is not None and beat_start <= beat < beat_end]
+    if not window:
+        raise ValueError(f"no grid rows from beat {beat_start:g} to {beat_end:g}")
+    candidates = [cells.split("|") if isinstance(cells, str) else cells for cells in candidates]
+    for number, cells in enumerate(candidates, start=1):
+        if len(cells) != len(window):
+            raise ValueError(f"candidate {number} has {len(cells)} cells for {len(window)} window rows")
+
+    lines = []
+    for number, cells in enumerate([None, *candidates]):
+        try:
+            lines.append(candidate_voice_rows(base, voice, window, cells))
+        except (ValueError, KeyError, IndexError) as exc:
+            raise ValueError(f"candidate {number}: bad cell ({type(exc).__name__}: {exc})")
+
+    # Scored span in report-beat indices.
+    frames = [frame for frame in base["frames"] if frame is not None]
+    beat_rows = [i for i, beat in enumerate(beats) if beat is not None]
+    row_to_beat = {row: index for index, row in enumerate(beat_rows)}
+    last_row = window[0] + max(len(midis) for midis in lines) - 1
+    first_beat = row_to_beat[window[0]]
+    last_beat = max(index for index, row in enumerate(beat_rows) if row <= last_row)
+    start = first_beat - 1
+    while start > 0 and not fusion_quiet(frames, start, voice):
+        start -= 1
+    start = max(start, 0)
+    stop = last_beat + 2
+    while stop < len(frames) and not fusion_quiet(frames, stop, voice):
+        stop += 1
+    stop = min(stop + 1, len(frames))
+    columns = beat_rows[start:stop]
+
+    def midi_array(values: list[Any]) -> Any:
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+    # Candidate voice at each scored beat row and at the row before it.
+    count = len(lines)
+    current = np.empty((count, len(columns)))
+    previous_row = np.empty((count, len(columns)))
+    for n, midis in enumerate(lines):
+        def at(row: int) -> Any:
+            if row < 0:
+                return None
+            offset = row - window[0]
+            return midis[offset] if 0 <= offset < len(midis) else sounding[row][voice]
+        current[n] = midi_array([at(row) for row in columns])
+        previous_row[n] = midi_array([at(row - 1) for row in columns])
+    others = [u for u in range(voice_count) if u != voice]
+    other_current = np.array([midi_array([sounding[row][u] for row in columns]) for u in others]).reshape(len(others), len(columns))
+    other_previous = np.array([midi_array([sounding[row - 1][u] if row > 0 else None for row in columns])
+                               for u in others]).reshape(len(others), len(columns))
+
+    # (N x pairs x beats) intervals, motion, and ratio-table lookups.
+    cur_v, prev_v = current[:, None, :], previous_row[:, None, :]
+    cur_u, prev_u = other_current[None, :, :], other_previous[None, :, :]
+    sounding_pair = ~np.isnan(cur_v) & ~np.isnan(cur_u)
+    interval = np.where(sounding_pair, np.abs(cur_v - cur_u), 0).astype(int)
+    cls = interval % 12
+    from midgrid_parser import build_extended_harmonic_complexity_table
+    table = build_extended_harmonic_complexity_table()
+    complexity = np.array([table[semitones]["perceptual_complexity"] for semitones in range(128)])[interval]
+    delta_v, delta_u = cur_v - prev_v, cur_u - prev_u
+    moved = sounding_pair & ~np.isnan(delta_v) & ~np.isnan(delta_u) & (delta_v != 0) & (delta_u != 0)
+    parallel = moved & (delta_v == delta_u)
+    similar = moved & (np.sign(delta_v) == np.sign(delta_u)) & (delta_v != delta_u)
+
+    # Transitions from the previous scored beat (column 0 only seeds).
+    perfect = sounding_pair & np.isin(cls, list(PERFECT_CLASSES))
+    both_perfect = np.zeros_like(perfect)
+    both_perfect[..., 1:] = perfect[..., 1:] & perfect[..., :-1]
+    same_class = np.zeros_like(perfect)
+    same_class[..., 1:] = cls[..., 1:] == cls[..., :-1]
+    parallel_perfect = both_perfect & parallel & same_class
+    direct_perfect = both_perfect & similar & ~(parallel & same_class)
+
+    # Fusion: a step needs parallel motion with the pair's upper voice moving.
+    upper_cur = np.where(np.array(others)[None, :, None] < voice, cur_u, cur_v)
+    upper_moving = np.zeros(parallel.shape, dtype=bool)
+    upper_moving[..., 1:] = upper_cur[..., 1:] != upper_cur[..., :-1]
+    upper_moving[..., 0] = False
+    fusing = parallel & upper_moving
+    odd_factor = np.array([1.0 if c in ROOTED_CLASSES else 3.0 / DISPLACED_ODD_FACTOR.get(c, 3) for c in range(12)])
+    step = np.where(fusing, FUSION_SCALE / np.maximum(complexity, 1.0) * odd_factor[cls], 0.0)
+    flat = fusing.reshape(-1, fusing.shape[-1])
+    edges = np.diff(np.pad(flat.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    _end_rows, run_ends = np.nonzero(edges == -1)
+    flat_step = step.reshape(flat.shape)
+    flat_cls = cls.reshape(flat.shape)
+    fusion_counts = np.zeros((count, 2, 2), dtype=int)  # [candidate, rooted, warning]
+    fusion_strength = np.zeros(count)
+    for row, run_start, run_end in zip(run_rows.tolist(), run_starts.tolist(), run_ends.tolist()):
+        strength = sum(flat_step[row, run_start:run_end].tolist())
+        if strength < FUSION_INFO:
+            continue
+        rooted = int(flat_cls[row, run_start]) in ROOTED_CLASSES
+        warning = strength >= (FUSION_WARN if rooted else DISPLACED_WARN)
+        candidate = row // len(others)
+        fusion_counts[candidate, int(rooted), int(warning)] += 1
+        fusion_strength[candidate] += strength
+
+    # Per-beat detectors on the voice's pairs.
+    upper_below = np.where(np.array(others)[None, :, None] < voice, cur_u < cur_v, cur_v < cur_u)
+    crossing = sounding_pair & upper_below
+    high = sounding_pair & (complexity >= high_complexity_threshold)
+    adjacent = np.isin(np.array(others), [voice - 1, voice + 1])[None, :, None]
+    wide = sounding_pair & adjacent & (interval > wide_spacing_threshold)
+
+    def per_candidate(mask: Any) -> Any:
+        return mask.reshape(count, -1).sum(axis=1)
+
+    counts = np.stack([
+        per_candidate(parallel_perfect),
+        per_candidate(direct_perfect),
+        fusion_counts[:, 1].sum(axis=1),
+        fusion_counts[:, 0].sum(axis=1),
+        per_candidate(crossing),
+        per_candidate(high),
+        per_candidate(wide),
+    ], axis=1)
+    warnings = counts[:, 5] + counts[:, 6]
+    errors = counts[:, 4].copy()
+    # Codes the detector set leaves unreported count 0, as in a full evaluation.
     if strict_parallels:
-        # Classical pedagogy mode (species drills): categorical prohibitions.
-        issues.extend(detect_parallel_and_direct_perfects(report))
+        errors += counts[:, 0]
+        warnings += counts[:, 1]
+        counts[:, 2:4] = 0
+        fusion_strength[:] = 0.0
     else:
-        # Default: intervallic findings are meta-analysis of the harmonic
-        # layer. Parallel perfects are reported as stream fusion, which may
-        # be intentional; nothing intervallic is an error by category.
-        issues.extend(detect_voice_fusion(report))
-    issues.extend(detect_voice_crossing(report))
-    issues.extend(detect_high_complexity(report, high_complexity_threshold))
-    issues.extend(detect_wide_adjacent_spacing(report, wide_spacing_threshold))
-    return issues
+        warnings += fusion_counts[:, :, 1].sum(axis=1)
+        counts[:, 0:2] = 0
+    return {
+        "voice": voice,
+        "window": [beats[window[0]], beats[window[-1]]],
+        "span": [frames[start]["beat"], frames[stop - 1]["beat"]],
+        "codes": list(BATCH_CODES),
+        "counts": counts[1:],
+        "errors": errors[1:],
+        "warnings": warnings[1:],
+        "fusion_strength": fusion_strength[1:],
+        "base": {
+            "counts": counts[0],
+            "errors": int(errors[0]),
+            "warnings": int(warnings[0]),
+            "fusion_strength": float(fusion_strength[0]),
+        },
+    }
 
 
 def count_by_severity(issues: list[dict[str, Any]]) -> dict[str, int]:
@@ -425,7 +1376,7 @@ def render_text(result: dict[str, Any]) -> str:
 
     parser = result.get("parser")
     if parser:
-        lines.append(f"Parser: {'ok' if parser['ok'] else 'failed'}")
+        lines.append(f"Parser: {'ok' if parser['ok'] else 'failed'}{' (in process)' if parser.get('in_process') else ''}")
         if parser.get("report_json"):
             lines.append(f"Report JSON: {parser['report_json']}")
 
@@ -438,18 +1389,52 @@ def render_text(result: dict[str, Any]) -> str:
             f"max_complexity={summary['max_perceptual_complexity']}"
         )
 
+    incremental = result.get("incremental")
+    if incremental:
+        lines.append(
+            f"State: {incremental['mode']}"
+            f"{' (' + incremental['reason'] + ')' if incremental['reason'] else ''}, "
+            f"rows recomputed={incremental['rows_recomputed']}/{incremental['grid_rows']}, "
+            f"beats recomputed={incremental['beats_recomputed']}/{incremental['beats']}"
+        )
+
+    skipped = result.get("skipped_detectors")
+    if skipped:
+        lines.append("Skipped: " + ", ".join(f"{item['detector']} ({item['reason']})" for item in skipped))
+
     issues = result.get("issues", [])
     lines.append(f"Issues: {len(issues)}")
-    for item in issues:
-        location = []
-        if "beat" in item:
-            location.append(f"beat {item['beat']:g}")
-        if "voice_pair" in item:
-            location.append(item["voice_pair"])
-        elif "voices" in item:
-            location.append("V" + "-V".join(str(v) for v in item["voices"]))
-        loc = f" ({', '.join(location)})" if location else ""
-        lines.append(f"- {item['severity']} {item['code']}{loc}: {item['message']}")
+    lines.extend(render_issue(item) for item in issues)
+    return "\n".join(lines)
+
+
+def render_issue(item: dict[str, Any]) -> str:
+    location = []
+    if "beat" in item:
+        location.append(f"beat {item['beat']:g}")
+    if "voice_pair" in item:
+        location.append(item["voice_pair"])
+    elif "voices" in item:
+        location.append("V" + "-V".join(str(v) for v in item["voices"]))
+    loc = f" ({', '.join(location)})" if location else ""
+    return f"- {item['severity']} {item['code']}{loc}: {item['message']}"
+
+
+def render_patches_text(data: dict[str, Any]) -> str:
+    lines = [render_text(data["base"])]
+    for candidate in data["candidates"]:
+        verdict = "fail" if candidate["failed"] else "pass"
+        lines.append("")
+        lines.append(f"Candidate {candidate['id']}: {candidate['edits']} edits, {verdict}")
+        if candidate["result"] is None:
+            lines.append(f"Patch error: {candidate['error']}")
+            continue
+        result = candidate["result"]
+        counts = result["issue_counts"]
+        lines.append(f"Lint: {len(result['lint']['errors'])} errors, {len(result['lint']['warnings'])} warnings")
+        lines.append(f"Issues: {len(result['issues'])} "
+                     f"(errors={counts.get('error', 0)}, warnings={counts.get('warning', 0)})")
+        lines.extend(render_issue(item) for item in result["issues"])
     return "\n".join(lines)
 
 
@@ -468,6 +1453,7 @@ def should_fail(result: dict[str, Any], fail_on: str) -> bool:
 
 
 def evaluate(input_path: Path, args: argparse.Namespace, midi_out: Path) -> dict[str, Any]:
+    started = time.perf_counter()
     result: dict[str, Any] = {
         "schema": "midgrid.eval.v1",
         "input": str(input_path),
@@ -476,12 +1462,17 @@ def evaluate(input_path: Path, args: argparse.Namespace, midi_out: Path) -> dict
         "report_summary": None,
         "issues": [],
     }
+    if args.fail_fast or args.budget_ms is not None:
+        result["skipped_detectors"] = []
 
-    if result["lint"]["errors"] and not args.parse_with_lint_errors:
+    # Lint errors already decide any --fail-on other than none, so fail-fast
+    # mode does not spend a parser run on them.
+    decided = args.fail_fast and args.fail_on != "none"
+    if result["lint"]["errors"] and (not args.parse_with_lint_errors or decided):
         result["issue_counts"] = count_by_severity(result["issues"])
         return result
 
-    parser_result = run_parser(input_path, midi_out)
+    parser_result = run_parser(input_path, midi_out, omit_rest_pairs=args.omit_rest_pairs)
     result["parser"] = parser_result
     if not parser_result["ok"]:
         result["issues"].append(issue(
@@ -497,21 +1488,22 @@ def evaluate(input_path: Path, args: argparse.Namespace, midi_out: Path) -> dict
     report_path = Path(parser_result["report_json"])
     report = json.loads(report_path.read_text(encoding="utf-8"))
     result["report_summary"] = report.get("summary")
-    result["issues"].extend(evaluate_report(
+    detectors = report_detectors(
         report,
         high_complexity_threshold=args.high_complexity_threshold,
         wide_spacing_threshold=args.wide_spacing_threshold,
         strict_parallels=args.strict_parallels,
-    ))
+    )
     if not args.strict_parallels and not args.no_melodic_fusion:
-        result["issues"].extend(detect_melodic_fusion(input_path))
+        detectors.append(("melodic_fusion", lambda: detect_melodic_fusion(input_path)))
     if not args.strict_parallels and not args.no_rhythmic_stratification:
-        result["issues"].extend(detect_rhythmic_stratification(input_path))
+        detectors.append(("rhythmic_stratification", lambda: detect_rhythmic_stratification(input_path)))
+    run_detectors(result, detectors, args, started)
     result["issue_counts"] = count_by_severity(result["issues"])
     return result
 
 
-def main(argv: list[str]) -> int:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Evaluate a MidGrid file for repair-loop diagnostics.")
     parser.add_argument("input", help=".midgrid file to evaluate")
     parser.add_argument("--midi-out", help="optional output .mid path; defaults to a temporary file")
@@ -528,10 +1520,46 @@ def main(argv: list[str]) -> int:
     parser.add_argument("--high-complexity-threshold", type=float, default=30.0)
     parser.add_argument("--wide-spacing-threshold", type=int, default=19)
     parser.add_argument("--fail-on", choices=["error", "warning", "none"], default="error")
-    args = parser.parse_args(argv)
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="run detectors cheapest-first and skip the rest once --fail-on is decided")
+    parser.add_argument("--budget-ms", type=float,
+                        help="skip optional grid meta-analyses once this many milliseconds have elapsed")
+    parser.add_argument("--omit-rest-pairs", action="store_true",
+                        help="leave resting voice pairs out of the parser report (detectors treat them as rests)")
+    parser.add_argument("--state",
+                        help="evaluation state JSON: evaluate in process, recompute only what changed since "
+                             "the state was saved, then update it (no MIDI is written)")
+    parser.add_argument("--patches",
+                        help="JSON candidate patches (cell/row edits) to evaluate in memory against the input")
+    return parser
+
+
+def main(argv: list[str]) -> int:
+    args = build_parser().parse_args(argv)
 
     input_path = Path(args.input)
-    if args.midi_out:
+    if args.patches:
+        state_path = Path(args.state) if args.state else None
+        previous = None
+        if state_path and state_path.exists():
+            previous = json.loads(state_path.read_text(encoding="utf-8"))
+        data, state = evaluate_patches(input_path.read_text(encoding="utf-8"), str(input_path), args,
+                                       load_patches(Path(args.patches)), previous)
+        if state_path and state is not None:
+            state_path.write_text(json.dumps(state) + "\n", encoding="utf-8")
+        if args.write_json:
+            Path(args.write_json).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(json.dumps(data, indent=2) if args.json else render_patches_text(data))
+        # The call succeeds when at least one candidate passes --fail-on.
+        return 0 if any(not candidate["failed"] for candidate in data["candidates"]) else 1
+
+    if args.state:
+        state_path = Path(args.state)
+        previous = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else None
+        result, state = evaluate_text(input_path.read_text(encoding="utf-8"), str(input_path), args, previous)
+        if state is not None:
+            state_path.write_text(json.dumps(state) + "\n", encoding="utf-8")
+    elif args.midi_out:
         midi_out = Path(args.midi_out)
         result = evaluate(input_path, args, midi_out)
     else:
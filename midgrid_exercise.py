@@ -57,7 +57,8 @@ def get_exercise(exercises: dict[str, dict[str, Any]], exercise_id: str) -> dict
         raise SystemExit(f"unknown exercise id '{exercise_id}'. Known ids: {known}")
 
 
-def evaluation_args(exercise: dict[str, Any], fail_on: str | None = None) -> list[str]:
+def evaluation_args(exercise: dict[str, Any], fail_on: str | None = None, fail_fast: bool = False,
+                    budget_ms: float | None = None) -> list[str]:
     defaults = exercise.get("evaluation_defaults", {})
     args = []
     args.extend(["--high-complexity-threshold", str(defaults.get("high_complexity_threshold", 30.0))])
@@ -65,6 +66,10 @@ def evaluation_args(exercise: dict[str, Any], fail_on: str | None = None) -> lis
     args.extend(["--fail-on", fail_on or defaults.get("fail_on", "error")])
     if defaults.get("strict_parallels"):
         args.append("--strict-parallels")
+    if fail_fast:
+        args.append("--fail-fast")
+    if budget_ms is not None:
+        args.extend(["--budget-ms", str(budget_ms)])
     return args
 
 
@@ -78,14 +83,15 @@ def run_command(argv: list[str]) -> subprocess.CompletedProcess[str]:
     )
 
 
-def run_eval(exercise: dict[str, Any], midgrid_path: Path, fail_on: str | None = None) -> tuple[dict[str, Any], subprocess.CompletedProcess[str]]:
+def run_eval(exercise: dict[str, Any], midgrid_path: Path, fail_on: str | None = None, fail_fast: bool = False,
+             budget_ms: float | None = None) -> tuple[dict[str, Any], subprocess.CompletedProcess[str]]:
     argv = [
         sys.executable,
         "midgrid_eval.py",
         str(midgrid_path),
         "--json",
     ]
-    argv.extend(evaluation_args(exercise, fail_on=fail_on))
+    argv.extend(evaluation_args(exercise, fail_on=fail_on, fail_fast=fail_fast, budget_ms=budget_ms))
     proc = run_command(argv)
     if not proc.stdout.strip():
         raise SystemExit(f"midgrid_eval.py produced no JSON for {midgrid_path}\n{proc.stderr}")
@@ -123,10 +129,6 @@ def parse_grid_rows(text: str) -> list[dict[str, Any]]:
     return rows
 
 
-def read_grid_rows(path: Path) -> list[dict[str, Any]]:
-    return parse_grid_rows(path.read_text(encoding="utf-8"))
-
-
 def cell_is_note(cell: str) -> bool:
     return cell.strip() not in REST_OR_HOLD_CELLS
 
@@ -182,11 +184,11 @@ def beat_matches_interval_rule(beat: float, rule: dict[str, Any]) -> bool:
     return True
 
 
-def append_interval_rule_checks(checks: dict[str, Any], eval_data: dict[str, Any], exercise_issues: list[dict[str, Any]]) -> None:
+def append_interval_rule_checks(checks: dict[str, Any], report: dict[str, Any] | None,
+                                exercise_issues: list[dict[str, Any]]) -> None:
     rules = checks.get("interval_rules") or []
     if not rules:
         return
-    report = load_report(eval_data)
     if report is None:
         return
 
@@ -234,13 +236,18 @@ def append_interval_rule_checks(checks: dict[str, Any], eval_data: dict[str, Any
 
 
 def append_exercise_checks(exercise: dict[str, Any], eval_data: dict[str, Any], midgrid_path: Path) -> None:
+    append_exercise_text_checks(exercise, eval_data, midgrid_path.read_text(encoding="utf-8"), load_report(eval_data))
+
+
+def append_exercise_text_checks(exercise: dict[str, Any], eval_data: dict[str, Any], attempt_text: str,
+                                report: dict[str, Any] | None) -> None:
     checks = exercise.get("exercise_checks") or {}
     if not checks:
         eval_data["exercise_issues"] = []
         return
 
     exercise_issues: list[dict[str, Any]] = []
-    attempt_rows = read_grid_rows(midgrid_path)
+    attempt_rows = parse_grid_rows(attempt_text)
     seed_rows = parse_grid_rows(exercise["seed_midgrid"])
 
     expected_rows = len(seed_rows)
@@ -297,7 +304,7 @@ def append_exercise_checks(exercise: dict[str, Any], eval_data: dict[str, Any],
                     actual=attempt_cell,
                 ))
 
-    append_interval_rule_checks(checks, eval_data, exercise_issues)
+    append_interval_rule_checks(checks, report, exercise_issues)
 
     eval_data["exercise_issues"] = exercise_issues
     if exercise_issues:
@@ -384,11 +391,53 @@ def command_show(args: argparse.Namespace) -> int:
     return 0
 
 
+def evaluate_exercise_patches(exercise: dict[str, Any], attempt_path: Path, patches_path: Path,
+                              fail_on: str | None = None, fail_fast: bool = False,
+                              budget_ms: float | None = None) -> dict[str, Any]:
+    """Evaluate an attempt and each candidate patch of it in memory (see
+    midgrid_eval.evaluate_patches), with exercise checks on every variant."""
+    from midgrid_eval import build_parser, evaluate_patches, load_patches, state_report
+
+    eval_args = build_parser().parse_args([str(attempt_path), *evaluation_args(
+        exercise, fail_on=fail_on, fail_fast=fail_fast, budget_ms=budget_ms)])
+
+    def exercise_checks(result: dict[str, Any], text: str, state: dict[str, Any] | None) -> None:
+        append_exercise_text_checks(exercise, result, text, state_report(state))
+
+    data, _state = evaluate_patches(attempt_path.read_text(encoding="utf-8"), str(attempt_path), eval_args,
+                                    load_patches(patches_path), extra_checks=exercise_checks)
+    return data
+
+
+def command_evaluate_patches(args: argparse.Namespace, exercise: dict[str, Any], attempt_path: Path) -> int:
+    data = evaluate_exercise_patches(exercise, attempt_path, Path(args.patches), fail_on=args.fail_on,
+                                     fail_fast=args.fail_fast, budget_ms=args.budget_ms)
+    if args.write_json:
+        Path(args.write_json).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    if args.json:
+        print(json.dumps(data, indent=2))
+    else:
+        print(f"Exercise: {exercise['id']} - {exercise['title']}")
+        print(f"Attempt: {attempt_path}")
+        print_issue_summary(data["base"])
+        for candidate in data["candidates"]:
+            print()
+            print(f"Candidate {candidate['id']}: {'fail' if candidate['failed'] else 'pass'}")
+            if candidate["result"] is None:
+                print(f"patch error: {candidate['error']}")
+            else:
+                print_issue_summary(candidate["result"])
+    return 0 if any(not candidate["failed"] for candidate in data["candidates"]) else 1
+
+
 def command_evaluate(args: argparse.Namespace) -> int:
     exercises = load_exercises(args.exercises_dir)
     exercise = get_exercise(exercises, args.exercise_id)
     attempt_path = Path(args.attempt_midgrid)
-    eval_data, proc = run_eval(exercise, attempt_path, fail_on=args.fail_on)
+    if args.patches:
+        return command_evaluate_patches(args, exercise, attempt_path)
+    eval_data, proc = run_eval(exercise, attempt_path, fail_on=args.fail_on, fail_fast=args.fail_fast,
+                               budget_ms=args.budget_ms)
     append_exercise_checks(exercise, eval_data, attempt_path)
 
     if args.write_json:
@@ -503,6 +552,10 @@ def build_parser() -> argparse.ArgumentParser:
     eval_parser.add_argument("--json", action="store_true")
     eval_parser.add_argument("--write-json")
     eval_parser.add_argument("--fail-on", choices=["error", "warning", "none"])
+    eval_parser.add_argument("--fail-fast", action="store_true",
+                             help="pass --fail-fast to midgrid_eval.py")
+    eval_parser.add_argument("--budget-ms", type=float, help="pass --budget-ms to midgrid_eval.py")
+    eval_parser.add_argument("--patches", help="JSON candidate patches of the attempt, each evaluated in memory")
     eval_parser.set_defaults(func=command_evaluate)
 
     record_parser = subparsers.add_parser("record", help="record an attempt/correction pair as a training example")
@@ -20,24 +20,47 @@ The layer at which similarity breaks classifies the transformation:
     negated d1 match          -> INVERSION (rectus/inversus pairing)
     otherwise, high contour   -> FREE echo
 
-Also reports per-voice verbatim recalls (episode rhymes), cross-voice
+Also reports per-voice and cross-voice verbatim recalls (episode rhymes
+and restatements in another voice, from one suffix-array index), cross-voice
 directional correlation (melodic fusion: two voices running the same
 predictor), and motivic economy (fraction of attacks inside subject-family
 spans).
 
+Several subjects (repeat --subject, or list segment specs one per line in
+a --subjects file) are searched together in one Aho-Corasick pass per
+voice that nominates candidate windows; each subject's echoes are the
+same as when it is searched alone. Entries of a
+subject that overlap in time are listed as stretto groups, with each
+entry's delay and interval from the group's leader. --max-edits K also
+finds entries K interval edits away (inserted passing tones, truncation),
+by bit-parallel edit distance. --discover needs
+no subject: it reports the cells that recur most often (rectus or
+inversus), bucketed by rolling hashes of their d1 strings.
+
 Usage:
-    python3 midgrid_motif.py FILE [--subject V1:0-8] [--min-score 0.7]
+    python3 midgrid_motif.py FILE [--subject V1:0-8 ...] [--subjects FILE]
+                                  [--min-score 0.7] [--max-edits K]
                                   [--compare V1:0-8 V0:8-16]
+                                  [--discover [--lengths 4,6,8] [--top 5]]
                                   [--write-json OUT.json]
+    python3 midgrid_motif.py index [PATH ...] [--index motif.index.json]
+    python3 midgrid_motif.py query FILE V1:0-8 [--index motif.index.json]
 """
 from __future__ import annotations
 
 import argparse
+import bisect
+import hashlib
+import heapq
 import json
+import math
 import re
 import sys
+import time
 from pathlib import Path
 
+import numpy as np
+
 NOTE_RE = re.compile(r"^([A-G])([#-]?)(\d+):([\d.]+)(?:@(\d+))?")
 CHROMA = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
 LETTER = {"C": 0, "D": 1, "E": 2, "F": 3, "G": 4, "A": 5, "B": 6}
@@ -57,34 +80,54 @@ def parse_pitch(token: str):
                 dur=float(dur), vel=int(vel) if vel else None)
 
 
-def parse_midgrid(path: Path):
-    """Return list of voices; each voice is a list of attacks
-    {beat, name, midi, diat, dur}."""
+def parse_line(line: str):
+    """Attacks on one grid line: a list with the parsed attack (or None) per
+    cell, or None when the line is not a grid row."""
+    line = line.strip()
+    if not line or line.startswith("#") or line.startswith("//"):
+        return None
+    parts = [c.strip() for c in line.split("|")]
+    if len(parts) < 2:
+        return None
+    try:
+        beat = float(parts[0])
+    except ValueError:
+        return None
+    cells = []
+    for cell in parts[1:]:
+        note = parse_pitch(cell)
+        if note:
+            note["beat"] = beat
+        cells.append(note)
+    return cells
+
+
+def voices_from_lines(parsed_lines):
+    """Assemble per-voice attack lists from parse_line results."""
     voices: list[list[dict]] = []
-    for line in path.read_text().splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or line.startswith("//"):
+    for cells in parsed_lines:
+        if cells is None:
             continue
-        parts = [c.strip() for c in line.split("|")]
-        if len(parts) < 2:
-            continue
-        try:
-            beat = float(parts[0])
-        except ValueError:
-            continue
-        cells = parts[1:]
         while len(voices) < len(cells):
             voices.append([])
-        for vi, cell in enumerate(cells):
-            note = parse_pitch(cell)
+        for vi, note in enumerate(cells):
             if note:
-                note["beat"] = beat
                 voices[vi].append(note)
     for v in voices:
         v.sort(key=lambda n: n["beat"])
     return voices
 
 
+def parse_midgrid_text(text: str):
+    return voices_from_lines(parse_line(line) for line in text.splitlines())
+
+
+def parse_midgrid(path: Path):
+    """Return list of voices; each voice is a list of attacks
+    {beat, name, midi, diat, dur}."""
+    return parse_midgrid_text(path.read_text())
+
+
 def d1_chrom(notes):
     return [b["midi"] - a["midi"] for a, b in zip(notes, notes[1:])]
 
@@ -138,25 +181,65 @@ def classify(scores, invert, n_intervals):
     return ("inv-" + kind) if invert else kind
 
 
+def derivative_arrays(notes):
+    """Chromatic and diatonic d1 of a note list as integer arrays."""
+    midi = np.array([n["midi"] for n in notes], dtype=np.int64)
+    diat = np.array([n["diat"] for n in notes], dtype=np.int64)
+    return np.diff(midi), np.diff(diat)
+
+
+def window_agreement(layer, target):
+    """Fraction of positions where each length-len(target) window of
+    `layer` equals `target` (0.0 for an empty target, like agree())."""
+    if len(target) == 0:
+        return np.zeros(len(layer) + 1)
+    windows = np.lib.stride_tricks.sliding_window_view(layer, len(target))
+    return (windows == target).sum(axis=1) / len(target)
+
+
 def find_echoes(voices, sub_voice, sub_start_idx, sub_notes, min_score):
+    """Windows of every voice scoring >= min_score against the subject,
+    rectus and inversus. Per-voice d1 arrays are built once and every
+    window's layer agreements come from NumPy sliding-window comparisons;
+    mismatch positions are built only for the windows that survive."""
     n = len(sub_notes)
-    candidates = []
+    m = n - 1
+    sub_c, sub_d = derivative_arrays(sub_notes)
+    found = []
     for vi, notes in enumerate(voices):
-        for i in range(len(notes) - n + 1):
-            if vi == sub_voice and i == sub_start_idx:
-                continue
-            seg = notes[i:i + n]
-            for invert in (False, True):
-                sc = layer_scores(sub_notes, seg, invert)
-                if sc["weighted"] < min_score:
+        if len(notes) < n:
+            continue
+        voice_c, voice_d = derivative_arrays(notes)
+        for invert in (False, True):
+            sc, sd = (-sub_c, -sub_d) if invert else (sub_c, sub_d)
+            contour = window_agreement(np.sign(voice_c), np.sign(sc))
+            diat = window_agreement(voice_d, sd)
+            chrom = window_agreement(voice_c, sc)
+            weighted = CONTOUR_W * contour + DIAT_W * diat + CHROM_W * chrom
+            for i in np.flatnonzero(weighted >= min_score).tolist():
+                if vi == sub_voice and i == sub_start_idx:
                     continue
-                candidates.append(dict(
-                    voice=vi, note_index=i,
-                    beat_start=seg[0]["beat"], beat_end=seg[-1]["beat"],
-                    transposition=seg[0]["midi"] - sub_notes[0]["midi"],
-                    diat_offset=seg[0]["diat"] - sub_notes[0]["diat"],
-                    kind=classify(sc, invert, n - 1), inverted=invert, **sc))
-    # non-maximum suppression per voice: keep best-scoring, reject heavy overlap
+                found.append((vi, i, invert, dict(
+                    contour=float(contour[i]), diatonic=float(diat[i]),
+                    chromatic=float(chrom[i]), weighted=float(weighted[i]),
+                    chromatic_mismatch_at=np.flatnonzero(voice_c[i:i + m] != sc).tolist(),
+                    diatonic_mismatch_at=np.flatnonzero(voice_d[i:i + m] != sd).tolist())))
+    candidates = []
+    for vi, i, invert, sc in sorted(found, key=lambda f: f[:3]):
+        seg = voices[vi][i:i + n]
+        candidates.append(dict(
+            voice=vi, note_index=i,
+            beat_start=seg[0]["beat"], beat_end=seg[-1]["beat"],
+            transposition=seg[0]["midi"] - sub_notes[0]["midi"],
+            diat_offset=seg[0]["diat"] - sub_notes[0]["diat"],
+            kind=classify(sc, invert, n - 1), inverted=invert, **sc))
+    return suppress_overlaps(candidates, n)
+
+
+def suppress_overlaps(candidates, n):
+    """Non-maximum suppression per voice: keep the best-scoring echoes and
+    reject those overlapping an accepted one by more than n // 4 notes.
+    Echoes of another length than n (approximate matches) carry `notes`."""
     candidates.sort(key=lambda c: -c["weighted"])
     accepted = []
     for c in candidates:
@@ -165,7 +248,7 @@ def find_echoes(voices, sub_voice, sub_start_idx, sub_notes, min_score):
             if a["voice"] != c["voice"]:
                 continue
             lo = max(a["note_index"], c["note_index"])
-            hi = min(a["note_index"] + n, c["note_index"] + n)
+            hi = min(a["note_index"] + a.get("notes", n), c["note_index"] + c.get("notes", n))
             if hi - lo > n // 4:
                 clash = True
                 break
@@ -175,150 +258,682 @@ def find_echoes(voices, sub_voice, sub_start_idx, sub_notes, min_score):
     return accepted
 
 
-def find_recalls(voices, min_len=6):
-    """Per-voice verbatim recalls: repeated (chromatic d1, dur) substrings."""
+def myers_search(pattern, text, max_edits):
+    """Bit-parallel (Myers/Hyyro) approximate search: (end, distance) for
+    every text position where some substring ending there is within
+    max_edits insertions, deletions or substitutions of the pattern.
+    Python integers are as wide as the pattern, so each text token costs
+    O(ceil(m / w)) word operations."""
+    m = len(pattern)
+    if not m:
+        return []
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq = {}
+    for i, token in enumerate(pattern):
+        peq[token] = peq.get(token, 0) | (1 << i)
+    pv, mv, score = mask, 0, m
+    hits = []
+    for j, token in enumerate(text):
+        eq = peq.get(token, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score <= max_edits:
+            hits.append((j, score))
+    return hits
+
+
+def align_tokens(pattern, text):
+    """Edit-distance alignment of the whole pattern to a suffix-anchored
+    substring of text (free start). Returns (start, distance, pairs), pairs
+    being (pattern index or None, text index or None) in order."""
+    m, n = len(pattern), len(text)
+    d = [[0] * (n + 1)] + [[i] + [0] * n for i in range(1, m + 1)]
+    for i in range(1, m + 1):
+        for t in range(1, n + 1):
+            d[i][t] = min(d[i - 1][t - 1] + (pattern[i - 1] != text[t - 1]),
+                          d[i - 1][t] + 1, d[i][t - 1] + 1)
+    i, t, pairs = m, n, []
+    while i > 0:
+        if t > 0 and d[i][t] == d[i - 1][t - 1] + (pattern[i - 1] != text[t - 1]):
+            pairs.append((i - 1, t - 1))
+            i, t = i - 1, t - 1
+        elif d[i][t] == d[i - 1][t] + 1:
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, t - 1))
+            t -= 1
+    pairs.reverse()
+    return t, d[m][n], pairs
+
+
+def aligned_scores(sub_notes, seg_notes, pairs, invert=False):
+    """layer_scores over an alignment: aligned intervals are compared per
+    layer, deleted subject intervals mismatch on every layer, and inserted
+    segment intervals count against the fractions (denominator m + ins).
+    Mismatch positions are subject interval indices, an insertion being
+    reported at the subject interval that follows it."""
+    sc, sd = d1_chrom(sub_notes), d1_diat(sub_notes)
+    if invert:
+        sc, sd = [-x for x in sc], [-x for x in sd]
+    ec, ed = d1_chrom(seg_notes), d1_diat(seg_notes)
+    m = len(sc)
+    contour = diat = chrom = 0
+    mism, mism_d = [], []
+    following = m - 1
+    for i, t in reversed(pairs):
+        if i is not None:
+            following = i
+        if i is None or t is None:
+            mism.append(following)
+            mism_d.append(following)
+            continue
+        contour += sign(sc[i]) == sign(ec[t])
+        diat += sd[i] == ed[t]
+        chrom += sc[i] == ec[t]
+        if sc[i] != ec[t]:
+            mism.append(i)
+        if sd[i] != ed[t]:
+            mism_d.append(i)
+    total = m + sum(1 for i, _t in pairs if i is None)
+    contour, diat, chrom = contour / total, diat / total, chrom / total
+    weighted = CONTOUR_W * contour + DIAT_W * diat + CHROM_W * chrom
+    return dict(contour=contour, diatonic=diat, chromatic=chrom,
+                weighted=weighted, chromatic_mismatch_at=sorted(set(mism)),
+                diatonic_mismatch_at=sorted(set(mism_d)))
+
+
+def find_approximate_echoes(voices, sub_voice, sub_start_idx, sub_notes,
+                            min_score, max_edits=2):
+    """Echoes with up to max_edits inserted, deleted or substituted
+    intervals (ornamented, truncated or rhythmically varied entries), by
+    Myers search of the subject's diatonic d1, rectus and inversus, over
+    each voice's diatonic d1. Each run of hit ends keeps its best end; only
+    those are aligned (a small DP over m + max_edits tokens), scored with
+    aligned_scores and classified as find_echoes results. Matches carry
+    `edits` and `notes` (their length may differ from the subject's)."""
+    n = len(sub_notes)
+    m = n - 1
+    candidates = []
+    for vi, notes in enumerate(voices):
+        text = d1_diat(notes)
+        for invert in (False, True):
+            pattern = [-x for x in d1_diat(sub_notes)] if invert else d1_diat(sub_notes)
+            runs = []
+            for j, dist in myers_search(pattern, text, max_edits):
+                if runs and runs[-1][-1][0] == j - 1:
+                    runs[-1].append((j, dist))
+                else:
+                    runs.append([(j, dist)])
+            for j, _dist in (min(run, key=lambda hit: hit[1]) for run in runs):
+                lo = max(0, j - m - max_edits + 1)
+                start, edits, pairs = align_tokens(pattern, text[lo:j + 1])
+                i = lo + start
+                seg = notes[i:j + 2]
+                if vi == sub_voice and (min(i + len(seg), sub_start_idx + n)
+                                        - max(i, sub_start_idx)) > n // 4:
+                    continue
+                pairs = [(p, None if t is None else t - start) for p, t in pairs]
+                sc = aligned_scores(sub_notes, seg, pairs, invert)
+                if sc["weighted"] < min_score:
+                    continue
+                candidates.append(dict(
+                    voice=vi, note_index=i, notes=len(seg),
+                    beat_start=seg[0]["beat"], beat_end=seg[-1]["beat"],
+                    transposition=seg[0]["midi"] - sub_notes[0]["midi"],
+                    diat_offset=seg[0]["diat"] - sub_notes[0]["diat"],
+                    kind=classify(sc, invert, m), inverted=invert,
+                    edits=edits, **sc))
+    return suppress_overlaps(candidates, n)
+
+
+def build_automaton(patterns):
+    """Aho-Corasick automaton over symbol tuples. `patterns` maps each
+    pattern (a tuple of hashable symbols) to its list of labels; returns
+    (goto, fail, out) lists indexed by state, where out[state] holds
+    (length, label) for every pattern ending there."""
+    goto, fail, out = [{}], [0], [[]]
+    for pattern, labels in patterns.items():
+        state = 0
+        for symbol in pattern:
+            nxt = goto[state].get(symbol)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][symbol] = nxt
+                goto.append({})
+                fail.append(0)
+                out.append([])
+            state = nxt
+        out[state].extend((len(pattern), label) for label in labels)
+    queue = list(goto[0].values())
+    for state in queue:
+        for symbol, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and symbol not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(symbol, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return goto, fail, out
+
+
+def automaton_step(automaton, state, symbol):
+    goto, fail, _out = automaton
+    while state and symbol not in goto[state]:
+        state = fail[state]
+    return goto[state].get(symbol, 0)
+
+
+def contour_mismatch_budget(m, min_score):
+    """Most contour mismatches a window of m intervals can have and still
+    weigh >= min_score. Chromatic agreement implies contour agreement, so
+    weighted <= (CONTOUR_W + CHROM_W) * contour + DIAT_W."""
+    floor_contour = (min_score - DIAT_W) / (CONTOUR_W + CHROM_W)
+    return int(m * (1.0 - floor_contour) + 1e-9)
+
+
+def subject_patterns(subjects, min_score):
+    """Contour d1 pieces of every subject, rectus and inversus, labelled
+    (subject index, inverted, offset). A subject of m intervals allowing k
+    contour mismatches is cut into k + 1 pieces, so any window scoring
+    >= min_score matches at least one piece exactly (pigeonhole). Subjects
+    with k >= m have no such filter and are returned in `scan_all`."""
+    patterns, scan_all = {}, []
+    for si, (_voice, notes) in enumerate(subjects):
+        contour = [sign(x) for x in d1_chrom(notes)]
+        m = len(contour)
+        k = contour_mismatch_budget(m, min_score)
+        if k >= m:
+            scan_all.append(si)
+            continue
+        bounds = [m * j // (k + 1) for j in range(k + 2)]
+        for invert in (False, True):
+            values = [-x for x in contour] if invert else contour
+            for lo, hi in zip(bounds, bounds[1:]):
+                key = tuple(values[lo:hi])
+                patterns.setdefault(key, []).append((si, invert, lo))
+    return patterns, scan_all
+
+
+def find_subject_echoes(voices, subjects, min_score):
+    """Echoes of many subjects in one pass per voice, identical to running
+    find_echoes on each subject. The contour pieces of all subjects and
+    their inversions (see subject_patterns) are compiled into one
+    Aho-Corasick automaton and each voice's contour stream is run through
+    it once; every piece hit nominates a window, and only nominated windows
+    are scored with layer_scores (kept at >= min_score). Returns one echo
+    list per subject, shaped as find_echoes results."""
+    patterns, scan_all = subject_patterns(subjects, min_score)
+    automaton = build_automaton(patterns)
+    out = automaton[2]
+    hits = set()
+    for vi, notes in enumerate(voices):
+        state = 0
+        for p, c in enumerate(d1_chrom(notes)):
+            state = automaton_step(automaton, state, sign(c))
+            for length, (si, invert, offset) in out[state]:
+                start = p - length + 1 - offset
+                if 0 <= start <= len(notes) - len(subjects[si][1]):
+                    hits.add((si, vi, start, invert))
+        for si in scan_all:
+            for start in range(len(notes) - len(subjects[si][1]) + 1):
+                hits.update(((si, vi, start, False), (si, vi, start, True)))
+    candidates = [[] for _ in subjects]
+    for si, vi, i, invert in sorted(hits):
+        sub_voice, sub_notes = subjects[si]
+        n = len(sub_notes)
+        if vi == sub_voice and voices[vi][i] is sub_notes[0]:
+            continue
+        seg = voices[vi][i:i + n]
+        sc = layer_scores(sub_notes, seg, invert)
+        if sc["weighted"] < min_score:
+            continue
+        candidates[si].append(dict(
+            voice=vi, note_index=i,
+            beat_start=seg[0]["beat"], beat_end=seg[-1]["beat"],
+            transposition=seg[0]["midi"] - sub_notes[0]["midi"],
+            diat_offset=seg[0]["diat"] - sub_notes[0]["diat"],
+            kind=classify(sc, invert, n - 1), inverted=invert, **sc))
+    return [suppress_overlaps(found, len(sub_notes))
+            for found, (_voice, sub_notes) in zip(candidates, subjects)]
+
+
+def subject_entries(voices, sub_voice, sub_notes, echoes):
+    """The subject statement and its echoes as entries: voice, sounding
+    span (first attack to the release of the last note), transposition
+    from the subject and kind."""
+    n = len(sub_notes)
+    last = sub_notes[-1]
+    entries = [dict(voice=sub_voice, beat_start=sub_notes[0]["beat"],
+                    beat_end=last["beat"] + last["dur"], transposition=0,
+                    kind="subject")]
+    for e in echoes:
+        last = voices[e["voice"]][e["note_index"] + e.get("notes", n) - 1]
+        entries.append(dict(voice=e["voice"], beat_start=e["beat_start"],
+                            beat_end=last["beat"] + last["dur"],
+                            transposition=e["transposition"], kind=e["kind"]))
+    entries.sort(key=lambda e: (e["beat_start"], e["voice"]))
+    return entries
+
+
+def find_strettos(entries):
+    """Overlapping entry groups, by a sweep over entry spans sorted by
+    start. Entries join a group while they start before the group's latest
+    release; each new entry is paired with every still-sounding entry
+    (a heap of releases), giving the delay and interval of each overlap.
+    O(E log E) plus the overlapping pairs."""
+    entries = sorted(entries, key=lambda e: (e["beat_start"], e["voice"]))
+    groups, group, group_end = [], [], None
+    sounding = []
+    for k, e in enumerate(entries):
+        while sounding and sounding[0][0] <= e["beat_start"]:
+            heapq.heappop(sounding)
+        if group and e["beat_start"] < group_end:
+            group.append(k)
+            group_end = max(group_end, e["beat_end"])
+        else:
+            if len(group) > 1:
+                groups.append(group)
+            group, group_end = [k], e["beat_end"]
+        e["_overlaps"] = sorted(j for _end, j in sounding)
+        heapq.heappush(sounding, (e["beat_end"], k))
+    if len(group) > 1:
+        groups.append(group)
+    strettos = []
+    for group in groups:
+        members = [entries[k] for k in group]
+        lead = members[0]
+        strettos.append(dict(
+            beat_start=lead["beat_start"],
+            beat_end=max(e["beat_end"] for e in members),
+            voices=sorted({e["voice"] for e in members}),
+            entries=[dict(voice=e["voice"], beat_start=e["beat_start"],
+                          beat_end=e["beat_end"], kind=e["kind"],
+                          delay=e["beat_start"] - lead["beat_start"],
+                          interval=e["transposition"] - lead["transposition"])
+                     for e in members],
+            overlaps=[dict(leader=entries[j]["voice"], follower=e["voice"],
+                           delay=e["beat_start"] - entries[j]["beat_start"],
+                           interval=e["transposition"] - entries[j]["transposition"],
+                           overlap=min(e["beat_end"], entries[j]["beat_end"]) - e["beat_start"])
+                      for e in members for j in e["_overlaps"]]))
+    for e in entries:
+        del e["_overlaps"]
+    return strettos
+
+
+def recall_tokens(notes):
+    """(chromatic d1, dur) token stream of one voice."""
+    return [(b["midi"] - a["midi"], a["dur"]) for a, b in zip(notes, notes[1:])]
+
+
+def suffix_array(codes):
+    """Suffix array of an integer sequence by prefix doubling."""
+    n = len(codes)
+    rank = np.asarray(codes, dtype=np.int64)
+    sa = np.argsort(rank, kind="stable")
+    k = 1
+    while k < n:
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        sa = np.lexsort((second, rank))
+        keys_r, keys_s = rank[sa], second[sa]
+        bump = np.empty(n, dtype=np.int64)
+        bump[0] = 0
+        bump[1:] = (keys_r[1:] != keys_r[:-1]) | (keys_s[1:] != keys_s[:-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.cumsum(bump)
+        if rank[sa[-1]] == n - 1:
+            break
+        k *= 2
+    return sa
+
+
+def lcp_array(codes, sa):
+    """Kasai LCP: lcp[r] is the common prefix of suffixes sa[r-1] and sa[r]."""
+    n = len(codes)
+    rank = [0] * n
+    for r, pos in enumerate(sa):
+        rank[pos] = r
+    lcp = [0] * n
+    h = 0
+    for pos in range(n):
+        r = rank[pos]
+        if r == 0:
+            h = 0
+            continue
+        prev = sa[r - 1]
+        while pos + h < n and prev + h < n and codes[pos + h] == codes[prev + h]:
+            h += 1
+        lcp[r] = h
+        if h:
+            h -= 1
+    return lcp
+
+
+def recall_index(voices, min_len=6):
+    """Suffix array + LCP over the (d1, dur) token streams of all voices.
+
+    Voices are concatenated with a unique separator each, so no common
+    prefix crosses a voice boundary. Suffixes sharing their first min_len
+    tokens form one contiguous LCP run; `members` lists each run's start
+    positions in stream order, which is what the recall scans look up."""
+    streams = [recall_tokens(notes) for notes in voices]
+    alphabet = {t: len(voices) + i for i, t in enumerate(
+        sorted({t for seq in streams for t in seq}))}
+    codes, offsets = [], []
+    for vi, seq in enumerate(streams):
+        offsets.append(len(codes))
+        codes.extend(alphabet[t] for t in seq)
+        codes.append(vi)
+    sa = suffix_array(codes).tolist() if codes else []
+    lcp = lcp_array(codes, sa)
+    run_of = [-1] * len(codes)
+    members = []
+    for r, pos in enumerate(sa):
+        if r == 0 or lcp[r] < min_len:
+            members.append([])
+        members[-1].append(pos)
+        run_of[pos] = len(members) - 1
+    for run in members:
+        run.sort()
+    return dict(min_len=min_len, codes=codes, offsets=offsets,
+                lengths=[len(seq) for seq in streams],
+                run_of=run_of, members=members)
+
+
+def common_run(codes, a, b, limit):
+    k = 0
+    while k < limit and codes[a + k] == codes[b + k]:
+        k += 1
+    return k
+
+
+def find_recalls(voices, min_len=6, index=None):
+    """Per-voice verbatim recalls: repeated (chromatic d1, dur) substrings.
+
+    Scanning note positions in order, an uncovered position recalls the
+    nearest later non-overlapping start in its LCP run; both spans are then
+    covered. The suffix array makes each lookup a bisect instead of a scan."""
+    if index is None or index["min_len"] != min_len:
+        index = recall_index(voices, min_len)
+    codes, members = index["codes"], index["members"]
     recalls = []
     for vi, notes in enumerate(voices):
-        seq = [(b["midi"] - a["midi"], a["dur"]) for a, b in zip(notes, notes[1:])]
-        found = set()
-        for i in range(len(seq) - min_len):
-            for j in range(i + min_len, len(seq) - min_len + 1):
-                if any(i < e and s < i + min_len for s, e in found):
+        off, length = index["offsets"][vi], index["lengths"][vi]
+        covered = [False] * length
+        for i in range(length - min_len):
+            if any(covered[i:i + min_len]):
+                continue
+            run = members[index["run_of"][off + i]]
+            r = bisect.bisect_left(run, off + i + min_len)
+            if r == len(run) or run[r] >= off + length:
+                continue
+            j = run[r] - off
+            k = common_run(codes, off + i, off + j, j - i)
+            recalls.append(dict(
+                voice=vi, length=k + 1,
+                first=dict(beat_start=notes[i]["beat"],
+                           beat_end=notes[i + k]["beat"]),
+                second=dict(beat_start=notes[j]["beat"],
+                            beat_end=notes[j + k]["beat"]),
+                transposition=notes[j]["midi"] - notes[i]["midi"]))
+            covered[i:i + k] = [True] * k
+            covered[j:j + k] = [True] * k
+    return recalls
+
+
+def find_cross_recalls(voices, min_len=6, index=None):
+    """Cross-voice verbatim recalls: a (d1, dur) passage of one voice
+    restated in another, from the same index as find_recalls.
+
+    For each voice pair, uncovered positions of the upper voice take the
+    first uncovered start of the lower voice in their LCP run that does not
+    begin on the same beat (simultaneous statements are doubling, which
+    melodic fusion reports). The match extends to the full common prefix;
+    `first` is the earlier statement."""
+    if index is None or index["min_len"] != min_len:
+        index = recall_index(voices, min_len)
+    codes, members, run_of = index["codes"], index["members"], index["run_of"]
+    recalls = []
+    for va, vb in voice_pairs(voices):
+        off_a, len_a = index["offsets"][va], index["lengths"][va]
+        off_b, len_b = index["offsets"][vb], index["lengths"][vb]
+        cover_a, cover_b = [False] * len_a, [False] * len_b
+        for i in range(len_a - min_len + 1):
+            if any(cover_a[i:i + min_len]):
+                continue
+            run = members[run_of[off_a + i]]
+            r = bisect.bisect_left(run, off_b)
+            while r < len(run) and run[r] < off_b + len_b:
+                j = run[r] - off_b
+                if (not any(cover_b[j:j + min_len])
+                        and voices[vb][j]["beat"] != voices[va][i]["beat"]):
                     break
-                k = 0
-                while (j + k < len(seq) and i + k < j
-                       and seq[i + k] == seq[j + k]):
-                    k += 1
-                if k >= min_len:
-                    recalls.append(dict(
-                        voice=vi, length=k + 1,
-                        first=dict(beat_start=notes[i]["beat"],
-                                   beat_end=notes[i + k]["beat"]),
-                        second=dict(beat_start=notes[j]["beat"],
-                                    beat_end=notes[j + k]["beat"]),
-                        transposition=notes[j]["midi"] - notes[i]["midi"]))
-                    found.add((i, i + k))
-                    found.add((j, j + k))
+                r += 1
+            else:
+                continue
+            k = common_run(codes, off_a + i, off_b + j, len_a - i)
+            a = dict(voice=va, beat_start=voices[va][i]["beat"],
+                     beat_end=voices[va][i + k]["beat"])
+            b = dict(voice=vb, beat_start=voices[vb][j]["beat"],
+                     beat_end=voices[vb][j + k]["beat"])
+            shift = voices[vb][j]["midi"] - voices[va][i]["midi"]
+            if b["beat_start"] < a["beat_start"]:
+                a, b, shift = b, a, -shift
+            recalls.append(dict(length=k + 1, first=a, second=b,
+                                transposition=shift))
+            cover_a[i:i + k] = [True] * k
+            cover_b[j:j + k] = [True] * k
+    recalls.sort(key=lambda r: (r["first"]["beat_start"], r["first"]["voice"]))
     return recalls
 
 
-def lattice_pitches(voices, step=0.5):
-    """Half-beat pitch lattice per voice (holds sustain the pitch)."""
-    end = max((n["beat"] + n["dur"] for v in voices for n in v), default=0.0)
-    ticks = int(round(end / step))
-    grids = []
-    for notes in voices:
-        grid = [None] * (ticks + 1)
-        for n in notes:
-            a = int(round(n["beat"] / step))
-            b = min(int(round((n["beat"] + n["dur"]) / step)), ticks)
-            for t in range(a, b + 1):
-                grid[t] = n["midi"] if t == a or grid[t] is None else grid[t]
-            grid[a] = n["midi"]
-            for t in range(a + 1, b):
-                grid[t] = n["midi"]
-        grids.append(grid)
-    return grids, step
-
-
-def melodic_fusion(voices, window_beats=4.0, min_comoves=5, min_agree=0.85):
+def event_timeline(voices):
+    """Sparse change-point timeline: the sorted union of attack and release
+    beats of all voices, and the pitch each voice sounds from each change
+    point to the next (-1 = rest). A later attack cuts a held note short.
+    Size scales with events, not duration, and any rhythm is exact."""
+    edges = [n["beat"] for v in voices for n in v]
+    edges += [n["beat"] + n["dur"] for v in voices for n in v]
+    times = np.unique(np.array(edges, dtype=float))
+    pitch = np.full((len(voices), len(times)), -1, dtype=np.int64)
+    for vi, notes in enumerate(voices):
+        starts = np.searchsorted(times, [n["beat"] for n in notes])
+        stops = np.searchsorted(times, [n["beat"] + n["dur"] for n in notes])
+        stops[:-1] = np.minimum(stops[:-1], starts[1:])
+        for n, lo, hi in zip(notes, starts.tolist(), stops.tolist()):
+            pitch[vi, lo:hi] = n["midi"]
+    return times, pitch
+
+
+def timeline_moves(times, pitch, max_gap=0.5):
+    """Per voice, the change points where it moves to a new pitch: an
+    attack of a different pitch than the one sounding before it, or than
+    the last one if that was released at most max_gap beats earlier (a
+    short rest does not break the line). Returns (indices, deltas) pairs."""
+    moves = []
+    index = np.arange(len(times))
+    for row in pitch:
+        sounding = row >= 0
+        # Last sounding change point at or before each point.
+        last = np.maximum.accumulate(np.where(sounding, index, -1))
+        prev = np.concatenate(([-1], last[:-1]))
+        released = times[np.minimum(prev + 1, len(times) - 1)]
+        ok = (sounding & (prev >= 0)
+              & (times - released <= max_gap + 1e-9)
+              & (row != row[np.maximum(prev, 0)]))
+        at = np.flatnonzero(ok)
+        moves.append((at, row[at] - row[prev[at]]))
+    return moves
+
+
+def voice_pairs(voices):
+    return [(a, b) for a in range(len(voices)) for b in range(a + 1, len(voices))]
+
+
+def melodic_region_key(region):
+    return (-(region["beat_end"] - region["beat_start"]), region["beat_start"])
+
+
+def rhythmic_region_key(region):
+    return (region["beat_start"], region["pair"])
+
+
+def true_runs(mask):
+    """(start, stop) index arrays of the runs of True in a 1-D bool array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def melodic_fusion(voices, window_beats=4.0, min_comoves=5, min_agree=0.85,
+                   spans=None, hop=0.5, max_gap=0.5):
     """Cross-voice directional correlation: sliding windows where two voices
-    co-move in the same direction — same-predictor (fused) melodic motion."""
-    grids, step = lattice_pitches(voices)
-    ticks = len(grids[0]) if grids else 0
-    win = int(round(window_beats / step))
+    co-move in the same direction — same-predictor (fused) melodic motion.
+
+    Moves come from the event timeline; windows of window_beats start every
+    `hop` beats and count the co-moves in (start, start + window_beats].
+    `spans` maps (a, b) voice pairs to (lo, hi): only those pairs are
+    scanned, and only windows starting within lo..hi beats, so an edit can
+    be rescanned locally; regions are then merged within that span only."""
+    times, pitch = event_timeline(voices)
+    if not len(times):
+        return []
+    win = int(round(window_beats / hop))
+    windows = int(round(times[-1] / hop)) - win
+    # Per-voice move deltas at each change point (0 = no move).
+    deltas = np.zeros(pitch.shape, dtype=np.int64)
+    for v, (at, delta) in enumerate(timeline_moves(times, pitch, max_gap)):
+        deltas[v, at] = delta
+    moving = deltas != 0
+    # Co-move totals of every pair in one product; pairs that never move
+    # together often enough cannot pass any window.
+    moves = moving.astype(np.int64)
+    co_counts = moves @ moves.T
+    starts = np.arange(max(windows, 0)) * hop
     regions = []
-    for a in range(len(grids)):
-        for b in range(a + 1, len(grids)):
-            da = [None if grids[a][t] is None or grids[a][t - 1] is None
-                  else grids[a][t] - grids[a][t - 1] for t in range(1, ticks)]
-            db = [None if grids[b][t] is None or grids[b][t - 1] is None
-                  else grids[b][t] - grids[b][t - 1] for t in range(1, ticks)]
-            cur = None
-            for t0 in range(0, len(da) - win):
-                co = [(x, y) for x, y in zip(da[t0:t0 + win], db[t0:t0 + win])
-                      if x not in (None, 0) and y not in (None, 0)]
-                if len(co) < min_comoves:
-                    ok = False
-                else:
-                    same = sum(1 for x, y in co if sign(x) == sign(y))
-                    locked = sum(1 for x, y in co if x == y)
-                    ok = same / len(co) >= min_agree
-                if ok:
-                    beat0, beat1 = t0 * step, (t0 + win) * step
-                    if cur and beat0 <= cur["beat_end"]:
-                        cur["beat_end"] = beat1
-                        cur["comoves"] = max(cur["comoves"], len(co))
-                        cur["locked"] = max(cur["locked"], locked)
-                    else:
-                        if cur:
-                            regions.append(cur)
-                        cur = dict(pair=f"V{a}-V{b}", beat_start=beat0,
-                                   beat_end=beat1, comoves=len(co),
-                                   locked=locked)
-                elif cur:
-                    regions.append(cur)
-                    cur = None
-            if cur:
-                regions.append(cur)
-    regions.sort(key=lambda r: (-(r["beat_end"] - r["beat_start"]), r["beat_start"]))
+    for a, b in (voice_pairs(voices) if spans is None else spans):
+        if co_counts[a, b] < min_comoves or windows <= 0:
+            continue
+        at = np.flatnonzero(moving[a] & moving[b])
+        da, db = deltas[a, at], deltas[b, at]
+        # Prefix sums over the pair's co-moves: window counts are O(1)
+        # differences between the searchsorted window edges.
+        lo = np.searchsorted(times[at], starts, side="right")
+        hi = np.searchsorted(times[at], starts + window_beats, side="right")
+        comoves = hi - lo
+        same = np.concatenate(([0], np.cumsum(np.sign(da) == np.sign(db))))
+        same = same[hi] - same[lo]
+        locked = np.concatenate(([0], np.cumsum(da == db)))
+        locked = locked[hi] - locked[lo]
+        ok = comoves >= min_comoves
+        ok[ok] = same[ok] / comoves[ok] >= min_agree
+        if spans is not None:
+            lo_beat, hi_beat = spans[(a, b)]
+            ok[:max(0, math.ceil(lo_beat / hop))] = False
+            ok[max(0, math.floor(hi_beat / hop) + 1):] = False
+        # Consecutive passing windows overlap, so each run is one region.
+        run_starts, run_stops = true_runs(ok)
+        if not len(run_starts):
+            continue
+        # Failing windows count as 0, so each segment's max is its run's.
+        peak_comoves = np.maximum.reduceat(np.where(ok, comoves, 0), run_starts)
+        peak_locked = np.maximum.reduceat(np.where(ok, locked, 0), run_starts)
+        for t0, t1, c, k in zip(run_starts.tolist(), run_stops.tolist(),
+                                peak_comoves.tolist(), peak_locked.tolist()):
+            regions.append(dict(pair=f"V{a}-V{b}", beat_start=t0 * hop,
+                                beat_end=(t1 - 1 + win) * hop,
+                                comoves=c, locked=k))
+    regions.sort(key=melodic_region_key)
     return regions
 
 
 def rhythmic_fusion(voices, window_beats=8.0, min_attacks=6, min_co=0.9,
-                    max_ratio=1.5):
+                    max_ratio=1.5, spans=None):
     """Homorhythm regions: sliding windows where two voices attack at the
     same instants (co-attack fraction >= min_co) at SIMILAR rates (attack
     count ratio < max_ratio). Both conditions matter: a running-eighths
     line over a theme in augmentation co-attacks at every theme note but
     is rate-stratified (the Contrapunctus IX regime, ratio >= max_ratio);
-    harmonization is same clock at the same rate."""
+    harmonization is same clock at the same rate.
+
+    `spans` restricts the scan as in melodic_fusion."""
     regions = []
     step = 1.0
     end = max((n["beat"] for v in voices for n in v), default=0.0)
-    for a in range(len(voices)):
-        for b in range(a + 1, len(voices)):
-            atk_a = sorted(n["beat"] for n in voices[a])
-            atk_b = sorted(n["beat"] for n in voices[b])
-            cur = None
-            t0 = 0.0
-            while t0 + window_beats <= end + step:
-                wa = set(t for t in atk_a if t0 <= t < t0 + window_beats)
-                wb = set(t for t in atk_b if t0 <= t < t0 + window_beats)
-                ok = False
-                if len(wa) >= min_attacks and len(wb) >= min_attacks:
-                    co = len(wa & wb) / min(len(wa), len(wb))
-                    ratio = max(len(wa), len(wb)) / min(len(wa), len(wb))
-                    ok = co >= min_co and ratio < max_ratio
-                if ok:
-                    if cur and t0 <= cur["beat_end"]:
-                        cur["beat_end"] = t0 + window_beats
-                        cur["co_attacks"] = max(cur["co_attacks"], len(wa & wb))
-                    else:
-                        if cur:
-                            regions.append(cur)
-                        cur = dict(pair=f"V{a}-V{b}", beat_start=t0,
-                                   beat_end=t0 + window_beats,
-                                   co_attacks=len(wa & wb),
-                                   rate_ratio=round(max(len(wa), len(wb))
-                                                    / min(len(wa), len(wb)), 2))
-                elif cur:
-                    regions.append(cur)
-                    cur = None
-                t0 += step
-            if cur:
+    # Distinct attack instants per voice, sorted: window counts are pointer
+    # differences, and pointers only move forward as the window slides.
+    attacks = [sorted({n["beat"] for n in v}) for v in voices]
+    active = [len(atk) >= min_attacks for atk in attacks]
+    for a, b in (voice_pairs(voices) if spans is None else spans):
+        # Voices with too few attacks never fill a window: skip the pair.
+        if not (active[a] and active[b]):
+            continue
+        atk_a, atk_b = attacks[a], attacks[b]
+        common = sorted(set(atk_a).intersection(atk_b))
+        cur = None
+        # Windows must hold attacks of both voices.
+        t0 = float(max(0, math.floor(max(atk_a[0], atk_b[0]) - window_beats)))
+        t_hi = min(atk_a[-1], atk_b[-1])
+        if spans is not None:
+            lo, hi = spans[(a, b)]
+            t0 = max(t0, float(math.ceil(lo / step)) * step)
+            t_hi = min(t_hi, hi)
+        # [lo, hi) pointers into atk_a, atk_b and common.
+        ptrs = [[0, 0], [0, 0], [0, 0]]
+        seqs = (atk_a, atk_b, common)
+        while t0 + window_beats <= end + step and t0 <= t_hi:
+            t1 = t0 + window_beats
+            for seq, ptr in zip(seqs, ptrs):
+                while ptr[0] < len(seq) and seq[ptr[0]] < t0:
+                    ptr[0] += 1
+                ptr[1] = max(ptr[1], ptr[0])
+                while ptr[1] < len(seq) and seq[ptr[1]] < t1:
+                    ptr[1] += 1
+            na, nb, nco = (hi_ - lo_ for lo_, hi_ in ptrs)
+            ok = False
+            if na >= min_attacks and nb >= min_attacks:
+                co = nco / min(na, nb)
+                ratio = max(na, nb) / min(na, nb)
+                ok = co >= min_co and ratio < max_ratio
+            if ok:
+                if cur and t0 <= cur["beat_end"]:
+                    cur["beat_end"] = t1
+                    cur["co_attacks"] = max(cur["co_attacks"], nco)
+                else:
+                    if cur:
+                        regions.append(cur)
+                    cur = dict(pair=f"V{a}-V{b}", beat_start=t0,
+                               beat_end=t1, co_attacks=nco,
+                               rate_ratio=round(max(na, nb) / min(na, nb), 2))
+            elif cur:
                 regions.append(cur)
-    regions.sort(key=lambda r: (r["beat_start"], r["pair"]))
+                cur = None
+            t0 += step
+        if cur:
+            regions.append(cur)
+    regions.sort(key=rhythmic_region_key)
     return regions
 
 
-def homorhythm_fractions(voices):
+def homorhythm_fractions(voices, regions=None):
     """Per-pair fraction of the pair's active span spent in homorhythm
-    regions (from rhythmic_fusion). 1.0 = the pair shares one attack clock
-    throughout (harmonization); low values = rate-stratified counterpoint
-    (Contrapunctus IX regime)."""
+    regions (from rhythmic_fusion, unless precomputed `regions` are given).
+    1.0 = the pair shares one attack clock throughout (harmonization); low
+    values = rate-stratified counterpoint (Contrapunctus IX regime)."""
     from collections import defaultdict
-    regs = rhythmic_fusion(voices)
+    regs = rhythmic_fusion(voices) if regions is None else regions
     spans = {}
     for a in range(len(voices)):
         for b in range(a + 1, len(voices)):
@@ -335,6 +950,341 @@ def homorhythm_fractions(voices):
             for pair, (lo, hi) in spans.items()}
 
 
+HASH_MOD = (1 << 61) - 1
+HASH_BASE = 1_000_003
+
+
+def rolling_hashes(values, length):
+    """Rabin-Karp hashes of every length-`length` window of an integer
+    sequence, in one linear pass (values may be negative)."""
+    if length <= 0 or len(values) < length:
+        return []
+    top = pow(HASH_BASE, length - 1, HASH_MOD)
+    h = 0
+    for x in values[:length]:
+        h = (h * HASH_BASE + x) % HASH_MOD
+    hashes = [h]
+    for out, x in zip(values, values[length:]):
+        h = ((h - out * top) * HASH_BASE + x) % HASH_MOD
+        hashes.append(h)
+    return hashes
+
+
+def non_overlapping(occurrences, length):
+    """Greedy left-to-right selection of occurrences that do not overlap
+    within a voice (occurrences are (voice, index, inverted))."""
+    kept, last = [], {}
+    for occ in sorted(occurrences):
+        if occ[1] >= last.get(occ[0], -length):
+            kept.append(occ)
+            last[occ[0]] = occ[1] + length
+    return kept
+
+
+def discover_cells(voices, length, top=5):
+    """Most frequently recurring d1 cells of `length` intervals, without a
+    subject. Every window of every voice is hashed on the chromatic and
+    diatonic d1 layers, rectus and inversus (negated d1), and bucketed by
+    the smaller of the two hashes, so a cell and its inversion share a
+    bucket: one linear pass per layer and window length. Buckets are then
+    split by the exact sequences (hash collisions cannot merge cells) and
+    counted without overlaps. Static repetition (all-zero d1) is skipped,
+    as are diatonic cells that are a single chromatic cell anyway."""
+    cells = []
+    strings = [(d1_chrom(notes), d1_diat(notes)) for notes in voices]
+    for li, layer in enumerate(("chromatic", "diatonic")):
+        buckets = {}
+        for vi, layers in enumerate(strings):
+            values = layers[li]
+            rectus = rolling_hashes(values, length)
+            inversus = rolling_hashes([-x for x in values], length)
+            for i, (hr, hv) in enumerate(zip(rectus, inversus)):
+                buckets.setdefault(min(hr, hv), []).append((vi, i))
+        groups = {}
+        for found in buckets.values():
+            if len(found) < 2:
+                continue
+            for vi, i in found:
+                seq = tuple(strings[vi][li][i:i + length])
+                inv = tuple(-x for x in seq)
+                key = min(seq, inv)
+                groups.setdefault(key, []).append((vi, i, seq != key))
+        for key, found in groups.items():
+            if not any(key):
+                continue
+            kept = non_overlapping(found, length)
+            if len(kept) < 2:
+                continue
+            if layer == "diatonic":
+                chromatic = {min(seq, tuple(-x for x in seq)) for seq in
+                             (tuple(strings[vi][0][i:i + length]) for vi, i, _inv in kept)}
+                if len(chromatic) == 1:
+                    continue
+            first = voices[kept[0][0]][kept[0][1]]
+            cells.append(dict(
+                layer=layer, length=length, d1=list(key), count=len(kept),
+                inversions=sum(1 for _vi, _i, inv in kept if inv),
+                occurrences=[dict(voice=vi, note_index=i,
+                                  beat_start=voices[vi][i]["beat"],
+                                  beat_end=voices[vi][i + length]["beat"],
+                                  inverted=inv,
+                                  transposition=voices[vi][i]["midi"] - first["midi"])
+                             for vi, i, inv in kept]))
+    cells.sort(key=lambda c: (-c["count"], c["layer"], c["d1"]))
+    return cells[:top] if top else cells
+
+
+INDEX_SCHEMA = "midgrid.motif_index.v1"
+DEFAULT_INDEX = Path("motif.index.json")
+INDEX_LAYERS = ("chromatic", "diatonic", "contour")
+
+
+def layer_strings(notes, invert=False):
+    """Chromatic d1, diatonic d1 and contour strings of a note list."""
+    sc, sd = d1_chrom(notes), d1_diat(notes)
+    if invert:
+        sc, sd = [-x for x in sc], [-x for x in sd]
+    return dict(chromatic=sc, diatonic=sd, contour=[sign(x) for x in sc])
+
+
+def gram_key(values):
+    return ",".join(str(x) for x in values)
+
+
+def voice_grams(notes, n):
+    """(layer, gram key, note index) for every n-interval window."""
+    layers = layer_strings(notes)
+    for layer in INDEX_LAYERS:
+        values = layers[layer]
+        for i in range(len(values) - n + 1):
+            yield layer, gram_key(values[i:i + n]), i
+
+
+def empty_index(n=4):
+    return dict(schema=INDEX_SCHEMA, n=n, files={},
+                postings={layer: {} for layer in INDEX_LAYERS})
+
+
+def load_index(path: Path, n=None):
+    """The saved index, or a fresh one when missing, of another schema, or
+    built with another n-gram length."""
+    if path.exists():
+        index = json.loads(path.read_text())
+        if index.get("schema") == INDEX_SCHEMA and n in (None, index["n"]):
+            return index
+    return empty_index(4 if n is None else n)
+
+
+def stored_voices(entry):
+    return [[dict(beat=b, midi=m, diat=d) for b, m, d in voice]
+            for voice in entry["voices"]]
+
+
+def index_postings(index, key, voices, add):
+    postings = index["postings"]
+    for vi, notes in enumerate(voices):
+        for layer, gram, i in voice_grams(notes, index["n"]):
+            if add:
+                postings[layer].setdefault(gram, []).append([key, vi, i])
+            else:
+                kept = [p for p in postings[layer].get(gram, []) if p[0] != key]
+                if kept:
+                    postings[layer][gram] = kept
+                else:
+                    postings[layer].pop(gram, None)
+
+
+def update_index(index, paths):
+    """Bring the index up to date with the .midgrid files under `paths`:
+    new and changed files (by size and mtime, then content hash) are
+    (re)indexed, files gone from disk are dropped, the rest are untouched.
+    Returns counts per outcome."""
+    found = {}
+    for root in paths:
+        root = Path(root)
+        files = [root] if root.is_file() else sorted(root.rglob("*.midgrid"))
+        for path in files:
+            if not any(part.startswith(".") for part in path.parts if part not in (".", "..")):
+                found[path.as_posix()] = path
+    roots = [Path(root).as_posix().rstrip("/") for root in paths]
+    stats = dict(added=0, updated=0, removed=0, unchanged=0)
+    for key in list(index["files"]):
+        inside = any(root in (".", key) or key.startswith(root + "/") for root in roots)
+        if inside and key not in found:
+            index_postings(index, key, stored_voices(index["files"].pop(key)), add=False)
+            stats["removed"] += 1
+    for key, path in found.items():
+        st = path.stat()
+        old = index["files"].get(key)
+        if old and (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            stats["unchanged"] += 1
+            continue
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if old and old["sha256"] == digest:
+            old["size"], old["mtime_ns"] = st.st_size, st.st_mtime_ns
+            stats["unchanged"] += 1
+            continue
+        if old:
+            index_postings(index, key, stored_voices(old), add=False)
+        voices = parse_midgrid_text(data.decode("utf-8", errors="replace"))
+        index["files"][key] = dict(
+            size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=digest,
+            voices=[[[n["beat"], n["midi"], n["diat"]] for n in notes] for notes in voices])
+        index_postings(index, key, voices, add=True)
+        stats["updated" if old else "added"] += 1
+    return stats
+
+
+def contour_pieces(m, n, min_score):
+    """(lo, hi) interval ranges to look up in the contour postings for a
+    query of m intervals. A window weighing >= min_score has at most k
+    contour mismatches, so one of k + 1 pieces matches exactly
+    (pigeonhole), but a piece must span n intervals to be looked up. When
+    it cannot, the whole contour is the only piece and recall is not
+    guaranteed (see query_is_complete)."""
+    k = contour_mismatch_budget(m, min_score)
+    if (k + 1) * n > m:
+        return [(0, m)]
+    return [(m * j // (k + 1), m * (j + 1) // (k + 1)) for j in range(k + 1)]
+
+
+def query_is_complete(n, length, min_score):
+    """Whether query_index finds every window of a length-note segment
+    weighing >= min_score. A window it misses shares no chromatic or
+    diatonic n-gram (so has m // n mismatches in each) and no contour
+    piece; unless the pieces are pigeonhole pieces, one contour mismatch
+    (also a chromatic one) is enough."""
+    m = length - 1
+    if m < n:
+        return False
+    if (contour_mismatch_budget(m, min_score) + 1) * n <= m:
+        return True
+    missed = 1.0 - (CONTOUR_W + (DIAT_W + CHROM_W) * (m // n)) / m
+    return min_score > missed + 1e-9
+
+
+def query_index(index, sub_notes, min_score=0.7, exclude=None, limit=20):
+    """Ranked corpus matches of a segment, rectus and inversus.
+
+    Every query n-gram looks up its posting list; a posting at note i for
+    the gram at query offset k votes for a match starting at i - k.
+    Candidates sharing a chromatic or diatonic gram, or matching a contour
+    piece (see contour_pieces; found by intersecting the posting lists of
+    its grams), are verified with layer_scores against the stored notes.
+    `exclude` is a (file, voice, note_index) to leave out (the query itself)."""
+    n = index["n"]
+    length = len(sub_notes)
+    if length - 1 < n:
+        raise ValueError(f"segment needs at least {n + 1} notes for {n}-gram lookup")
+    cache = {}
+    matches = []
+    for invert in (False, True):
+        layers = layer_strings(sub_notes, invert)
+        votes = {}
+        for layer in ("chromatic", "diatonic"):
+            values = layers[layer]
+            for k in range(len(values) - n + 1):
+                for key, vi, i in index["postings"][layer].get(gram_key(values[k:k + n]), []):
+                    if i - k >= 0:
+                        votes[(key, vi, i - k)] = votes.get((key, vi, i - k), 0) + 1
+        # Contour grams are unselective on their own: intersect the starts
+        # of every gram in a piece, leaving windows where the piece matches.
+        values = layers["contour"]
+        for lo, hi in contour_pieces(len(values), n, min_score):
+            contour = None
+            for k in range(lo, hi - n + 1):
+                starts = {(key, vi, i - k) for key, vi, i
+                          in index["postings"]["contour"].get(gram_key(values[k:k + n]), [])
+                          if i - k >= 0}
+                contour = starts if contour is None else contour & starts
+                if not contour:
+                    break
+            for found in contour or ():
+                votes[found] = votes.get(found, 0) + hi - lo - n + 1
+        for (key, vi, i), count in votes.items():
+            if (key, vi, i) == exclude:
+                continue
+            if key not in cache:
+                cache[key] = stored_voices(index["files"][key])
+            seg = cache[key][vi][i:i + length]
+            if len(seg) < length:
+                continue
+            sc = layer_scores(sub_notes, seg, invert)
+            if sc["weighted"] < min_score:
+                continue
+            matches.append(dict(
+                file=key, voice=vi, note_index=i,
+                beat_start=seg[0]["beat"], beat_end=seg[-1]["beat"],
+                transposition=seg[0]["midi"] - sub_notes[0]["midi"],
+                kind=classify(sc, invert, length - 1), inverted=invert,
+                votes=count, **sc))
+    matches.sort(key=lambda m: (-m["weighted"], -m["votes"], m["file"], m["voice"], m["note_index"]))
+    return matches[:limit] if limit else matches
+
+
+def command_index(argv):
+    ap = argparse.ArgumentParser(prog="midgrid_motif.py index",
+                                 description="Build or update the corpus motif n-gram index.")
+    ap.add_argument("paths", nargs="*", default=["."],
+                    help="files or directories to index (default: .)")
+    ap.add_argument("--index", type=Path, default=DEFAULT_INDEX)
+    ap.add_argument("--n", type=int, help="n-gram length in intervals (default 4; "
+                                          "changing it rebuilds the index)")
+    ap.add_argument("--rebuild", action="store_true", help="ignore the saved index")
+    args = ap.parse_args(argv)
+    start = time.perf_counter()
+    index = empty_index(args.n or 4) if args.rebuild else load_index(args.index, args.n)
+    stats = update_index(index, args.paths)
+    args.index.write_text(json.dumps(index, separators=(",", ":")))
+    grams = sum(len(index["postings"][layer]) for layer in INDEX_LAYERS)
+    print(f"{args.index}: {len(index['files'])} files, {grams} grams "
+          f"(added {stats['added']}, updated {stats['updated']}, "
+          f"removed {stats['removed']}, unchanged {stats['unchanged']}) "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return 0
+
+
+def command_query(argv):
+    ap = argparse.ArgumentParser(prog="midgrid_motif.py query",
+                                 description="Find a segment, or its inversion, across the indexed corpus.")
+    ap.add_argument("file", type=Path)
+    ap.add_argument("segment", help="segment spec, e.g. V1:0-8 (end exclusive)")
+    ap.add_argument("--index", type=Path, default=DEFAULT_INDEX)
+    ap.add_argument("--min-score", type=float, default=0.70)
+    ap.add_argument("--limit", type=int, default=20, help="matches to list (0 = all)")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+    if not args.index.exists():
+        raise SystemExit(f"{args.index} not found; run `midgrid_motif.py index` first")
+    index = load_index(args.index)
+    voices = parse_midgrid(args.file)
+    sub_voice, sub_notes = parse_segment(args.segment, voices)
+    start = time.perf_counter()
+    exclude = (args.file.as_posix(), sub_voice, voices[sub_voice].index(sub_notes[0]))
+    try:
+        matches = query_index(index, sub_notes, args.min_score, exclude, args.limit)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    elapsed = (time.perf_counter() - start) * 1000
+    complete = query_is_complete(index["n"], len(sub_notes), args.min_score)
+    if args.json:
+        print(json.dumps(dict(query=dict(file=str(args.file), segment=args.segment),
+                              elapsed_ms=round(elapsed, 3), complete=complete,
+                              matches=matches), indent=2))
+        return 0
+    print(f"{args.file} {args.segment}: {len(matches)} matches in "
+          f"{len(index['files'])} files ({elapsed:.1f} ms)")
+    if not complete:
+        print("  (recall not guaranteed at this --min-score: windows sharing no n-gram "
+              "and only part of the contour are not searched)")
+    for m in matches:
+        print(f"  {m['file']} V{m['voice']} beats {m['beat_start']:g}-{m['beat_end']:g}  "
+              f"{m['kind'].upper():<12} t={m['transposition']:+d}  "
+              f"[w {m['weighted']:.2f}, {m['votes']} grams]")
+    return 0
+
+
 def parse_segment(spec: str, voices):
     m = re.match(r"^V(\d+):([\d.]+)-([\d.]+)$", spec)
     if not m:
@@ -379,12 +1329,28 @@ def compare_report(sub_notes, seg_notes):
 
 
 def main(argv):
+    if argv and argv[0] == "index":
+        return command_index(argv[1:])
+    if argv and argv[0] == "query":
+        return command_query(argv[1:])
     ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
     ap.add_argument("file", type=Path)
-    ap.add_argument("--subject", help="segment spec, e.g. V1:0-8 (end exclusive)")
+    ap.add_argument("--subject", action="append",
+                    help="segment spec, e.g. V1:0-8 (end exclusive); repeatable")
+    ap.add_argument("--subjects", type=Path,
+                    help="file of segment specs, one per line")
     ap.add_argument("--min-score", type=float, default=0.70)
+    ap.add_argument("--max-edits", type=int, metavar="K",
+                    help="approximate echoes: allow K inserted, deleted or "
+                         "substituted intervals (Myers bit-parallel search)")
     ap.add_argument("--compare", nargs=2, metavar="SEG",
                     help="print derivative diff of two segments and exit")
+    ap.add_argument("--discover", action="store_true",
+                    help="report the most frequently recurring cells and exit")
+    ap.add_argument("--lengths", default="4,6,8",
+                    help="cell lengths in intervals for --discover (default 4,6,8)")
+    ap.add_argument("--top", type=int, default=5,
+                    help="cells per length for --discover (0 = all)")
     ap.add_argument("--write-json", type=Path)
     args = ap.parse_args(argv)
 
@@ -399,48 +1365,107 @@ def main(argv):
               f"chromatic {sc['chromatic']:.2f}  weighted {sc['weighted']:.2f}")
         return 0
 
-    if args.subject:
-        sub_voice, sub_notes = parse_segment(args.subject, voices)
+    if args.discover:
+        lengths = [int(x) for x in args.lengths.split(",") if x.strip()]
+        discovered = {length: discover_cells(voices, length, args.top)
+                      for length in lengths}
+        for length, cells in discovered.items():
+            print(f"Recurring cells ({length} intervals, {length + 1} notes):")
+            for c in cells:
+                where = ", ".join(f"V{o['voice']}@{o['beat_start']:g}"
+                                  + ("i" if o["inverted"] else "")
+                                  for o in c["occurrences"][:8])
+                more = len(c["occurrences"]) - 8
+                print(f"  {c['layer']:<9} {fmt_d1(c['d1']):<28} x{c['count']}"
+                      f" ({c['inversions']} inverted)  {where}"
+                      + (f" +{more}" if more > 0 else ""))
+        if args.write_json:
+            args.write_json.write_text(json.dumps(dict(
+                file=str(args.file),
+                discovered=[c for cells in discovered.values() for c in cells]),
+                indent=2))
+            print(f"\nJSON written to {args.write_json}")
+        return 0
+
+    specs = list(args.subject or [])
+    if args.subjects:
+        specs += [line.strip() for line in args.subjects.read_text().splitlines()
+                  if line.strip() and not line.strip().startswith("#")]
+    if specs:
+        subjects = [parse_segment(spec, voices) for spec in specs]
     else:
-        sub_voice, sub_notes = default_subject(voices)
-    sub_start_idx = voices[sub_voice].index(sub_notes[0])
+        subjects = [default_subject(voices)]
 
-    echoes = find_echoes(voices, sub_voice, sub_start_idx, sub_notes,
-                         args.min_score)
-    recalls = find_recalls(voices)
+    if args.max_edits is not None:
+        echo_lists = [find_approximate_echoes(
+                          voices, sub_voice, voices[sub_voice].index(sub_notes[0]),
+                          sub_notes, args.min_score, args.max_edits)
+                      for sub_voice, sub_notes in subjects]
+    elif len(subjects) == 1:
+        sub_voice, sub_notes = subjects[0]
+        sub_start_idx = voices[sub_voice].index(sub_notes[0])
+        echo_lists = [find_echoes(voices, sub_voice, sub_start_idx, sub_notes,
+                                  args.min_score)]
+    else:
+        echo_lists = find_subject_echoes(voices, subjects, args.min_score)
+    index = recall_index(voices)
+    recalls = find_recalls(voices, index=index)
+    cross_recalls = find_cross_recalls(voices, index=index)
     fusion = melodic_fusion(voices)
 
     total_attacks = sum(len(v) for v in voices)
-    covered = len(sub_notes)
-    for e in echoes:
-        covered += len(sub_notes)
+    # Approximate echoes (--max-edits) carry their own length in "notes".
+    covered = sum(len(sub_notes) + sum(e.get("notes", len(sub_notes)) for e in echoes)
+                  for (_voice, sub_notes), echoes in zip(subjects, echo_lists))
     economy = covered / total_attacks if total_attacks else 0.0
+    stretto_lists = [find_strettos(subject_entries(voices, sub_voice, sub_notes, echoes))
+                     for (sub_voice, sub_notes), echoes in zip(subjects, echo_lists)]
 
-    print(f"Subject: V{sub_voice} beats {sub_notes[0]['beat']:g}-"
-          f"{sub_notes[-1]['beat']:g} ({len(sub_notes)} notes): "
-          + " ".join(n["name"] for n in sub_notes))
-    print(f"  chromatic d1: {fmt_d1(d1_chrom(sub_notes))}")
-    print(f"  diatonic  d1: {fmt_d1(d1_diat(sub_notes))}")
-    print(f"\nEchoes (min weighted score {args.min_score}):")
-    for e in echoes:
-        adj = ""
-        if e["kind"] == "diatonic" and e["chromatic_mismatch_at"]:
-            adj = " adjusted at interval " + ",".join(
-                str(i) for i in e["chromatic_mismatch_at"])
-        elif e["kind"] == "tonal":
-            adj = " head-adjusted at interval " + ",".join(
-                str(i) for i in sorted(set(e["chromatic_mismatch_at"])
-                                       | set(e["diatonic_mismatch_at"])))
-        print(f"  V{e['voice']} beats {e['beat_start']:g}-{e['beat_end']:g}  "
-              f"{e['kind'].upper():<12} t={e['transposition']:+d}  "
-              f"contour {e['contour']:.2f} diat {e['diatonic']:.2f} "
-              f"chrom {e['chromatic']:.2f} [w {e['weighted']:.2f}]{adj}")
+    for si, ((sub_voice, sub_notes), echoes, strettos) in enumerate(
+            zip(subjects, echo_lists, stretto_lists)):
+        if si:
+            print()
+        label = "Subject" if len(subjects) == 1 else f"Subject {si}"
+        print(f"{label}: V{sub_voice} beats {sub_notes[0]['beat']:g}-"
+              f"{sub_notes[-1]['beat']:g} ({len(sub_notes)} notes): "
+              + " ".join(n["name"] for n in sub_notes))
+        print(f"  chromatic d1: {fmt_d1(d1_chrom(sub_notes))}")
+        print(f"  diatonic  d1: {fmt_d1(d1_diat(sub_notes))}")
+        print(f"\nEchoes (min weighted score {args.min_score}):")
+        for e in echoes:
+            adj = ""
+            if e["kind"] == "diatonic" and e["chromatic_mismatch_at"]:
+                adj = " adjusted at interval " + ",".join(
+                    str(i) for i in e["chromatic_mismatch_at"])
+            elif e["kind"] == "tonal":
+                adj = " head-adjusted at interval " + ",".join(
+                    str(i) for i in sorted(set(e["chromatic_mismatch_at"])
+                                           | set(e["diatonic_mismatch_at"])))
+            print(f"  V{e['voice']} beats {e['beat_start']:g}-{e['beat_end']:g}  "
+                  f"{e['kind'].upper():<12} t={e['transposition']:+d}  "
+                  f"contour {e['contour']:.2f} diat {e['diatonic']:.2f} "
+                  f"chrom {e['chromatic']:.2f} [w {e['weighted']:.2f}]{adj}"
+                  + (f" ({e['edits']} edits)" if e.get("edits") else ""))
+        if strettos:
+            print(f"\nStretto (overlapping entries):")
+        for st in strettos:
+            lead = st["entries"][0]
+            follow = ", ".join(f"V{e['voice']} +{e['delay']:g} at {e['interval']:+d} ({e['kind']})"
+                               for e in st["entries"][1:])
+            print(f"  beats {st['beat_start']:g}-{st['beat_end']:g}  "
+                  f"V{lead['voice']} ({lead['kind']}), {follow}")
     print(f"\nVerbatim recalls (episode rhymes):")
     for r in recalls:
         print(f"  V{r['voice']} beats {r['first']['beat_start']:g}-"
               f"{r['first']['beat_end']:g} == beats "
               f"{r['second']['beat_start']:g}-{r['second']['beat_end']:g} "
               f"({r['length']} notes, t={r['transposition']:+d})")
+    print(f"\nCross-voice recalls:")
+    for r in cross_recalls:
+        print(f"  V{r['first']['voice']} beats {r['first']['beat_start']:g}-"
+              f"{r['first']['beat_end']:g} == V{r['second']['voice']} beats "
+              f"{r['second']['beat_start']:g}-{r['second']['beat_end']:g} "
+              f"({r['length']} notes, t={r['transposition']:+d})")
     print(f"\nMelodic fusion regions (same-direction co-movement):")
     for r in fusion[:8]:
         print(f"  {r['pair']} beats {r['beat_start']:g}-{r['beat_end']:g} "
@@ -454,15 +1479,21 @@ def main(argv):
           f"in subject-family spans")
 
     if args.write_json:
+        described = [dict(voice=sub_voice,
+                          beat_start=sub_notes[0]["beat"],
+                          beat_end=sub_notes[-1]["beat"],
+                          notes=[n["name"] for n in sub_notes],
+                          chromatic_d1=d1_chrom(sub_notes),
+                          diatonic_d1=d1_diat(sub_notes))
+                     for sub_voice, sub_notes in subjects]
         args.write_json.write_text(json.dumps(dict(
             file=str(args.file),
-            subject=dict(voice=sub_voice,
-                         beat_start=sub_notes[0]["beat"],
-                         beat_end=sub_notes[-1]["beat"],
-                         notes=[n["name"] for n in sub_notes],
-                         chromatic_d1=d1_chrom(sub_notes),
-                         diatonic_d1=d1_diat(sub_notes)),
-            echoes=echoes, recalls=recalls, fusion=fusion,
+            subject=described[0], echoes=echo_lists[0],
+            stretto=stretto_lists[0],
+            subjects=[dict(subject=d, echoes=e, stretto=st)
+                      for d, e, st in zip(described, echo_lists, stretto_lists)],
+            recalls=recalls, cross_recalls=cross_recalls,
+            fusion=fusion,
             homorhythm=strata, motivic_economy=economy), indent=2))
         print(f"\nJSON written to {args.write_json}")
     return 0
@@ -4,96 +4,94 @@ import re
 import math
 import json
 
-args = dict(enumerate(argv))
-midgrid_in_path = args[1]
-midgrid_out_path = args[2]
-
-# Collect other MIDI events (non-meta, non-voice tracks)
-other_midi_events = []
-
 # Voice aliases
 voice_alias = {'S': 0, 'A': 1, 'T': 2, 'B': 3}
 
-with open(midgrid_in_path) as f:
-    raw_lines = f.readlines()
-
-# Parse tempo changes from raw_lines
-tempo_changes = []
-seen_tempos = set()
-for line in raw_lines:
-    line_strip = line.strip()
-    if line_strip.startswith("# tempo"):
-        parts = line_strip.split()
-        if len(parts) >= 3:
-            try:
-                bpm = float(parts[2])
-                if len(parts) >= 4:
-                    at_beat = float(parts[3])
+
+def parse_tempo_changes(raw_lines):
+    # Parse tempo changes from raw_lines
+    tempo_changes = []
+    seen_tempos = set()
+    for line in raw_lines:
+        line_strip = line.strip()
+        if line_strip.startswith("# tempo"):
+            parts = line_strip.split()
+            if len(parts) >= 3:
+                try:
+                    bpm = float(parts[2])
+                    if len(parts) >= 4:
+                        at_beat = float(parts[3])
+                    else:
+                        at_beat = 0.0
+                    key = (round(bpm, 6), round(at_beat, 6))
+                    # Deduplicate tempo changes at same beat and bpm
+                    if key not in seen_tempos:
+                        tempo_changes.append((at_beat, bpm))
+                        seen_tempos.add(key)
+                except ValueError:
+                    pass
+
+    # Sort tempo changes by beat
+    tempo_changes.sort(key=lambda x: x[0])
+    return tempo_changes
+
+
+def collect_grid_lines(raw_lines):
+    """Split raw file lines into grid lines and Patch/Pan directives."""
+    lines = []
+    patches = {}
+    patch_directives = []
+    pan_directives = []
+
+    for line_index, line in enumerate(raw_lines):
+        line_strip = line.strip()
+        if line_strip.startswith("// Patch"):
+            match = re.match(r'//\s*Patch\s+(?:(V\d+)|([A-Z])):\s*(\d+)', line_strip)
+            if match:
+                v_label = match.group(1)
+                s_label = match.group(2)
+                patch = int(match.group(3))
+
+                if v_label:
+                    voice_idx = int(v_label[1:])
+                elif s_label:
+                    voice_idx = voice_alias.get(s_label)
+                    if voice_idx is None:
+                        raise ValueError(f"Unknown voice label '{s_label}' in Patch directive.")
+                else:
+                    raise ValueError("Malformed Patch directive.")
+
+                if line_index == 0:
+                    patches[voice_idx] = patch
                 else:
-                    at_beat = 0.0
-                key = (round(bpm, 6), round(at_beat, 6))
-                # Deduplicate tempo changes at same beat and bpm
-                if key not in seen_tempos:
-                    tempo_changes.append((at_beat, bpm))
-                    seen_tempos.add(key)
-            except ValueError:
-                pass
-
-# Sort tempo changes by beat
-tempo_changes.sort(key=lambda x: x[0])
-
-lines = []
-patches = {}
-patch_directives = []
-pan_directives = []
-
-for line_index, line in enumerate(raw_lines):
-    line_strip = line.strip()
-    if line_strip.startswith("// Patch"):
-        match = re.match(r'//\s*Patch\s+(?:(V\d+)|([A-Z])):\s*(\d+)', line_strip)
-        if match:
-            v_label = match.group(1)
-            s_label = match.group(2)
-            patch = int(match.group(3))
-
-            if v_label:
-                voice_idx = int(v_label[1:])
-            elif s_label:
-                voice_idx = voice_alias.get(s_label)
-                if voice_idx is None:
-                    raise ValueError(f"Unknown voice label '{s_label}' in Patch directive.")
-            else:
-                raise ValueError("Malformed Patch directive.")
-
-            if line_index == 0:
-                patches[voice_idx] = patch
-            else:
-                # Deduplicate patch directives for same line and voice
-                if not any(pd[0] == len(lines) and pd[1] == voice_idx and pd[2] == patch for pd in patch_directives):
-                    patch_directives.append((len(lines), voice_idx, patch))
-    elif line_strip.startswith("// Pan"):
-        match = re.match(r'//\s*Pan\s+(?:(V\d+)|([A-Z])):\s*(\d+)', line_strip)
-        if match:
-            v_label = match.group(1)
-            s_label = match.group(2)
-            pan = int(match.group(3))
-
-            if v_label:
-                voice_idx = int(v_label[1:])
-            elif s_label:
-                voice_idx = voice_alias.get(s_label)
-                if voice_idx is None:
-                    raise ValueError(f"Unknown voice label '{s_label}' in Pan directive.")
-            else:
-                raise ValueError("Malformed Pan directive.")
-
-            # Deduplicate pan directives for same line and voice
-            if not any(pd[0] == len(lines) and pd[1] == voice_idx and pd[2] == pan for pd in pan_directives):
-                pan_directives.append((len(lines), voice_idx, pan))
-    elif line_strip.startswith("# events"):
-        break  # stop collecting grid lines at event section
-    elif line_strip and not line_strip.startswith("#"):
-        lines.append(line)
+                    # Deduplicate patch directives for same line and voice
+                    if not any(pd[0] == len(lines) and pd[1] == voice_idx and pd[2] == patch for pd in patch_directives):
+                        patch_directives.append((len(lines), voice_idx, patch))
+        elif line_strip.startswith("// Pan"):
+            match = re.match(r'//\s*Pan\s+(?:(V\d+)|([A-Z])):\s*(\d+)', line_strip)
+            if match:
+                v_label = match.group(1)
+                s_label = match.group(2)
+                pan = int(match.group(3))
+
+                if v_label:
+                    voice_idx = int(v_label[1:])
+                elif s_label:
+                    voice_idx = voice_alias.get(s_label)
+                    if voice_idx is None:
+                        raise ValueError(f"Unknown voice label '{s_label}' in Pan directive.")
+                else:
+                    raise ValueError("Malformed Pan directive.")
+
+                # Deduplicate pan directives for same line and voice
+                if not any(pd[0] == len(lines) and pd[1] == voice_idx and pd[2] == pan for pd in pan_directives):
+                    pan_directives.append((len(lines), voice_idx, pan))
+        elif line_strip.startswith("# events"):
+            break  # stop collecting grid lines at event section
+        elif line_strip and not line_strip.startswith("#"):
+            lines.append(line)
+
+    return lines, patches, patch_directives, pan_directives
 
 
 note_map = {'C': 0, 'C#': 1, 'D': 2, 'D#': 3, 'E': 4, 'F': 5,
@@ -138,14 +136,13 @@ def parse_note_cell(cell):
     meta['midi'] = note_to_midi(meta['pitch'])
     return meta
 
-first_data = lines[0].split('|')
-voice_count = len(first_data) - 1
-patch_list = [patches.get(i, 19) for i in range(voice_count)]
+def grid_voice_count(lines):
+    return len(lines[0].split('|')) - 1
 
-notes = [[] for _ in range(voice_count)]
-beats = []
 
-for line in lines:
+def parse_grid_row(line, voice_count):
+    """Return (beat, note metas) for one grid line; beat is None when the
+    line has no numeric beat label."""
     comment_split = line.split('//')
     core = comment_split[0].strip()
     parts = core.split('|')
@@ -155,135 +152,156 @@ for line in lines:
         parts.append('')
     try:
         beat_val = float(parts[0])
-        beats.append(beat_val)
     except ValueError:
         # For lines without a valid beat, still append None to keep line alignment
-        beats.append(None)
-    for i in range(voice_count):
-        notes[i].append(parse_note_cell(parts[i + 1]))
+        beat_val = None
+    return beat_val, [parse_note_cell(parts[i + 1]) for i in range(voice_count)]
 
-# Fill in implicit durations by extending notes only until the next beat row
-for v in range(voice_count):
-    for i in range(len(notes[v])):
-        meta = notes[v][i]
-        if meta["duration"] is not None:
-            continue
-        start_beat = beats[i]
-        if start_beat is None:
-            meta["duration"] = 1.0
-            continue
-        # Find next valid beat row (not necessarily a note)
-        for j in range(i + 1, len(beats)):
-            if beats[j] is not None:
-                meta["duration"] = beats[j] - start_beat
-                break
-        else:
-            meta["duration"] = 1.0
-
-mid = MidiFile(ticks_per_beat=480)
-meta = MidiTrack()
-
-# Insert tempo changes at correct tick positions
-last_tick = 0
-last_beat = 0.0
-last_tempo = None
-for beat, bpm in tempo_changes:
-    delta_beats = beat - last_beat
-    delta_ticks = int(delta_beats * mid.ticks_per_beat)
-    delta_time = max(0, delta_ticks - last_tick)
-    tempo = int(60_000_000 / bpm)
-    if last_tempo != tempo or abs(beat - last_beat) > 1e-9:
-        meta.append(MetaMessage('set_tempo', tempo=tempo, time=delta_time))
-        last_tick += delta_time
-        last_beat = beat
-        last_tempo = tempo
-
-if not tempo_changes:
-    meta.append(MetaMessage('set_tempo', tempo=int(60_000_000 / 96)))
-
-mid.tracks.append(meta)
-
-tracks = [MidiTrack() for _ in range(voice_count)]
-for track in tracks:
-    mid.tracks.append(track)
-
-# Scan all tracks (except meta and voice tracks) for additional events
-for track in mid.tracks:
-    abs_time = 0
-    for msg in track:
-        abs_time += msg.time
-        if msg.type in ('control_change', 'pitchwheel', 'aftertouch', 'text', 'program_change'):
-            beat = abs_time / mid.ticks_per_beat
-            event_dict = msg.dict()
-            event_dict.pop('time')
-            other_midi_events.append((beat, msg.type, event_dict))
-
-# Emit notes at absolute times: each row's beat label is the note's start,
-# and the note lasts its explicit duration, or implicitly until the next row.
-current_patches = patch_list.copy()
-for i in range(voice_count):
-    track = tracks[i]
-    if i not in current_patches or current_patches[i] != patch_list[i]:
-        track.append(Message('program_change', program=patch_list[i], channel=i))
-        current_patches[i] = patch_list[i]
-
-    scheduled = []
-    for row_idx, meta in enumerate(notes[i]):
-        start = beats[row_idx]
-        if start is None:
-            continue
-        if meta['pitch'] == '-':
-            # Hold: sustain the previous note through this row's span
-            if scheduled:
-                span = meta['duration'] if meta['duration'] is not None else 1.0
-                scheduled[-1]['end'] = max(scheduled[-1]['end'], start + span)
-        elif meta['midi'] is not None:
-            dur = meta['duration'] if meta['duration'] is not None else 1.0
-            scheduled.append({
-                'note': meta['midi'],
-                'start': start,
-                'end': start + dur,
-                'vel': meta['velocity'],
-                'patch': meta['patch'],
-            })
-
-    # Voices are monophonic: truncate any note overlapping the next attack
-    for cur, nxt in zip(scheduled, scheduled[1:]):
-        if cur['end'] > nxt['start']:
-            cur['end'] = nxt['start']
-
-    voice_events = []  # (tick, priority, message); offs/patches before ons
-    for (directive_row, voice_idx, patch_num) in patch_directives:
-        if voice_idx == i and directive_row < len(beats) and beats[directive_row] is not None:
-            tick = int(beats[directive_row] * mid.ticks_per_beat)
-            voice_events.append((tick, 0, Message('program_change', program=patch_num, channel=i)))
-    for (directive_row, voice_idx, pan_value) in pan_directives:
-        if voice_idx == i and directive_row < len(beats) and beats[directive_row] is not None:
-            tick = int(beats[directive_row] * mid.ticks_per_beat)
-            voice_events.append((tick, 0, Message('control_change', control=10, value=pan_value, channel=i)))
-    for n in scheduled:
-        if n['end'] <= n['start']:
-            continue
-        start_tick = int(n['start'] * mid.ticks_per_beat)
-        end_tick = int(n['end'] * mid.ticks_per_beat)
-        if n['patch'] is not None:
-            voice_events.append((start_tick, 0, Message('program_change', program=n['patch'], channel=i)))
-        voice_events.append((start_tick, 1, Message('note_on', note=n['note'], velocity=n['vel'], channel=i)))
-        voice_events.append((end_tick, 0, Message('note_off', note=n['note'], velocity=70, channel=i)))
-    voice_events.sort(key=lambda e: (e[0], e[1]))
-
-    now = 0
-    for tick, _priority, msg in voice_events:
-        if msg.type == 'program_change':
-            if msg.program == current_patches[i]:
+
+def implicit_duration(beats, i):
+    """Length of row i's span: until the next beat row (not necessarily a note)."""
+    start_beat = beats[i]
+    if start_beat is None:
+        return 1.0
+    for j in range(i + 1, len(beats)):
+        if beats[j] is not None:
+            return beats[j] - start_beat
+    return 1.0
+
+
+def parse_grid(lines):
+    """Parse grid lines into per-voice note metas and row beats."""
+    voice_count = grid_voice_count(lines)
+    notes = [[] for _ in range(voice_count)]
+    beats = []
+
+    for line in lines:
+        beat_val, metas = parse_grid_row(line, voice_count)
+        beats.append(beat_val)
+        for i in range(voice_count):
+            notes[i].append(metas[i])
+
+    # Fill in implicit durations by extending notes only until the next beat row
+    for v in range(voice_count):
+        for i in range(len(notes[v])):
+            meta = notes[v][i]
+            if meta["duration"] is not None:
+                continue
+            meta["duration"] = implicit_duration(beats, i)
+    return voice_count, notes, beats
+
+
+def build_midi(notes, beats, voice_count, tempo_changes, patches, patch_directives, pan_directives):
+    patch_list = [patches.get(i, 19) for i in range(voice_count)]
+
+    mid = MidiFile(ticks_per_beat=480)
+    meta = MidiTrack()
+
+    # Insert tempo changes at correct tick positions
+    last_tick = 0
+    last_beat = 0.0
+    last_tempo = None
+    for beat, bpm in tempo_changes:
+        delta_beats = beat - last_beat
+        delta_ticks = int(delta_beats * mid.ticks_per_beat)
+        delta_time = max(0, delta_ticks - last_tick)
+        tempo = int(60_000_000 / bpm)
+        if last_tempo != tempo or abs(beat - last_beat) > 1e-9:
+            meta.append(MetaMessage('set_tempo', tempo=tempo, time=delta_time))
+            last_tick += delta_time
+            last_beat = beat
+            last_tempo = tempo
+
+    if not tempo_changes:
+        meta.append(MetaMessage('set_tempo', tempo=int(60_000_000 / 96)))
+
+    mid.tracks.append(meta)
+
+    tracks = [MidiTrack() for _ in range(voice_count)]
+    for track in tracks:
+        mid.tracks.append(track)
+
+    # Collect other MIDI events (non-meta, non-voice tracks)
+    other_midi_events = []
+
+    # Scan all tracks (except meta and voice tracks) for additional events
+    for track in mid.tracks:
+        abs_time = 0
+        for msg in track:
+            abs_time += msg.time
+            if msg.type in ('control_change', 'pitchwheel', 'aftertouch', 'text', 'program_change'):
+                beat = abs_time / mid.ticks_per_beat
+                event_dict = msg.dict()
+                event_dict.pop('time')
+                other_midi_events.append((beat, msg.type, event_dict))
+
+    # Emit notes at absolute times: each row's beat label is the note's start,
+    # and the note lasts its explicit duration, or implicitly until the next row.
+    current_patches = patch_list.copy()
+    for i in range(voice_count):
+        track = tracks[i]
+        if i not in current_patches or current_patches[i] != patch_list[i]:
+            track.append(Message('program_change', program=patch_list[i], channel=i))
+            current_patches[i] = patch_list[i]
+
+        scheduled = []
+        for row_idx, meta in enumerate(notes[i]):
+            start = beats[row_idx]
+            if start is None:
                 continue
-            current_patches[i] = msg.program
-        msg.time = max(0, tick - now)
-        track.append(msg)
-        now = tick
+            if meta['pitch'] == '-':
+                # Hold: sustain the previous note through this row's span
+                if scheduled:
+                    span = meta['duration'] if meta['duration'] is not None else 1.0
+                    scheduled[-1]['end'] = max(scheduled[-1]['end'], start + span)
+            elif meta['midi'] is not None:
+                dur = meta['duration'] if meta['duration'] is not None else 1.0
+                scheduled.append({
+                    'note': meta['midi'],
+                    'start': start,
+                    'end': start + dur,
+                    'vel': meta['velocity'],
+                    'patch': meta['patch'],
+                })
+
+        # Voices are monophonic: truncate any note overlapping the next attack
+        for cur, nxt in zip(scheduled, scheduled[1:]):
+            if cur['end'] > nxt['start']:
+                cur['end'] = nxt['start']
+
+        voice_events = []  # (tick, priority, message); offs/patches before ons
+        for (directive_row, voice_idx, patch_num) in patch_directives:
+            if voice_idx == i and directive_row < len(beats) and beats[directive_row] is not None:
+                tick = int(beats[directive_row] * mid.ticks_per_beat)
+                voice_events.append((tick, 0, Message('program_change', program=patch_num, channel=i)))
+        for (directive_row, voice_idx, pan_value) in pan_directives:
+            if voice_idx == i and directive_row < len(beats) and beats[directive_row] is not None:
+                tick = int(beats[directive_row] * mid.ticks_per_beat)
+                voice_events.append((tick, 0, Message('control_change', control=10, value=pan_value, channel=i)))
+        for n in scheduled:
+            if n['end'] <= n['start']:
+                continue
+            start_tick = int(n['start'] * mid.ticks_per_beat)
+            end_tick = int(n['end'] * mid.ticks_per_beat)
+            if n['patch'] is not None:
+                voice_events.append((start_tick, 0, Message('program_change', program=n['patch'], channel=i)))
+            voice_events.append((start_tick, 1, Message('note_on', note=n['note'], velocity=n['vel'], channel=i)))
+            voice_events.append((end_tick, 0, Message('note_off', note=n['note'], velocity=70, channel=i)))
+        voice_events.sort(key=lambda e: (e[0], e[1]))
+
+        now = 0
+        for tick, _priority, msg in voice_events:
+            if msg.type == 'program_change':
+                if msg.program == current_patches[i]:
+                    continue
+                current_patches[i] = msg.program
+            msg.time = max(0, tick - now)
+            track.append(msg)
+            now = tick
+
+    return mid
+
 
-mid.save(midgrid_out_path)
-print(f"Saved {midgrid_out_path}")
 # === PERCEPTUAL CONTRAPUNTAL REPORT ===
 
 def build_harmonic_complexity_table():
@@ -340,45 +358,55 @@ def build_extended_harmonic_complexity_table(max_semitones=127):
             }
     return extended_table
 
+SOUNDING_EPSILON = 1e-9
+
+
+def advance_sounding(metas, current_beat, active_notes, active_until):
+    """Advance the per-voice sounding state (updated in place) over one grid
+    row with a numeric beat, and return the midi sounding in each voice."""
+    epsilon = SOUNDING_EPSILON
+    current_state = []
+    for v in range(len(metas)):
+        note_meta = metas[v]
+        duration = note_meta.get("duration", 1.0)
+        if duration is None:
+            duration = 1.0
+
+        if active_until[v] is not None and current_beat > active_until[v] + epsilon:
+            active_notes[v] = None
+            active_until[v] = None
+
+        if note_meta["pitch"] == "-":
+            if active_notes[v] is not None:
+                start = active_until[v] if active_until[v] is not None else current_beat
+                active_until[v] = max(start, current_beat) + duration
+        elif note_meta["pitch"] == ".":
+            active_notes[v] = None
+            active_until[v] = current_beat + duration
+        else:
+            active_notes[v] = note_meta["midi"]
+            active_until[v] = current_beat + duration
+
+        if active_notes[v] is not None and active_until[v] is not None and current_beat <= active_until[v] + epsilon:
+            current_state.append(active_notes[v])
+        else:
+            current_state.append(None)
+    return current_state
+
+
 def build_sounding_notes(notes, beats):
     voice_count = len(notes)
     active_notes = [None] * voice_count
     active_until = [None] * voice_count
     sounding_at_beat = []
-    epsilon = 1e-9
 
     for row_idx, current_beat in enumerate(beats):
         if current_beat is None:
             sounding_at_beat.append([None] * voice_count)
             continue
 
-        current_state = []
-        for v in range(voice_count):
-            note_meta = notes[v][row_idx]
-            duration = note_meta.get("duration", 1.0)
-            if duration is None:
-                duration = 1.0
-
-            if active_until[v] is not None and current_beat > active_until[v] + epsilon:
-                active_notes[v] = None
-                active_until[v] = None
-
-            if note_meta["pitch"] == "-":
-                if active_notes[v] is not None:
-                    start = active_until[v] if active_until[v] is not None else current_beat
-                    active_until[v] = max(start, current_beat) + duration
-            elif note_meta["pitch"] == ".":
-                active_notes[v] = None
-                active_until[v] = current_beat + duration
-            else:
-                active_notes[v] = note_meta["midi"]
-                active_until[v] = current_beat + duration
-
-            if active_notes[v] is not None and active_until[v] is not None and current_beat <= active_until[v] + epsilon:
-                current_state.append(active_notes[v])
-            else:
-                current_state.append(None)
-        sounding_at_beat.append(current_state)
+        metas = [notes[v][row_idx] for v in range(voice_count)]
+        sounding_at_beat.append(advance_sounding(metas, current_beat, active_notes, active_until))
     return sounding_at_beat
 
 def motion_between_rows(current, previous, i, j):
@@ -405,7 +433,14 @@ def summarize_report(report):
     max_complexity = None
     max_complexity_pair = None
 
+    voice_count = report.get("voice_count", 0)
+    pairs_per_beat = voice_count * (voice_count - 1) // 2
     for beat in report["beats"]:
+        # Pairs missing from a frame (rest pairs omitted) are rests.
+        missing = pairs_per_beat - len(beat["pairs"]) if report.get("rest_pairs_omitted") else 0
+        if missing > 0:
+            motion_counts["n/a"] = motion_counts.get("n/a", 0) + missing
+            rest_pair_count += missing
         for pair in beat["pairs"]:
             motion = pair["motion"]
             motion_counts[motion] = motion_counts.get(motion, 0) + 1
@@ -436,7 +471,59 @@ def summarize_report(report):
     }
 
 
-def contrapuntal_report_data(notes, beats):
+def rest_pair(i, j, m1, m2):
+    return {
+        "voices": [i, j],
+        "voice_pair": f"V{i}-V{j}",
+        "midis": [m1, m2],
+        "interval": "rest",
+        "interval_semitones": None,
+        "phase_aligned": None,
+        "motion": "n/a",
+        "perceptual_complexity": None,
+    }
+
+
+def beat_report_data(table, beat, midis, previous, include_rests=True):
+    """Report frame for one beat: every voice pair's interval and motion
+    against the previous row's sounding midis (None on the first row).
+    Pair work runs over the active (sounding) voices only; with
+    include_rests False, resting pairs are left out of the frame."""
+    num_voices = len(midis)
+    active = [i for i in range(num_voices) if midis[i] is not None]
+    beat_report = {
+        "beat": beat,
+        "sounding_midis": midis,
+        "pairs": [],
+    }
+    sounding_pairs = {}
+    for a, i in enumerate(active):
+        for j in active[a + 1:]:
+            m1, m2 = midis[i], midis[j]
+            interval = abs(m2 - m1)
+            motion = motion_between_rows(midis, previous, i, j) if previous is not None else "unknown"
+            cx = table.get(interval)
+            sounding_pairs[(i, j)] = {
+                "voices": [i, j],
+                "voice_pair": f"V{i}-V{j}",
+                "midis": [m1, m2],
+                "interval": cx["name"] if cx else f"{interval} semitones",
+                "interval_semitones": interval,
+                "phase_aligned": cx["phase_aligned"] if cx else False,
+                "motion": motion,
+                "perceptual_complexity": cx["perceptual_complexity"] if cx else None,
+            }
+    if not include_rests:
+        beat_report["pairs"] = list(sounding_pairs.values())
+        return beat_report
+    for i in range(num_voices):
+        for j in range(i + 1, num_voices):
+            pair = sounding_pairs.get((i, j))
+            beat_report["pairs"].append(pair if pair is not None else rest_pair(i, j, midis[i], midis[j]))
+    return beat_report
+
+
+def contrapuntal_report_data(notes, beats, include_rests=True):
     table = build_extended_harmonic_complexity_table()
     sounding = build_sounding_notes(notes, beats)
     num_voices = len(notes)
@@ -446,49 +533,16 @@ def contrapuntal_report_data(notes, beats):
         beat = beats[row]
         if beat is None:
             continue
-        beat_report = {
-            "beat": beat,
-            "sounding_midis": midis,
-            "pairs": [],
-        }
         previous = sounding[row - 1] if row > 0 else None
-        for i in range(num_voices):
-            for j in range(i + 1, num_voices):
-                m1, m2 = midis[i], midis[j]
-                voice_pair = f"V{i}-V{j}"
-                if m1 is None or m2 is None:
-                    pair = {
-                        "voices": [i, j],
-                        "voice_pair": voice_pair,
-                        "midis": [m1, m2],
-                        "interval": "rest",
-                        "interval_semitones": None,
-                        "phase_aligned": None,
-                        "motion": "n/a",
-                        "perceptual_complexity": None,
-                    }
-                else:
-                    interval = abs(m2 - m1)
-                    motion = motion_between_rows(midis, previous, i, j) if previous is not None else "unknown"
-                    cx = table.get(interval)
-                    pair = {
-                        "voices": [i, j],
-                        "voice_pair": voice_pair,
-                        "midis": [m1, m2],
-                        "interval": cx["name"] if cx else f"{interval} semitones",
-                        "interval_semitones": interval,
-                        "phase_aligned": cx["phase_aligned"] if cx else False,
-                        "motion": motion,
-                        "perceptual_complexity": cx["perceptual_complexity"] if cx else None,
-                    }
-                beat_report["pairs"].append(pair)
-        beat_reports.append(beat_report)
+        beat_reports.append(beat_report_data(table, beat, midis, previous, include_rests))
 
     report = {
         "schema": "midgrid.report.v1",
         "voice_count": num_voices,
         "beats": beat_reports,
     }
+    if not include_rests:
+        report["rest_pairs_omitted"] = True
     report["summary"] = summarize_report(report)
     return report
 
@@ -516,15 +570,36 @@ def report_path_with_suffix(mid_path, suffix):
     return mid_path + suffix
 
 
-report_data = contrapuntal_report_data(notes, beats)
-report_text = format_contrapuntal_report(report_data)
-report_path = report_path_with_suffix(midgrid_out_path, ".report.txt")
-with open(report_path, "w") as rep:
-    rep.write(report_text)
-print(f"Perceptual contrapuntal analysis written to {report_path}")
+def main(argv):
+    omit_rests = "--omit-rest-pairs" in argv
+    args = dict(enumerate(arg for arg in argv if arg != "--omit-rest-pairs"))
+    midgrid_in_path = args[1]
+    midgrid_out_path = args[2]
+
+    with open(midgrid_in_path) as f:
+        raw_lines = f.readlines()
+
+    tempo_changes = parse_tempo_changes(raw_lines)
+    lines, patches, patch_directives, pan_directives = collect_grid_lines(raw_lines)
+    voice_count, notes, beats = parse_grid(lines)
+
+    mid = build_midi(notes, beats, voice_count, tempo_changes, patches, patch_directives, pan_directives)
+    mid.save(midgrid_out_path)
+    print(f"Saved {midgrid_out_path}")
+
+    report_data = contrapuntal_report_data(notes, beats, include_rests=not omit_rests)
+    report_text = format_contrapuntal_report(report_data)
+    report_path = report_path_with_suffix(midgrid_out_path, ".report.txt")
+    with open(report_path, "w") as rep:
+        rep.write(report_text)
+    print(f"Perceptual contrapuntal analysis written to {report_path}")
+
+    report_json_path = report_path_with_suffix(midgrid_out_path, ".report.json")
+    with open(report_json_path, "w") as rep:
+        json.dump(report_data, rep, indent=2)
+        rep.write("\n")
+    print(f"Perceptual contrapuntal analysis JSON written to {report_json_path}")
+
 
-report_json_path = report_path_with_suffix(midgrid_out_path, ".report.json")
-with open(report_json_path, "w") as rep:
-    json.dump(report_data, rep, indent=2)
-    rep.write("\n")
-print(f"Perceptual contrapuntal analysis JSON written to {report_json_path}")
+if __name__ == "__main__":
+    main(argv)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Round-trip MidGrid files through the parser and emitter, in process.
+
+Each file goes text -> MIDI -> text -> MIDI -> text. The notes the parser
+writes for each source voice are compared with the voices the emitter reads
+back (source drift), the note sets of the two MIDI generations are compared
+structurally (note drift), the two emitted texts should be identical (a
+fixpoint; text drift counts the lines that differ), and every stage is timed
+so throughput can be checked against a JSON baseline.
+
+Usage:
+    python3 midgrid_roundtrip.py [FILE ...] [--json] [--show]
+                                 [--baseline roundtrip.baseline.json [--update-baseline]]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import midgrid_emitter
+import midgrid_parser
+
+SCHEMA = "midgrid.roundtrip.v1"
+EXERCISES_DIR = Path("exercises")
+STAGES = ["parse", "build", "read", "emit"]
+# What each stage's throughput counts: grid rows in, or MIDI notes.
+STAGE_UNITS = {"parse": "rows", "build": "notes", "read": "notes", "emit": "rows"}
+DRIFT_FIELDS = ["missing", "extra", "duration_changed", "velocity_changed"]
+
+
+def repo_root() -> Path:
+    return Path(__file__).resolve().parent
+
+
+def default_cases() -> list[tuple[str, str]]:
+    """(label, text) of the bundled top-level .midgrid files and the exercise seeds."""
+    root = repo_root()
+    cases = [(path.name, path.read_text(encoding="utf-8")) for path in sorted(root.glob("*.midgrid"))]
+    for path in sorted((root / EXERCISES_DIR).glob("*.json")):
+        exercise = json.loads(path.read_text(encoding="utf-8"))
+        if exercise.get("seed_midgrid"):
+            cases.append((f"{EXERCISES_DIR}/{path.name}:seed", exercise["seed_midgrid"]))
+    return cases
+
+
+class StageClock:
+    """Accumulated seconds and unit counts per stage."""
+
+    def __init__(self) -> None:
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.units = {stage: 0 for stage in STAGES}
+
+    def add(self, stage: str, start: float, units: int) -> None:
+        self.seconds[stage] += time.perf_counter() - start
+        self.units[stage] += units
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        out = {}
+        for stage in STAGES:
+            seconds, units = self.seconds[stage], self.units[stage]
+            out[stage] = {
+                "unit": STAGE_UNITS[stage],
+                "count": units,
+                "ms": round(seconds * 1000.0, 3),
+                "per_second": round(units / seconds, 1) if seconds > 0 else None,
+            }
+        return out
+
+
+def grid_to_midi(text: str, path: Path, clock: StageClock) -> dict[tuple, tuple]:
+    """Parse MidGrid text and save the MIDI file the parser builds; return
+    the notes it wrote, keyed by source voice."""
+    start = time.perf_counter()
+    raw_lines = text.splitlines(keepends=True)
+    tempo_changes = midgrid_parser.parse_tempo_changes(raw_lines)
+    lines, patches, patch_directives, pan_directives = midgrid_parser.collect_grid_lines(raw_lines)
+    voice_count, notes, beats = midgrid_parser.parse_grid(lines)
+    clock.add("parse", start, len(lines))
+
+    start = time.perf_counter()
+    mid = midgrid_parser.build_midi(notes, beats, voice_count, tempo_changes,
+                                    patches, patch_directives, pan_directives)
+    mid.save(str(path))
+    clock.add("build", start, sum(1 for track in mid.tracks for msg in track
+                                  if msg.type == "note_on" and msg.velocity > 0))
+    return source_note_set(mid)
+
+
+def source_note_set(mid) -> dict[tuple, tuple]:
+    """note_set of a parser-built MIDI file, where voice i is track i + 1."""
+    notes = {}
+    for voice, track in enumerate(mid.tracks[1:]):
+        tick, sounding = 0, {}
+        for msg in track:
+            tick += msg.time
+            if msg.type == "note_on" and msg.velocity > 0:
+                sounding[msg.note] = (tick, msg.velocity)
+            elif msg.type in ("note_on", "note_off") and msg.note in sounding:
+                start, velocity = sounding.pop(msg.note)
+                notes[(voice, round(start / mid.ticks_per_beat, 4), msg.note)] = (
+                    round((tick - start) / mid.ticks_per_beat, 4), velocity)
+    return notes
+
+
+def midi_to_grid(path: Path, clock: StageClock) -> tuple[str, list[midgrid_emitter.NoteEvent], int]:
+    """Emit MidGrid text for a MIDI file; also return its notes and ticks per beat."""
+    start = time.perf_counter()
+    parser = midgrid_emitter.MidiParser(str(path))
+    notes = parser.parse_notes()
+    clock.add("read", start, len(notes))
+
+    start = time.perf_counter()
+    scheduler = midgrid_emitter.Scheduler(notes, parser)
+    grid = scheduler.schedule()
+    out = io.StringIO()
+    emitter = midgrid_emitter.GridEmitter(grid, scheduler.timeline, parser.program_changes,
+                                          parser.voice_map, parser.tempo_changes,
+                                          parser.ticks_per_beat, out=out, events=parser.events,
+                                          stops=scheduler.stops, pans=parser.pans)
+    emitter.emit()
+    clock.add("emit", start, emitter.rows)
+    return out.getvalue(), notes, parser.ticks_per_beat
+
+
+def note_set(notes: list[midgrid_emitter.NoteEvent], tpb: int) -> dict[tuple, tuple]:
+    """(voice, start beat, midi) -> (duration in beats, velocity)."""
+    return {(n.voice, round(n.start_tick / tpb, 4), n.midi):
+            (round((n.stop_tick - n.start_tick) / tpb, 4), n.velocity) for n in notes}
+
+
+def note_drift(first: dict[tuple, tuple], second: dict[tuple, tuple]) -> dict[str, Any]:
+    """Compare two note sets: attacks lost or gained, and duration or velocity
+    changes on the attacks both share."""
+    shared = first.keys() & second.keys()
+    durations = [abs(first[k][0] - second[k][0]) for k in shared]
+    return {
+        "notes": len(first),
+        "missing": len(first.keys() - second.keys()),
+        "extra": len(second.keys() - first.keys()),
+        "duration_changed": sum(1 for d in durations if d > 1e-6),
+        "max_duration_drift": round(max(durations, default=0.0), 4),
+        "velocity_changed": sum(1 for k in shared if first[k][1] != second[k][1]),
+    }
+
+
+def text_drift(before: str, after: str) -> int:
+    """Lines of one emitted generation missing from the other, either way."""
+    a, b = Counter(before.splitlines()), Counter(after.splitlines())
+    return sum(((a - b) + (b - a)).values())
+
+
+def round_trip(label: str, text: str, clock: StageClock, workdir: Path) -> dict[str, Any]:
+    """Run one file through two MIDI generations and compare them, and the
+    first generation's voices with the source's."""
+    try:
+        first_mid, second_mid = workdir / "first.mid", workdir / "second.mid"
+        source_notes = grid_to_midi(text, first_mid, clock)
+        second_text, first_notes, tpb = midi_to_grid(first_mid, clock)
+        grid_to_midi(second_text, second_mid, clock)
+        third_text, second_notes, _ = midi_to_grid(second_mid, clock)
+    except Exception as exc:
+        return {"case": label, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    return {
+        "case": label,
+        "ok": True,
+        "source_drift": note_drift(source_notes, note_set(first_notes, tpb)),
+        "drift": note_drift(note_set(first_notes, tpb), note_set(second_notes, tpb)),
+        "stable": second_text == third_text,
+        "text_drift": text_drift(second_text, third_text),
+        "texts": [text, second_text, third_text],
+    }
+
+
+def run(cases: list[tuple[str, str]]) -> dict[str, Any]:
+    clock = StageClock()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="midgrid_roundtrip_") as tmp:
+        for label, text in cases:
+            results.append(round_trip(label, text, clock, Path(tmp)))
+    return {"schema": SCHEMA, "cases": results, "stages": clock.report()}
+
+
+def source_drift_total(case: dict[str, Any]) -> int:
+    return sum(case["source_drift"][field] for field in DRIFT_FIELDS)
+
+
+def drift_total(case: dict[str, Any]) -> int:
+    """Note drift between the generations plus against the source."""
+    return sum(case[key][field] for key in ("drift", "source_drift") if key in case
+               for field in DRIFT_FIELDS)
+
+
+def regressions(current: dict[str, Any], baseline: dict[str, Any], slowdown: float) -> list[str]:
+    """Fidelity and speed regressions of a run against a saved baseline:
+    more note or text drift, a new failure, or a stage whose throughput
+    fell below 1/slowdown of the baseline's."""
+    found = []
+    before = {case["case"]: case for case in baseline.get("cases", [])}
+    for case in current["cases"]:
+        old = before.get(case["case"])
+        if old is None:
+            continue
+        if not case["ok"]:
+            if old["ok"]:
+                found.append(f"{case['case']}: now fails ({case['error']})")
+            continue
+        if not old["ok"]:
+            continue
+        if drift_total(case) > drift_total(old):
+            found.append(f"{case['case']}: drift {drift_total(old)} -> {drift_total(case)}")
+        if case["text_drift"] > old["text_drift"]:
+            found.append(f"{case['case']}: emitted text drift {old['text_drift']} -> {case['text_drift']} lines")
+    for stage, row in current["stages"].items():
+        old_rate = baseline.get("stages", {}).get(stage, {}).get("per_second")
+        if old_rate and row["per_second"] and row["per_second"] * slowdown < old_rate:
+            found.append(f"{stage}: {row['per_second']:.0f} {row['unit']}/s, "
+                         f"baseline {old_rate:.0f} {row['unit']}/s")
+    return found
+
+
+def without_texts(result: dict[str, Any]) -> dict[str, Any]:
+    cases = [{k: v for k, v in case.items() if k != "texts"} for case in result["cases"]]
+    return {**result, "cases": cases}
+
+
+def render_text(result: dict[str, Any], found: list[str] | None) -> str:
+    lines = []
+    for case in result["cases"]:
+        if not case["ok"]:
+            lines.append(f"FAIL  {case['case']}: {case['error']}")
+            continue
+        d, s = case["drift"], case["source_drift"]
+        status = "drift" if drift_total(case) else "ok" if case["stable"] else "text"
+        lines.append(f"{status:<5} {case['case']}: {d['notes']} notes, {d['missing']} missing, "
+                     f"{d['extra']} extra, {d['duration_changed']} durations "
+                     f"(max {d['max_duration_drift']:g} beats), {d['velocity_changed']} velocities"
+                     + ("" if not source_drift_total(case) else
+                        f"; against the source {s['missing']} missing, {s['extra']} extra, "
+                        f"{s['duration_changed']} durations, {s['velocity_changed']} velocities")
+                     + ("" if case["stable"] else f", {case['text_drift']} lines differ between emits"))
+    lines.append("")
+    for stage, row in result["stages"].items():
+        rate = f"{row['per_second']:>12.0f} {row['unit']}/s" if row["per_second"] else " " * 12 + " -"
+        lines.append(f"  {stage:<6} {row['count']:>8} {row['unit']:<5} {row['ms']:>10.2f} ms {rate}")
+    if found is not None:
+        lines.append("")
+        lines.extend([f"REGRESSION {line}" for line in found] or ["no regressions against baseline"])
+    return "\n".join(lines) + "\n"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path,
+                        help="MidGrid files (default: the top-level .midgrid files and exercise seeds)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    parser.add_argument("--show", action="store_true",
+                        help="print each file's source and its two emitted generations")
+    parser.add_argument("--baseline", type=Path,
+                        help="compare against this JSON baseline; exit 1 on a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write this run to --baseline instead of comparing")
+    parser.add_argument("--slowdown", type=float, default=2.0,
+                        help="throughput may fall by this factor before it counts as a regression")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    cli = build_parser()
+    args = cli.parse_args(argv)
+    if args.update_baseline and not args.baseline:
+        cli.error("--update-baseline needs --baseline FILE")
+    cases = ([(str(path), path.read_text(encoding="utf-8")) for path in args.files]
+             if args.files else default_cases())
+    result = run(cases)
+
+    if args.show:
+        for case in result["cases"]:
+            for generation, text in enumerate(case.get("texts", []), start=1):
+                print(f"{case['case']} (generation {generation}):")
+                print(text.rstrip())
+                print()
+
+    found = None
+    if args.baseline and args.update_baseline:
+        args.baseline.write_text(json.dumps(without_texts(result), indent=2) + "\n", encoding="utf-8")
+    elif args.baseline:
+        found = regressions(result, json.loads(args.baseline.read_text(encoding="utf-8")), args.slowdown)
+
+    if args.json:
+        report = without_texts(result)
+        if found is not None:
+            report["regressions"] = found
+        print(json.dumps(report, indent=2))
+    else:
+        print(render_text(result, found), end="")
+    failed = any(not case["ok"] or not case["stable"] or source_drift_total(case)
+                 for case in result["cases"])
+    return 1 if failed or found else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
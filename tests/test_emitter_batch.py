@@ -0,0 +1,27 @@
+import json
+from pathlib import Path
+
+import midgrid_emitter
+import midgrid_parser
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_batch_refuses_a_second_source_for_one_output(tmp_path, capsys):
+    raw_lines = (ROOT / "fugue_exposition_demo.midgrid").read_text(encoding="utf-8").splitlines(keepends=True)
+    lines, patches, patch_directives, pan_directives = midgrid_parser.collect_grid_lines(raw_lines)
+    voice_count, notes, beats = midgrid_parser.parse_grid(lines)
+    mid = midgrid_parser.build_midi(notes, beats, voice_count, midgrid_parser.parse_tempo_changes(raw_lines),
+                                    patches, patch_directives, pan_directives)
+    source = tmp_path / "in"
+    source.mkdir()
+    for name in ("x.mid", "x.MIDI", "y.mid"):
+        mid.save(str(source / name))
+
+    assert midgrid_emitter.run_batch(str(source), str(tmp_path / "out"), 1, {}) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    by_output = {}
+    for record in records:
+        by_output.setdefault(Path(record["output"]).name, []).append(record["ok"])
+    assert sorted(by_output["x.midgrid"]) == [False, True]
+    assert by_output["y.midgrid"] == [True]
@@ -0,0 +1,39 @@
+import mmap
+import struct
+
+import pytest
+
+import midgrid_emitter
+
+
+@pytest.fixture
+def maps(monkeypatch):
+    """Every memory map the emitter opens."""
+    opened, real = [], mmap.mmap
+
+    def recording(*args, **kwargs):
+        opened.append(real(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(midgrid_emitter.mmap, "mmap", recording)
+    return opened
+
+
+def test_bad_header_closes_the_map(tmp_path, maps):
+    path = tmp_path / "bad.mid"
+    path.write_bytes(b"RIFF" + bytes(20))
+    with pytest.raises(ValueError, match="not a Standard MIDI File"):
+        midgrid_emitter.MidiParser(str(path))
+    assert maps and all(m.closed for m in maps)
+
+
+def test_bad_track_closes_the_map(tmp_path, maps):
+    # Data bytes with no status byte before them.
+    track = b"\x00\x40\x40"
+    path = tmp_path / "bad.mid"
+    path.write_bytes(b"MThd" + struct.pack(">IHHH", 6, 0, 1, 480)
+                     + b"MTrk" + struct.pack(">I", len(track)) + track)
+    parser = midgrid_emitter.MidiParser(str(path))
+    with pytest.raises(ValueError, match="running status"):
+        parser.parse_notes()
+    assert maps and all(m.closed for m in maps)
@@ -0,0 +1,127 @@
+import io
+import json
+import random
+from fractions import Fraction
+from pathlib import Path
+
+import mido
+import pytest
+
+import midgrid_emitter
+import midgrid_parser
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# V0's C4 stops at 2, where no other note starts; V1's hold at 1 sits inside it.
+STOP_WITHOUT_ATTACK = """# tempo 120
+0 | C4:2 | E4:1
+1 | -    | F4:3
+2 | .    | -
+3 | D4:1 | -
+"""
+# Both voices fall silent at 2 after a row inside their notes.
+STOP_INTO_SILENCE = """# tempo 120
+0 | C4:2 | E4:1
+1 | -    | F4:1
+2 | .    | .
+4 | D4:1 | G4:1
+"""
+# Pans in the header and mid-file become `// Pan` lines, not # events.
+PANS = """# tempo 120
+// Pan V0: 30
+0 | C4:1 | E4:2
+// Pan V1: 100
+1 | D4:1 | -
+2 | E4:1 | G4:1
+"""
+# An exercise seed whose V0 is all rests: the parser writes V0 as a track
+# with only a program change, and the cantus must come back as V1.
+REST_V0 = json.loads((ROOT / "exercises" / "fifth-species-above-001.json").read_text())["seed_midgrid"]
+CASES = [("stop-without-attack", STOP_WITHOUT_ATTACK), ("stop-into-silence", STOP_INTO_SILENCE),
+         ("rest-v0", REST_V0)]
+CASES += [(path.name, path.read_text(encoding="utf-8")) for path in sorted(ROOT.glob("*.midgrid"))]
+
+
+def grid_to_midi(text, path):
+    raw_lines = text.splitlines(keepends=True)
+    tempo_changes = midgrid_parser.parse_tempo_changes(raw_lines)
+    lines, patches, patch_directives, pan_directives = midgrid_parser.collect_grid_lines(raw_lines)
+    voice_count, notes, beats = midgrid_parser.parse_grid(lines)
+    midgrid_parser.build_midi(notes, beats, voice_count, tempo_changes,
+                              patches, patch_directives, pan_directives).save(str(path))
+
+
+def read_notes(path):
+    parser = midgrid_emitter.MidiParser(str(path))
+    notes = parser.parse_notes()
+    return parser, notes, {(n.voice, n.start_tick, n.stop_tick, n.midi) for n in notes}
+
+
+def midi_to_grid(path, compact=False):
+    parser, notes, _ = read_notes(path)
+    scheduler = midgrid_emitter.Scheduler(notes, parser)
+    grid = scheduler.schedule()
+    out = io.StringIO()
+    midgrid_emitter.GridEmitter(grid, scheduler.timeline, parser.program_changes, parser.voice_map,
+                                parser.tempo_changes, parser.ticks_per_beat, out=out, compact=compact,
+                                events=parser.events, stops=scheduler.stops, pans=parser.pans).emit()
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("label,text", CASES, ids=[label for label, _ in CASES])
+@pytest.mark.parametrize("compact", [False, True], ids=["full", "compact"])
+def test_emitted_grid_keeps_the_notes(tmp_path, label, text, compact):
+    grid_to_midi(text, tmp_path / "first.mid")
+    before = read_notes(tmp_path / "first.mid")[2]
+    grid_to_midi(midi_to_grid(tmp_path / "first.mid", compact), tmp_path / "second.mid")
+    assert read_notes(tmp_path / "second.mid")[2] == before
+
+
+@pytest.mark.parametrize("label,text", CASES + [("pans", PANS)], ids=[label for label, _ in CASES] + ["pans"])
+def test_emitted_grid_is_a_fixpoint(tmp_path, label, text):
+    grid_to_midi(text, tmp_path / "first.mid")
+    emitted = midi_to_grid(tmp_path / "first.mid")
+    grid_to_midi(emitted, tmp_path / "second.mid")
+    assert midi_to_grid(tmp_path / "second.mid") == emitted
+
+
+@pytest.mark.parametrize("label,text", CASES, ids=[label for label, _ in CASES])
+def test_voices_keep_their_source_index(tmp_path, label, text):
+    # The parser writes source voice i on channel i.
+    grid_to_midi(text, tmp_path / "first.mid")
+    notes = read_notes(tmp_path / "first.mid")[1]
+    assert all(n.voice == n.channel for n in notes)
+
+
+def humanize(src, dst, jitter, seed):
+    """Move every note-on and note-off by up to jitter ticks either way."""
+    rng = random.Random(seed)
+    mid = mido.MidiFile(str(src))
+    for track in mid.tracks:
+        tick, timed = 0, []
+        for msg in track:
+            tick += msg.time
+            if msg.type in ("note_on", "note_off"):
+                timed.append((max(0, tick + rng.randint(-jitter, jitter)), msg))
+            else:
+                timed.append((tick, msg))
+        timed.sort(key=lambda item: item[0])
+        track.clear()
+        now = 0
+        for tick, msg in timed:
+            track.append(msg.copy(time=tick - now))
+            now = tick
+    mid.save(str(dst))
+
+
+def test_auto_quantum_keeps_the_few_half_beats(tmp_path):
+    # Only a few boundaries of this chorale sit on half beats; a whole-beat
+    # step would snap its 1.5-beat notes to 1 or 2 beats.
+    grid_to_midi((ROOT / "fugue_satb_registration.midgrid").read_text(encoding="utf-8"), tmp_path / "clean.mid")
+    humanize(tmp_path / "clean.mid", tmp_path / "played.mid", jitter=10, seed=45)
+    parser, notes, _ = read_notes(tmp_path / "played.mid")
+    assert midgrid_emitter.detect_quantum(notes, parser.ticks_per_beat) == Fraction(1, 2)
+    midgrid_emitter.MidGridEmitter(str(tmp_path / "clean.mid"), str(tmp_path / "clean.midgrid")).run()
+    midgrid_emitter.MidGridEmitter(str(tmp_path / "played.mid"), str(tmp_path / "played.midgrid"),
+                                   quantize="auto").run()
+    assert (tmp_path / "played.midgrid").read_text() == (tmp_path / "clean.midgrid").read_text()
@@ -0,0 +1,24 @@
+import pytest
+
+from midgrid_eval import BATCH_CODES, score_voice_candidates
+
+# Parallel fifths: a strict-mode error, and a fusion run by default.
+FIFTHS = """# tempo 120
+0 | G4:1 | C4:1
+1 | A4:1 | D4:1
+2 | B4:1 | E4:1
+3 | C5:1 | F4:1
+"""
+
+
+@pytest.mark.parametrize("strict,reported,silent", [
+    (True, ["parallel_perfect"], ["voice_fusion", "displaced_root_motion"]),
+    (False, ["voice_fusion"], ["parallel_perfect", "direct_perfect"]),
+])
+def test_unreported_codes_count_zero(strict, reported, silent):
+    scores = score_voice_candidates(FIFTHS, 0, 0, 4, [["G4:1", "A4:1", "B4:1", "C5:1"]],
+                                    strict_parallels=strict)
+    counts = dict(zip(BATCH_CODES, scores["counts"][0].tolist()))
+    assert all(counts[code] > 0 for code in reported)
+    assert all(counts[code] == 0 for code in silent)
+    assert (scores["fusion_strength"][0] > 0) != strict
@@ -0,0 +1,19 @@
+import itertools
+import random
+
+import midgrid_eval
+
+
+def pairwise_crossings(sounding):
+    return [(upper, lower, sounding[upper], sounding[lower])
+            for upper, lower in itertools.combinations(range(len(sounding)), 2)
+            if sounding[upper] is not None and sounding[lower] is not None
+            and sounding[upper] < sounding[lower]]
+
+
+def test_voice_crossing_matches_every_pair():
+    rng = random.Random(30)
+    for _ in range(2000):
+        sounding = [rng.choice([None, *range(55, 65)]) for _ in range(rng.randint(0, 12))]
+        found = midgrid_eval.voice_crossing_at({"beat": 1.0, "sounding_midis": sounding})
+        assert [(*item["voices"], *item["midis"]) for item in found] == pairwise_crossings(sounding)
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import midgrid_eval
+
+ROOT = Path(__file__).resolve().parent.parent
+GRID = ROOT / "fugue_in_g_minor.midgrid"
+
+
+def args_for(*flags):
+    return midgrid_eval.build_parser().parse_args([str(GRID), *flags])
+
+
+def test_state_path_skips_like_the_plain_path(tmp_path):
+    args = args_for("--fail-fast", "--budget-ms", "0")
+    plain = midgrid_eval.evaluate(GRID, args, tmp_path / "g.mid")
+    text = GRID.read_text(encoding="utf-8")
+    in_process, state = midgrid_eval.evaluate_text(text, str(GRID), args)
+    assert in_process["skipped_detectors"] == plain["skipped_detectors"] != []
+    assert in_process["issues"] == plain["issues"]
+
+    # The skipped meta-analyses are rescanned by the next run from that state.
+    full, _ = midgrid_eval.evaluate_text(text, str(GRID), args_for())
+    resumed, _ = midgrid_eval.evaluate_text(text, str(GRID), args_for(), state)
+    assert resumed["issues"] == full["issues"]
+
+
+def test_state_path_omits_rest_pairs(tmp_path):
+    args = args_for("--omit-rest-pairs")
+    plain = midgrid_eval.evaluate(GRID, args, tmp_path / "g.mid")
+    in_process, state = midgrid_eval.evaluate_text(GRID.read_text(encoding="utf-8"), str(GRID), args)
+    assert in_process["report_summary"] == plain["report_summary"]
+    assert in_process["issues"] == plain["issues"]
+    assert all(pair["interval_semitones"] is not None
+               for frame in state["frames"] if frame for pair in frame["pairs"])
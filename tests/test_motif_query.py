@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+import midgrid_motif
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = midgrid_motif.empty_index()
+    midgrid_motif.update_index(index, sorted(ROOT.glob("*.midgrid")))
+    return index
+
+
+def scan(index, sub_notes, min_score):
+    """Every window weighing >= min_score, by brute force."""
+    found = set()
+    for key, entry in index["files"].items():
+        for vi, notes in enumerate(midgrid_motif.stored_voices(entry)):
+            for i in range(len(notes) - len(sub_notes) + 1):
+                for invert in (False, True):
+                    sc = midgrid_motif.layer_scores(sub_notes, notes[i:i + len(sub_notes)], invert)
+                    if sc["weighted"] >= min_score:
+                        found.add((key, vi, i, invert))
+    return found
+
+
+@pytest.mark.parametrize("length", [6, 9, 13])
+@pytest.mark.parametrize("min_score", [0.86, 0.9])
+def test_complete_query_finds_every_window(index, length, min_score):
+    assert midgrid_motif.query_is_complete(index["n"], length, min_score)
+    for key in sorted(index["files"]):
+        notes = midgrid_motif.stored_voices(index["files"][key])[0]
+        if len(notes) < 2 * length:
+            continue
+        sub_notes = notes[length:2 * length]
+        matches = midgrid_motif.query_index(index, sub_notes, min_score, limit=0)
+        found = {(m["file"], m["voice"], m["note_index"], m["inverted"]) for m in matches}
+        assert found == scan(index, sub_notes, min_score)
+
+
+def test_default_score_is_not_complete():
+    assert not midgrid_motif.query_is_complete(4, 9, 0.7)
@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import midgrid_motif
+
+ROOT = Path(__file__).resolve().parent.parent
+FILES = sorted(ROOT.glob("*.midgrid")) + sorted(ROOT.glob("experiments/*/submissions/*.midgrid"))
+
+
+@pytest.mark.parametrize("path", FILES, ids=lambda p: p.name)
+@pytest.mark.parametrize("min_score", [0.7, 0.5])
+def test_subject_echoes_same_alone_and_combined(path, min_score):
+    voices = midgrid_motif.parse_midgrid(path)
+    longest = max(range(len(voices)), key=lambda v: len(voices[v]))
+    if len(voices[longest]) < 8:
+        pytest.skip("too short for two subjects")
+    first = midgrid_motif.default_subject(voices)
+    second = (longest, voices[longest][-5:])
+    for (sub_voice, sub_notes), combined in zip(
+            [first, second], midgrid_motif.find_subject_echoes(voices, [first, second], min_score)):
+        alone = midgrid_motif.find_echoes(
+            voices, sub_voice, voices[sub_voice].index(sub_notes[0]), sub_notes, min_score)
+        assert combined == alone
+
+
+def test_economy_counts_each_echo_length(tmp_path):
+    # Approximate echoes can be shorter or longer than the subject.
+    path = ROOT / "fugue_in_g_minor.midgrid"
+    midgrid_motif.main([str(path), "--max-edits", "2", "--write-json", str(tmp_path / "out.json")])
+    voices = midgrid_motif.parse_midgrid(path)
+    sub_voice, sub_notes = midgrid_motif.default_subject(voices)
+    echoes = midgrid_motif.find_approximate_echoes(
+        voices, sub_voice, voices[sub_voice].index(sub_notes[0]), sub_notes, 0.7, 2)
+    assert any(e["notes"] != len(sub_notes) for e in echoes)
+    covered = len(sub_notes) + sum(e["notes"] for e in echoes)
+    economy = json.loads((tmp_path / "out.json").read_text())["motivic_economy"]
+    assert economy == covered / sum(len(v) for v in voices)
@@ -0,0 +1,28 @@
+import midgrid_roundtrip
+
+# V0 never plays; the emitter must still import the source's V1 as V1.
+REST_V0 = """# tempo 120
+0 | . | C4:1
+1 | . | D4:1
+"""
+BOTH_PLAY = """# tempo 120
+0 | E4:2 | C4:1
+1 | -    | D4:1
+"""
+
+
+def test_rest_voice_keeps_the_voice_labels():
+    case = midgrid_roundtrip.run([("rest-v0", REST_V0)])["cases"][0]
+    assert case["source_drift"]["notes"] == 2
+    assert midgrid_roundtrip.source_drift_total(case) == 0
+    assert midgrid_roundtrip.drift_total(case) == 0
+
+
+def test_matching_voices_have_no_source_drift():
+    case = midgrid_roundtrip.run([("both-play", BOTH_PLAY)])["cases"][0]
+    assert midgrid_roundtrip.drift_total(case) == 0
+    assert case["stable"]
+
+
+def test_bundled_grids_round_trip_cleanly():
+    assert midgrid_roundtrip.main([]) == 0